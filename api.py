@@ -39,10 +39,10 @@ load_dotenv()
 os.makedirs("static", exist_ok=True)
 os.makedirs("templates", exist_ok=True)
 
-# Initialize and train the model
-print("Training model...")
+# Load the persisted model; training happens only through train_model.py
 predictor = WaterQualityPredictor()
-predictor.train('data/aquaattributes.xlsx')
+if not predictor.load_model():
+    print("Warning: Could not load model artifacts. Run `python train_model.py` first.")
 
 app = FastAPI(title="Water Quality Prediction API")
 
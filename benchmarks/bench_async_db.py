@@ -0,0 +1,164 @@
+"""Requests/sec per worker: blocking Session on the event loop vs AsyncSession.
+
+Runs the database work of the hot endpoints inside one event loop, the way
+a single uvicorn worker does: the get_current_user lookup followed by the
+/api/dashboard or /api/trends query, or the /api/predict writes. --clients
+coroutines issue requests back to back.
+
+  blocking  the previous setup: crud on a sync Session, called directly from
+            the async handler, so each query holds the loop
+  async     async_crud on an AsyncSession (aiosqlite / asyncpg)
+
+Alongside throughput and request latency it reports event-loop lag: how
+late a 1 ms sleep wakes up while the load runs. That is what every other
+request in the worker (including /health) waits behind.
+
+Uses a temporary SQLite file unless --database-url is given (the sync
+URL; the async one is derived as in database.config). Point it at
+PostgreSQL for the network-bound case the async engine is meant for.
+
+Usage:
+    python -m benchmarks.bench_async_db --clients 1 16 64 --seconds 5
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_db_writes import build_requests
+from database import async_crud, crud
+from database.config import Base, to_async_url
+from database.models import User, WaterQualityMeasurement, WaterQualityPrediction
+
+SCENARIOS = ("dashboard", "trends", "predict")
+
+
+def seed(engine, readings: int):
+    with sessionmaker(bind=engine)() as db:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        now = datetime.now(timezone.utc)
+        measurements = [
+            WaterQualityMeasurement(user_id=user.id, ph=7.0, temperature=25.0, timestamp=now - timedelta(hours=i))
+            for i in range(readings)
+        ]
+        db.add_all(measurements)
+        db.flush()
+        db.add_all(
+            WaterQualityPrediction(measurement_id=m.id, wqi_value=70.0, timestamp=m.timestamp)
+            for m in measurements
+        )
+        db.commit()
+        return user.id
+
+
+def blocking_handler(session_factory, scenario: str, user_id: int, writes: list):
+    since = datetime.now(timezone.utc) - timedelta(days=7 if scenario == "dashboard" else 30)
+
+    async def handle(i: int):
+        with session_factory() as db:
+            crud.get_user_by_username(db, "bench")
+            if scenario == "predict":
+                measurement, prediction, recommendations = writes[i % len(writes)]
+                crud.create_measurement_with_prediction(db, dict(measurement, user_id=user_id), prediction, recommendations)
+            else:
+                crud.get_measurements_with_latest_prediction(db, user_id=user_id, start_date=since)
+
+    return handle
+
+
+def async_handler(session_factory, scenario: str, user_id: int, writes: list):
+    since = datetime.now(timezone.utc) - timedelta(days=7 if scenario == "dashboard" else 30)
+
+    async def handle(i: int):
+        async with session_factory() as db:
+            await async_crud.get_user_by_username(db, "bench")
+            if scenario == "predict":
+                measurement, prediction, recommendations = writes[i % len(writes)]
+                await async_crud.create_measurement_with_prediction(
+                    db, dict(measurement, user_id=user_id), prediction, recommendations
+                )
+            else:
+                await async_crud.get_measurements_with_latest_prediction(db, user_id=user_id, start_date=since)
+
+    return handle
+
+
+async def run_load(handle, clients: int, seconds: float) -> tuple:
+    latencies, lags = [], []
+    deadline = time.perf_counter() + seconds
+    counter = iter(range(10**9))
+
+    async def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await handle(next(counter))
+            latencies.append(time.perf_counter() - started)
+
+    async def heartbeat():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - started - 0.001)
+
+    started = time.perf_counter()
+    await asyncio.gather(heartbeat(), *(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, np.array(latencies) * 1000, np.array(lags) * 1000
+
+
+async def bench(args, scenario: str, clients: int, user_id: int, writes: list) -> dict:
+    pool = dict(pool_size=max(clients, 5), max_overflow=0) if not args.database_url.startswith("sqlite") else {}
+    results = {}
+
+    engine = create_engine(args.database_url, **pool)
+    handle = blocking_handler(sessionmaker(bind=engine), scenario, user_id, writes)
+    results["blocking"] = await run_load(handle, clients, args.seconds)
+    engine.dispose()
+
+    async_engine = create_async_engine(to_async_url(args.database_url), **pool)
+    handle = async_handler(async_sessionmaker(async_engine, expire_on_commit=False), scenario, user_id, writes)
+    results["async"] = await run_load(handle, clients, args.seconds)
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readings", type=int, default=200, help="Seeded measurements with predictions")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+    args.database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    user_id = seed(engine, args.readings)
+    engine.dispose()
+    writes = [
+        ({k: v for k, v in measurement.items() if k != "user_id"}, prediction, recommendations)
+        for measurement, prediction, recommendations in build_requests(200)
+    ]
+
+    print(f"{'scenario':<10}{'clients':>8}{'mode':>10}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'loop lag p99 ms':>17}")
+    for scenario in args.scenarios:
+        for clients in args.clients:
+            results = asyncio.run(bench(args, scenario, clients, user_id, writes))
+            for mode, (throughput, latencies, lags) in results.items():
+                print(
+                    f"{scenario:<10}{clients:>8}{mode:>10}{throughput:>9.0f}{np.percentile(latencies, 50):>9.2f}"
+                    f"{np.percentile(latencies, 99):>9.2f}{np.percentile(lags, 99):>17.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
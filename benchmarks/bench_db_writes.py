@@ -0,0 +1,101 @@
+"""Per-request DB time for storing a prediction: per-row commits vs one unit of work.
+
+The old path is what /api/predict and api.py did: create_water_quality_measurement,
+create_prediction and one create_recommendation per recommendation, each
+with its own commit and refresh. The new path is
+crud.create_measurement_with_prediction: three INSERT ... RETURNING
+statements and one commit. Both write the same rows for the same readings,
+with recommendations from the real recommender.
+
+Reports requests/sec, rows inserted/sec, per-request latency and SQL
+statements per request. Uses a temporary SQLite file unless --database-url
+is given; point it at PostgreSQL to include network round trips.
+
+Usage:
+    python -m benchmarks.bench_db_writes --requests 2000
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_wqi import random_parameters
+from database import crud
+from database.config import Base
+from recommender.rules import WaterQualityRecommender
+from utils.wqi import PARAMETERS
+
+
+def build_requests(n: int) -> list:
+    recommender = WaterQualityRecommender()
+    requests = []
+    for row in random_parameters(n).tolist():
+        values = dict(zip(PARAMETERS, row))
+        recommendations = [
+            {"parameter": rec["parameter"], "severity": rec["severity"],
+             "priority": rec["priority"], "description": rec["action"]}
+            for recs in recommender.generate_recommendations(values).values()
+            for rec in recs
+        ]
+        measurement = dict(values, user_id=1, latitude=20.5, longitude=78.9)
+        prediction = {"is_potable": False, "confidence": 0.4, "wqi_value": 42.0, "quality_category": "Poor"}
+        requests.append((measurement, prediction, recommendations))
+    return requests
+
+
+def per_row_commits(db, measurement, prediction, recommendations):
+    stored = crud.create_water_quality_measurement(db, **measurement)
+    crud.create_prediction(db, measurement_id=stored.id, **prediction)
+    for recommendation in recommendations:
+        crud.create_recommendation(db, measurement_id=stored.id, **recommendation)
+
+
+def unit_of_work(db, measurement, prediction, recommendations):
+    crud.create_measurement_with_prediction(db, measurement, prediction, recommendations)
+
+
+def run(database_url: str, requests: list, write) -> tuple:
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    statements = [0]
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.__setitem__(0, statements[0] + 1))
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    latencies = []
+    started = time.perf_counter()
+    with Session() as db:
+        for measurement, prediction, recommendations in requests:
+            request_started = time.perf_counter()
+            write(db, measurement, prediction, recommendations)
+            latencies.append(time.perf_counter() - request_started)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed, np.array(latencies) * 1000, statements[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    requests = build_requests(args.requests)
+    rows = sum(2 + len(recommendations) for _, _, recommendations in requests)
+    print(f"{args.requests} requests, {rows / args.requests:.1f} rows each on average")
+    print(f"{'path':>16}{'req/s':>9}{'rows/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'stmts/req':>11}")
+    for name, write in (("per-row commits", per_row_commits), ("unit of work", unit_of_work)):
+        elapsed, latencies, statements = run(database_url, requests, write)
+        print(
+            f"{name:>16}{len(requests) / elapsed:>9.0f}{rows / elapsed:>10.0f}"
+            f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 99):>9.2f}"
+            f"{statements / len(requests):>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""/health latency while /api/predict is saturated.
+
+Starts one uvicorn worker, measures /health latency with the server idle,
+then again while --clients threads post /api/predict back to back. If
+scoring, recommendations or database writes ran on the event loop, /health
+would queue behind them; with the work offloaded the two distributions
+should be close. Also reports predict throughput and how many requests were
+shed with 503 because the inference pool was full.
+
+Usage:
+    python -m benchmarks.bench_event_loop --clients 8 32 --seconds 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+from benchmarks.bench_worker_memory import free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READING = {
+    "temperature": 25.0, "dissolved_oxygen": 6.5, "ph": 7.2, "conductivity": 450.0,
+    "bod": 2.0, "nitrate": 4.0, "fecal_coliform": 50.0, "total_coliform": 120.0,
+    "Lat": 20.5, "Lon": 78.9,
+}
+
+
+def request(url: str, data: bytes = None, headers: dict = None) -> tuple:
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def wait_until_ready(base: str, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if request(f"{base}/health")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not become ready in time")
+
+
+def login(base: str) -> dict:
+    user = {"username": "bench", "email": "bench@example.com", "password": "bench"}
+    request(f"{base}/register", json.dumps(user).encode(), {"Content-Type": "application/json"})
+    form = urllib.parse.urlencode({"username": "bench", "password": "bench"}).encode()
+    _, body = request(f"{base}/token", form, {"Content-Type": "application/x-www-form-urlencoded"})
+    return {"Authorization": f"Bearer {json.loads(body)['access_token']}", "Content-Type": "application/json"}
+
+
+def health_latencies(base: str, seconds: float) -> np.ndarray:
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        request(f"{base}/health")
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.01)
+    return np.array(latencies) * 1000
+
+
+def saturate(base: str, headers: dict, clients: int, stop: threading.Event, counts: dict):
+    body = json.dumps(READING).encode()
+    lock = threading.Lock()
+
+    def client():
+        while not stop.is_set():
+            status, _ = request(f"{base}/api/predict", body, headers)
+            with lock:
+                counts[status] = counts.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(base)
+        headers = login(base)
+        idle = health_latencies(base, args.seconds / 2)
+
+        print(f"{'clients':>8}{'health p50 ms':>15}{'health p99 ms':>15}{'predict req/s':>15}{'503s':>7}")
+        print(f"{'idle':>8}{np.percentile(idle, 50):>15.2f}{np.percentile(idle, 99):>15.2f}{'-':>15}{'-':>7}")
+        for clients in args.clients:
+            stop, counts = threading.Event(), {}
+            threads = saturate(base, headers, clients, stop, counts)
+            time.sleep(1)
+            started, before = time.perf_counter(), sum(counts.values())
+            loaded = health_latencies(base, args.seconds)
+            throughput = (sum(counts.values()) - before) / (time.perf_counter() - started)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            print(
+                f"{clients:>8}{np.percentile(loaded, 50):>15.2f}{np.percentile(loaded, 99):>15.2f}"
+                f"{throughput:>15.0f}{counts.get(503, 0):>7}"
+            )
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    main()
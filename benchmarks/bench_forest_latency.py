@@ -0,0 +1,72 @@
+"""Single-request latency of the FlatForest evaluator against sklearn.
+
+Each sample is one raw row scored on its own, as /api/predict does, including
+the scaling step where the engine needs it. Reports p50/p99 for sklearn's
+RandomForestClassifier, the NumPy FlatForest compiled from the same model,
+and a FlatForest with the scaler folded into its thresholds, plus small
+batches.
+
+Usage:
+    python -m benchmarks.bench_forest_latency --samples 2000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from models.forest import FlatForest, flatten_forest, fold_scaler
+from models.predict import WaterQualityPredictor
+
+
+def latencies(fn, rows: np.ndarray) -> np.ndarray:
+    timings = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        started = time.perf_counter()
+        fn(row)
+        timings[i] = time.perf_counter() - started
+    return timings * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 128, 512])
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    predictor = WaterQualityPredictor()
+    if not predictor.load_model():
+        raise SystemExit("Model artifacts not found; run `python train_model.py` first")
+    model, scaler = predictor.model, predictor.scaler
+    forest = FlatForest.from_model(model)
+    folded = FlatForest(fold_scaler(flatten_forest(model), scaler))
+
+    rng = np.random.default_rng(0)
+    X = scaler.inverse_transform(rng.normal(scale=1.5, size=(args.samples, len(predictor.feature_columns))))
+    expected = model.predict_proba(predictor._scale(X))
+    assert np.abs(forest.predict_proba(predictor._scale(X)) - expected).max() <= 1e-9
+    assert np.abs(folded.predict_proba(X) - expected).max() <= 1e-9
+
+    engines = {
+        "sklearn": lambda rows: model.predict_proba(predictor._scale(rows)),
+        "FlatForest": lambda rows: forest.predict_proba(predictor._scale(rows)),
+        "folded": folded.predict_proba,
+    }
+
+    print(f"Single row, {args.samples} samples (microseconds)")
+    print(f"{'engine':<12}{'p50':>10}{'p99':>10}")
+    for name, engine in engines.items():
+        us = latencies(lambda row: engine(row.reshape(1, -1)), X)
+        print(f"{name:<12}{np.percentile(us, 50):>10.1f}{np.percentile(us, 99):>10.1f}")
+
+    print("\nSmall batches, median per call (microseconds)")
+    print(f"{'rows':>6}" + "".join(f"{name:>12}" for name in engines))
+    for size in args.batch_sizes:
+        batches = [X[i:i + size] for i in range(0, min(len(X), 50 * size), size)]
+        medians = [np.median(latencies(engine, batches)) for engine in engines.values()]
+        print(f"{size:>6}" + "".join(f"{m:>12.1f}" for m in medians))
+
+
+if __name__ == "__main__":
+    main()
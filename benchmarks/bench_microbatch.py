@@ -0,0 +1,88 @@
+"""Throughput of single-row predictions with and without the micro-batcher.
+
+N concurrent clients each issue --requests predictions back to back on one
+event loop. The baseline runs predictor.predict for every request in the
+default thread pool, which is what an endpoint without batching does; the
+batched run awaits MicroBatcher.predict, so requests that arrive within the
+window share one predict_batch call.
+
+Usage:
+    python -m benchmarks.bench_microbatch --clients 50 200 1000 --window-ms 2
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.bench_predict_batch import random_readings
+from models.batcher import MicroBatcher
+from models.predict import WaterQualityPredictor
+
+
+async def run_clients(clients: int, requests: int, readings: list, predict_one) -> tuple:
+    latencies = []
+
+    async def client(offset: int):
+        for i in range(requests):
+            started = time.perf_counter()
+            await predict_one(readings[(offset + i) % len(readings)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return clients * requests / elapsed, np.percentile(latencies, [50, 99]) * 1000
+
+
+async def unbatched(predictor, clients, requests, readings):
+    loop = asyncio.get_running_loop()
+    return await run_clients(
+        clients, requests, readings,
+        lambda row: loop.run_in_executor(None, predictor.predict, row)
+    )
+
+
+async def batched(predictor, clients, requests, readings, max_batch_size, window_ms):
+    batcher = MicroBatcher(predictor.predict_batch, max_batch_size=max_batch_size, max_wait_ms=window_ms)
+    batcher.start()
+    try:
+        result = await run_clients(clients, requests, readings, batcher.predict)
+    finally:
+        await batcher.stop()
+    return result + (batcher.metrics.snapshot(),)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    predictor = WaterQualityPredictor()
+    if not predictor.load_model():
+        raise SystemExit("Model artifacts not found; run `python train_model.py` first")
+    readings = random_readings(predictor, 1000)
+
+    print(
+        f"{'clients':>8}{'unbatched req/s':>17}{'p99 ms':>9}"
+        f"{'batched req/s':>15}{'p99 ms':>9}{'mean batch':>12}{'p99 queue ms':>14}{'speedup':>9}"
+    )
+    for clients in args.clients:
+        base_rps, base_lat = asyncio.run(unbatched(predictor, clients, args.requests, readings))
+        rps, lat, metrics = asyncio.run(
+            batched(predictor, clients, args.requests, readings, args.max_batch_size, args.window_ms)
+        )
+        print(
+            f"{clients:>8}{base_rps:>17.0f}{base_lat[1]:>9.1f}"
+            f"{rps:>15.0f}{lat[1]:>9.1f}{metrics['mean_batch_size']:>12.1f}"
+            f"{metrics['p99_queue_delay_ms']:>14.2f}{rps / base_rps:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Deep-page latency (OFFSET vs keyset) and row cost (ORM objects vs projections).
+
+Seeds --rows measurements for one user, then:
+
+  pages  time to fetch one --limit page at increasing depths, with
+         crud.get_measurements (OFFSET) and crud.get_measurement_columns
+         with cursor (keyset, starting after the previous page's last row)
+  rows   time to load --fetch rows as ORM objects, as (id, timestamp, ph)
+         tuples and as NumPy arrays of one or all eight parameters
+
+Uses a temporary SQLite file unless --database-url is given.
+
+Usage:
+    python -m benchmarks.bench_pagination --rows 200000 --limit 100
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.config import Base
+from database.models import WaterQualityMeasurement
+
+
+def seed(engine, rows: int):
+    rng = np.random.default_rng(0)
+    start = datetime.now(timezone.utc)
+    with engine.begin() as connection:
+        for offset in range(0, rows, 10000):
+            chunk = range(offset, min(rows, offset + 10000))
+            connection.execute(insert(WaterQualityMeasurement), [
+                dict(
+                    {name: float(value) for name, value in zip(crud.MEASUREMENT_PARAMETERS, rng.uniform(0, 10, 8))},
+                    user_id=1,
+                    timestamp=start - timedelta(seconds=i),
+                )
+                for i in chunk
+            ])
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def bench_pages(db, rows: int, limit: int):
+    print(f"{'depth':>10}{'offset ms':>12}{'keyset ms':>12}")
+    for depth in sorted({0, rows // 100, rows // 10, rows // 2, rows - limit}):
+        # The keyset page starts after the last row of the page before this depth
+        cursor = None
+        if depth:
+            _, cursor = crud.get_measurement_columns(db, [], user_id=1, limit=depth)
+        offset_ms = best_of(lambda: crud.get_measurements(db, user_id=1, skip=depth, limit=limit))
+        keyset_ms = best_of(lambda: crud.get_measurement_columns(db, user_id=1, cursor=cursor, limit=limit))
+        db.expunge_all()
+        print(f"{depth:>10}{offset_ms:>12.2f}{keyset_ms:>12.2f}")
+
+
+def bench_rows(db, fetch: int):
+    cases = {
+        "orm objects": lambda: crud.get_measurements(db, user_id=1, limit=fetch),
+        "tuples (ph)": lambda: crud.get_measurement_columns(db, ["ph"], user_id=1, limit=fetch),
+        "arrays (ph)": lambda: crud.get_measurement_columns(db, ["ph"], user_id=1, limit=fetch, as_arrays=True),
+        "arrays (all 8)": lambda: crud.get_measurement_columns(db, user_id=1, limit=fetch, as_arrays=True),
+    }
+    print(f"\n{'load ' + str(fetch) + ' rows':<18}{'ms':>10}")
+    for name, fn in cases.items():
+        elapsed = best_of(lambda: (fn(), db.expunge_all()), repeat=3)
+        print(f"{name:<18}{elapsed:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--fetch", type=int, default=10000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.rows)
+
+    with sessionmaker(bind=engine)() as db:
+        bench_pages(db, args.rows, args.limit)
+        bench_rows(db, min(args.fetch, args.rows))
+
+
+if __name__ == "__main__":
+    main()
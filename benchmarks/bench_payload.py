@@ -0,0 +1,60 @@
+"""/api/predict response size and serialisation time, full vs compact.
+
+Builds the response for a reading that is out of range on every parameter
+(the worst case, within the API's accepted input ranges) in both modes and
+serialises it the way FastAPI does: jsonable_encoder, then the compact
+json.dumps of JSONResponse. Reports bytes, gzipped bytes and microseconds.
+
+Usage:
+    python -m benchmarks.bench_payload --calls 2000
+"""
+import argparse
+import gzip
+import json
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+
+from main import CompactWaterQualityPrediction, WaterQualityPrediction
+from recommender.rules import WaterQualityRecommender
+
+WORST_CASE = {
+    "temperature": 40.0, "dissolved_oxygen": 0.5, "ph": 4.0, "conductivity": 2000.0,
+    "bod": 30.0, "nitrate": 50.0, "fecal_coliform": 500.0, "total_coliform": 1000.0,
+}
+
+
+def render(response) -> bytes:
+    return json.dumps(
+        jsonable_encoder(response), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    recommender = WaterQualityRecommender()
+    common = dict(is_potable=False, confidence=0.02, wqi_value=3.5, quality_category="Very Poor",
+                  parameters=WORST_CASE)
+
+    def full():
+        return render(WaterQualityPrediction(
+            recommendations=recommender.generate_recommendations(WORST_CASE), **common
+        ))
+
+    def compact():
+        recommendations, catalogue = recommender.generate_compact_recommendations(WORST_CASE)
+        return render(CompactWaterQualityPrediction(recommendations=recommendations, catalogue=catalogue, **common))
+
+    print(f"{'mode':>8}{'bytes':>9}{'gzip bytes':>12}{'build+serialise us':>20}")
+    for name, build in (("full", full), ("compact", compact)):
+        body = build()
+        best = min(timeit.repeat(build, number=args.calls, repeat=args.repeat))
+        print(f"{name:>8}{len(body):>9}{len(gzip.compress(body)):>12}{best / args.calls * 1e6:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
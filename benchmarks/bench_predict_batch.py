@@ -0,0 +1,84 @@
+"""Rows/sec of WaterQualityPredictor.predict_batch against the per-row loop.
+
+The per-row baseline is the original predict() implementation: a one-row
+DataFrame, scaler.transform, model.predict, model.predict_proba and
+label_encoder.inverse_transform for every reading.
+
+Usage:
+    python -m benchmarks.bench_predict_batch --rows 10 100 1000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from models.predict import WaterQualityPredictor
+
+# Sampling ranges per model feature, roughly the spread of the training data
+FEATURE_RANGES = {
+    "Lat": (8, 34),
+    "Lon": (70, 95),
+    "Temperature": (10, 35),
+    "D.O": (0, 12),
+    "pH": (5, 9.5),
+    "Conductivity": (50, 2000),
+    "B.O.D": (0, 30),
+    "Nitrate": (0, 50),
+    "Fecalcaliform": (0, 5000),
+    "Totalcaliform": (0, 10000),
+}
+
+
+def random_readings(predictor: WaterQualityPredictor, n: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [
+        {col: float(rng.uniform(*FEATURE_RANGES[col])) for col in predictor.feature_columns}
+        for _ in range(n)
+    ]
+
+
+def legacy_predict(predictor: WaterQualityPredictor, input_data: dict) -> tuple:
+    """The per-row DataFrame path that predict() used before predict_batch"""
+    import pandas as pd
+
+    input_df = pd.DataFrame([input_data], columns=predictor.feature_columns)
+    input_scaled = predictor.scaler.transform(input_df)
+    prediction = predictor.model.predict(input_scaled)[0]
+    probability = predictor.model.predict_proba(input_scaled)[0][1]
+    prediction_label = predictor.label_encoder.inverse_transform([prediction])[0]
+    return bool(prediction_label == 'yes'), float(probability)
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    predictor = WaterQualityPredictor()
+    if not predictor.load_model():
+        raise SystemExit("Model artifacts not found; run `python train_model.py` first")
+
+    print(f"{'rows':>6}{'per-row loop rows/s':>22}{'predict_batch rows/s':>23}{'speedup':>9}")
+    for n in args.rows:
+        readings = random_readings(predictor, n)
+        assert predictor.predict_batch(readings) == [legacy_predict(predictor, r) for r in readings]
+
+        loop_time = best_of(lambda: [legacy_predict(predictor, r) for r in readings], args.repeat)
+        batch_time = best_of(lambda: predictor.predict_batch(readings), args.repeat)
+        print(f"{n:>6}{n / loop_time:>22.0f}{n / batch_time:>23.0f}{loop_time / batch_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Microseconds per WaterQualityRecommender.generate_recommendations call.
+
+Profiles:
+    in_range     every parameter inside its acceptable range (no output)
+    typical      a reading from the API's input ranges, a few excursions
+    worst_case   every parameter past its critical threshold
+
+Then, for --rows random readings, compares one scalar call per reading with
+a single generate_recommendations_batch call (classification only, and
+with every row expanded back to the scalar output).
+
+Usage:
+    python -m benchmarks.bench_recommender --calls 20000 --rows 100 1000 10000
+"""
+import argparse
+import time
+import timeit
+
+from benchmarks.bench_wqi import random_parameters
+from recommender.rules import WaterQualityRecommender
+from utils.wqi import PARAMETERS
+
+PROFILES = {
+    "in_range": {
+        "temperature": 22.0, "dissolved_oxygen": 6.5, "ph": 7.2, "conductivity": 450.0,
+        "bod": 2.0, "nitrate": 4.0, "fecal_coliform": 50.0, "total_coliform": 120.0,
+    },
+    "typical": dict(zip(PARAMETERS, random_parameters(1, seed=7)[0].tolist())),
+    "worst_case": {
+        "temperature": 40.0, "dissolved_oxygen": 0.5, "ph": 4.0, "conductivity": 2500.0,
+        "bod": 20.0, "nitrate": 60.0, "fecal_coliform": 3000.0, "total_coliform": 6000.0,
+    },
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    recommender = WaterQualityRecommender()
+    print(f"{'profile':>12}{'recommendations':>17}{'best us/call':>14}")
+    for name, values in PROFILES.items():
+        count = sum(len(recs) for recs in recommender.generate_recommendations(values).values())
+        best = min(timeit.repeat(
+            lambda: recommender.generate_recommendations(values), number=args.calls, repeat=args.repeat
+        ))
+        print(f"{name:>12}{count:>17}{best / args.calls * 1e6:>14.2f}")
+
+    print()
+    print(f"{'rows':>8}{'scalar ms':>11}{'batch ms':>10}{'batch+expand ms':>17}")
+    for n in args.rows:
+        values = random_parameters(n)
+        records = [dict(zip(PARAMETERS, row)) for row in values.tolist()]
+        columns = {name: values[:, j] for j, name in enumerate(PARAMETERS)}
+
+        started = time.perf_counter()
+        for record in records:
+            recommender.generate_recommendations(record)
+        scalar = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = recommender.generate_recommendations_batch(columns)
+        batch.rows()
+        classify = time.perf_counter() - started
+        for i in range(n):
+            batch.expand(i)
+        expand = time.perf_counter() - started
+        print(f"{n:>8}{scalar * 1000:>11.2f}{classify * 1000:>10.2f}{expand * 1000:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
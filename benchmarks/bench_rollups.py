@@ -0,0 +1,97 @@
+"""Trend statistics from raw readings vs from the hourly/daily rollups.
+
+Seeds --days of readings for one user, one every --interval seconds with
+a WQI prediction each, rebuilds the rollups, then times the 30-day
+window the way /api/trends computes it both ways: loading every reading
+and its latest WQI as NumPy arrays, and reading the daily rollup rows.
+
+Uses a temporary SQLite file unless --database-url is given.
+
+Usage:
+    python -m benchmarks.bench_rollups --days 90 --interval 60
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database import crud, rollups
+from database.config import Base
+from database.models import MeasurementRollup, WaterQualityMeasurement, WaterQualityPrediction
+
+
+def seed(engine, days: int, interval: int):
+    rng = np.random.default_rng(0)
+    now = datetime.now(timezone.utc)
+    rows = days * 86400 // interval
+    with engine.begin() as connection:
+        for offset in range(0, rows, 10000):
+            chunk = range(offset, min(rows, offset + 10000))
+            connection.execute(insert(WaterQualityMeasurement), [
+                dict(
+                    {name: float(value) for name, value in zip(crud.MEASUREMENT_PARAMETERS, rng.uniform(0, 10, 8))},
+                    id=i + 1,
+                    user_id=1,
+                    timestamp=now - timedelta(seconds=i * interval),
+                )
+                for i in chunk
+            ])
+            connection.execute(insert(WaterQualityPrediction), [
+                {"measurement_id": i + 1, "wqi_value": float(rng.uniform(0, 100)), "timestamp": now}
+                for i in chunk
+            ])
+        rollups.rebuild_rollups(connection)
+    return rows
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def raw_trends(db, start_date):
+    columns, _ = crud.get_measurement_columns(
+        db, user_id=1, start_date=start_date, limit=None, prediction_columns=("wqi_value",), as_arrays=True
+    )
+    return {param: (float(np.mean(values)), float(np.std(values))) for param, values in columns.items()
+            if param not in ("id", "timestamp")}
+
+
+def rollup_trends(db, start_date):
+    series = crud.get_rollup_series(db, rollups.ROLLUP_PARAMETERS, "day", user_id=1, start_date=start_date)
+    return {param: (stats.mean, stats.std) for param, stats in
+            ((param, rollups.summarise(points)) for param, points in series.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--interval", type=int, default=60, help="seconds between readings")
+    parser.add_argument("--window", type=int, default=30, help="trend window in days")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    readings = seed(engine, args.days, args.interval)
+
+    with sessionmaker(bind=engine)() as db:
+        start_date = datetime.now(timezone.utc) - timedelta(days=args.window)
+        rollup_rows = db.scalar(select(func.count()).select_from(MeasurementRollup))
+        print(f"{readings} readings, {rollup_rows} rollup rows, {args.window}-day window")
+        print(f"{'source':<10}{'ms':>10}")
+        print(f"{'raw':<10}{best_of(lambda: raw_trends(db, start_date), repeat=3):>10.1f}")
+        print(f"{'rollups':<10}{best_of(lambda: rollup_trends(db, start_date)):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
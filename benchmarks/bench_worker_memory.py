@@ -0,0 +1,111 @@
+"""Per-worker memory of the gunicorn deployment, with and without preloading.
+
+Starts `gunicorn -c gunicorn.conf.py` with N workers, waits for /health, then
+reads /proc/<pid>/smaps_rollup for each worker. USS (private clean + private
+dirty) is the memory a worker costs on top of what it shares with the master.
+Linux only.
+
+Usage:
+    python -m benchmarks.bench_worker_memory --workers 1 2 4
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid: int) -> dict:
+    """Return the smaps_rollup fields of a process in KiB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields
+
+
+def child_pids(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_until_ready(port: int, master_pid: int, workers: int, timeout: float = 120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as response:
+                if response.status == 200 and len(child_pids(master_pid)) >= workers:
+                    # Give the remaining workers time to finish their startup hooks
+                    time.sleep(2)
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def measure(workers: int, preload: bool) -> dict:
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "API_HOST": "127.0.0.1",
+        "GUNICORN_PRELOAD": "true" if preload else "false",
+    })
+    env.setdefault("DATABASE_URL", "sqlite://")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(port, server.pid, workers)
+        master = smaps_rollup(server.pid)
+        stats = [smaps_rollup(pid) for pid in child_pids(server.pid)]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    uss = [s.get("Private_Clean", 0) + s.get("Private_Dirty", 0) for s in stats]
+    return {
+        "master_rss": master.get("Rss", 0),
+        "worker_uss": uss,
+        "worker_pss": [s.get("Pss", 0) for s in stats],
+        "total": master.get("Pss", 0) + sum(s.get("Pss", 0) for s in stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'preload':>9}{'master RSS MiB':>16}{'mean worker USS MiB':>21}{'total PSS MiB':>15}")
+    for workers in args.workers:
+        for preload in (False, True):
+            result = measure(workers, preload)
+            mean_uss = sum(result["worker_uss"]) / len(result["worker_uss"])
+            print(
+                f"{workers:>8}{str(preload):>9}{result['master_rss'] / 1024:>16.1f}"
+                f"{mean_uss / 1024:>21.1f}{result['total'] / 1024:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Summarise `python -X importtime` output per top-level package.
+
+Usage:
+    python -m benchmarks.import_report            # report for `import main`
+    python -m benchmarks.import_report models.predict --top 15
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+# Dependencies that only plotting, PDF, training or parsing code paths need.
+# Importing the API must not load any of them.
+HEAVY_MODULES = [
+    "matplotlib",
+    "seaborn",
+    "plotly",
+    "reportlab",
+    "pandas",
+    "openpyxl",
+    "pdfplumber",
+    "sklearn.model_selection",
+    "sklearn.metrics",
+]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def collect_import_times(module: str = "main") -> dict:
+    """Import `module` in a fresh interpreter and return {module: (self_us, cumulative_us)}"""
+    env = dict(os.environ)
+    # Creating the app must not need a running PostgreSQL
+    env.setdefault("DATABASE_URL", "sqlite://")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def summarise_by_package(times: dict) -> dict:
+    """Sum self time per top-level package, in microseconds"""
+    totals = defaultdict(int)
+    for name, (self_us, _) in times.items():
+        totals[name.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def loaded_heavy_modules(times: dict) -> list:
+    return [
+        heavy for heavy in HEAVY_MODULES
+        if any(name == heavy or name.startswith(heavy + ".") for name in times)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    times = collect_import_times(args.module)
+    totals = summarise_by_package(times)
+    print(f"Import time for `import {args.module}`: {sum(totals.values()) / 1000:.1f} ms "
+          f"across {len(times)} modules\n")
+    print(f"{'package':<30}{'self ms':>10}")
+    for package, self_us in sorted(totals.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<30}{self_us / 1000:>10.1f}")
+
+    heavy = loaded_heavy_modules(times)
+    print(f"\nHeavy optional dependencies loaded: {', '.join(heavy) if heavy else 'none'}")
+
+
+if __name__ == "__main__":
+    main()
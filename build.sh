@@ -17,5 +17,12 @@ else
     python train_model.py
 fi
 
-# Database initialization will happen during application startup
-echo "Database will be initialized during application startup" 
\ No newline at end of file
+# Export the versioned model bundle loaded by the API
+if [ ! -f "models/water_quality_bundle/manifest.json" ]; then
+    echo "Exporting model bundle..."
+    python -m models.bundle --fold-scaler
+fi
+
+# Tables, schema migrations and month partitions; the app itself only
+# creates missing tables and warns about pending migrations on startup
+python init_db.py
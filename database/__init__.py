@@ -1,4 +1,4 @@
-from .config import Base, engine, get_db
+from .config import Base, engine, get_db, async_engine, get_async_db
 from .models import WaterQualityMeasurement, WaterQualityPrediction, Recommendation
 from .schemas import (
     WaterQualityMeasurementCreate,
@@ -13,8 +13,11 @@ from .crud import (
     create_water_quality_measurement,
     create_prediction,
     create_recommendation,
+    create_measurement_with_prediction,
     get_measurement,
     get_measurements,
+    get_measurements_with_latest_prediction,
+    get_measurement_columns,
     get_predictions_by_measurement,
     get_recommendations_by_measurement,
     get_recent_measurements,
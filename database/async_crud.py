@@ -0,0 +1,110 @@
+"""Async versions of the crud functions on the hot request paths.
+
+Used by the endpoints that take an AsyncSession from get_async_db: auth,
+/api/predict, /api/dashboard and /api/trends. Queries are shared with
+crud where they are built as statements; bcrypt runs in a thread so it
+does not hold the event loop.
+"""
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .crud import (
+    MEASUREMENT_PARAMETERS,
+    measurement_columns_query,
+    measurement_columns_result,
+    measurements_with_latest_prediction_query,
+    pwd_context,
+)
+from .rollups import reading_rollup, rollup_query, rollup_series
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.username == username).limit(1))
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    return await db.scalar(select(models.User).where(models.User.email == email).limit(1))
+
+async def create_user(db: AsyncSession, username: str, email: str, hashed_password: str) -> models.User:
+    db_user = models.User(
+        username=username,
+        email=email,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user_by_username(db, username)
+    if not user:
+        return False
+    if not await asyncio.to_thread(pwd_context.verify, password, user.hashed_password):
+        return False
+    return user
+
+async def create_measurement_with_prediction(
+    db: AsyncSession,
+    measurement: Dict,
+    prediction: Dict,
+    recommendations: Sequence[Dict] = (),
+) -> Dict:
+    """crud.create_measurement_with_prediction: three INSERT ... RETURNING, the rollup upsert and one commit"""
+    Measurement, Prediction = models.WaterQualityMeasurement, models.WaterQualityPrediction
+    measurement_id, timestamp = (await db.execute(
+        insert(Measurement).values(**measurement).returning(Measurement.id, Measurement.timestamp)
+    )).one()
+    prediction_id = (await db.execute(
+        insert(Prediction).values(measurement_id=measurement_id, **prediction).returning(Prediction.id)
+    )).scalar_one()
+    recommendation_ids = []
+    if recommendations:
+        recommendation_ids = sorted(await db.scalars(
+            insert(models.Recommendation).returning(models.Recommendation.id),
+            [dict(recommendation, measurement_id=measurement_id) for recommendation in recommendations]
+        ))
+    rollup = reading_rollup(db.bind.dialect.name, measurement, timestamp, prediction.get("wqi_value"))
+    if rollup is not None:
+        await db.execute(rollup)
+    await db.commit()
+    return {
+        "measurement_id": measurement_id,
+        "prediction_id": prediction_id,
+        "recommendation_ids": recommendation_ids,
+        "timestamp": timestamp,
+    }
+
+async def get_measurements_with_latest_prediction(
+    db: AsyncSession,
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[Tuple[models.WaterQualityMeasurement, Optional[models.WaterQualityPrediction]]]:
+    query = measurements_with_latest_prediction_query(user_id, start_date, end_date, skip, limit)
+    return [tuple(row) for row in await db.execute(query)]
+
+async def get_measurement_columns(
+    db: AsyncSession,
+    columns: Sequence[str] = MEASUREMENT_PARAMETERS,
+    as_arrays: bool = False,
+    **page,
+) -> Tuple[object, Optional[int]]:
+    """crud.get_measurement_columns: (tuples or NumPy arrays, next_cursor) for one page"""
+    query = measurement_columns_query(columns, **page)
+    rows = (await db.execute(query)).all()
+    return measurement_columns_result(rows, query, page.get("limit", 100), as_arrays)
+
+async def get_rollup_series(
+    db: AsyncSession,
+    parameters: Sequence[str],
+    granularity: str = "day",
+    **filters,
+) -> Dict:
+    return rollup_series(await db.execute(rollup_query(parameters, granularity, **filters)))
@@ -0,0 +1,175 @@
+"""Resumable recompute of stored WQI values after the WQI formula changes.
+
+Predictions are read in id order, joined to their measurements, in
+fixed-size chunks, scored with utils.wqi in one vectorised pass per chunk and
+written back with a single executemany UPDATE by primary key. The chunk's
+updates and the job's checkpoint are committed in the same transaction, so
+an interrupted job resumes after the last committed chunk without skipping
+or repeating work. Only one chunk is held in memory at a time.
+
+Jobs are named after utils.wqi.WQI_VERSION, so changing weights or
+breakpoints starts a fresh backfill while rerunning the same version
+resumes (or does nothing, once complete).
+
+Usage:
+    python -m database.backfill [--chunk-size 5000] [--restart]
+"""
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import bindparam, insert, select, update
+
+from utils.wqi import PARAMETERS, WQI_VERSION, calculate_wqi_with_categories
+from .models import BackfillCheckpoint, WaterQualityMeasurement, WaterQualityPrediction
+from .rollups import rebuild_rollups
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Both sides of the join and the UPDATE use primary keys, so no extra index
+# is needed however large the tables get
+_READINGS = (
+    select(WaterQualityPrediction.id, *[getattr(WaterQualityMeasurement, name) for name in PARAMETERS])
+    .join(WaterQualityMeasurement, WaterQualityMeasurement.id == WaterQualityPrediction.measurement_id)
+    .order_by(WaterQualityPrediction.id)
+)
+
+_UPDATE_PREDICTIONS = (
+    update(WaterQualityPrediction)
+    .where(WaterQualityPrediction.id == bindparam("b_id"))
+    .values(wqi_value=bindparam("b_wqi_value"), quality_category=bindparam("b_quality_category"))
+)
+
+
+def iter_reading_chunks(engine, after_id: int, chunk_size: int):
+    """Yield lists of (prediction id, *PARAMETERS) rows with id > after_id, in id order.
+
+    On server databases this is one query read through a server-side cursor
+    (stream_results), on its own connection so chunk commits don't close it.
+    SQLite has no server-side cursors and an open read blocks writers, so
+    there each chunk is its own keyset query (id > last id seen).
+    """
+    if engine.dialect.name == "sqlite":
+        while True:
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    _READINGS.where(WaterQualityPrediction.id > after_id).limit(chunk_size)
+                ).all()
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+    else:
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                _READINGS.where(WaterQualityPrediction.id > after_id)
+            )
+            for rows in result.partitions(chunk_size):
+                yield rows
+
+
+def _load_checkpoint(engine, job_name: str, restart: bool):
+    with engine.begin() as connection:
+        row = connection.execute(
+            select(BackfillCheckpoint).where(BackfillCheckpoint.job_name == job_name)
+        ).first()
+        if row is not None and not restart:
+            return row
+        now = datetime.now(timezone.utc)
+        values = dict(last_id=0, rows_processed=0, started_at=now, updated_at=now, completed_at=None)
+        if row is None:
+            connection.execute(insert(BackfillCheckpoint).values(job_name=job_name, **values))
+        else:
+            connection.execute(
+                update(BackfillCheckpoint).where(BackfillCheckpoint.job_name == job_name).values(**values)
+            )
+        return connection.execute(
+            select(BackfillCheckpoint).where(BackfillCheckpoint.job_name == job_name)
+        ).first()
+
+
+def backfill_wqi(engine, chunk_size: int = DEFAULT_CHUNK_SIZE, job_name: str = None,
+                 restart: bool = False, max_chunks: int = None, progress=print) -> dict:
+    """Recompute wqi_value and quality_category for every stored prediction.
+
+    Returns a summary dict. max_chunks stops early (the job resumes on the
+    next run), which lets the job run in bounded time slices.
+    """
+    job_name = job_name or f"wqi:{WQI_VERSION}"
+    BackfillCheckpoint.__table__.create(bind=engine, checkfirst=True)
+    checkpoint = _load_checkpoint(engine, job_name, restart)
+    if checkpoint.completed_at is not None:
+        progress(f"Backfill {job_name} already completed at {checkpoint.completed_at}")
+        return {"job_name": job_name, "completed": True, "rows_processed": checkpoint.rows_processed,
+                "chunks": 0, "skipped": 0}
+
+    last_id, rows_processed = checkpoint.last_id, checkpoint.rows_processed
+    chunks = skipped = 0
+    started = time.perf_counter()
+    completed = True
+    for rows in iter_reading_chunks(engine, last_id, chunk_size):
+        if max_chunks is not None and chunks >= max_chunks:
+            completed = False
+            break
+
+        # None (NULL) parameters become NaN; those rows keep their stored values
+        values = np.array([row[1:] for row in rows], dtype=np.float64)
+        ids = [row[0] for row in rows]
+        scorable = ~np.isnan(values).any(axis=1)
+        wqi, categories = calculate_wqi_with_categories(values[scorable])
+        params = [
+            {"b_id": prediction_id, "b_wqi_value": value, "b_quality_category": category}
+            for prediction_id, value, category in zip(
+                np.asarray(ids)[scorable].tolist(), wqi.tolist(), categories.tolist()
+            )
+        ]
+
+        last_id = ids[-1]
+        rows_processed += len(rows)
+        with engine.begin() as connection:
+            if params:
+                connection.execute(_UPDATE_PREDICTIONS, params)
+            connection.execute(
+                update(BackfillCheckpoint)
+                .where(BackfillCheckpoint.job_name == job_name)
+                .values(last_id=last_id, rows_processed=rows_processed,
+                        updated_at=datetime.now(timezone.utc))
+            )
+
+        chunks += 1
+        skipped += len(rows) - len(params)
+        elapsed = time.perf_counter() - started
+        progress(f"{job_name}: {rows_processed} predictions (up to id {last_id}), "
+                 f"{rows_processed / elapsed if elapsed else 0:.0f} rows/s")
+
+    if completed:
+        with engine.begin() as connection:
+            # The WQI rollups were summed from the old values
+            rebuild_rollups(connection, progress=progress)
+            connection.execute(
+                update(BackfillCheckpoint)
+                .where(BackfillCheckpoint.job_name == job_name)
+                .values(completed_at=datetime.now(timezone.utc))
+            )
+        progress(f"Backfill {job_name} completed: {rows_processed} predictions")
+    return {"job_name": job_name, "completed": completed, "rows_processed": rows_processed,
+            "chunks": chunks, "skipped": skipped}
+
+
+def main():
+    import argparse
+    from .config import engine
+
+    parser = argparse.ArgumentParser(description="Recompute stored WQI values with the current formula")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--job-name", default=None, help=f"Defaults to wqi:{WQI_VERSION}")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first row")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks; rerun to resume")
+    args = parser.parse_args()
+
+    backfill_wqi(engine, chunk_size=args.chunk_size, job_name=args.job_name,
+                 restart=args.restart, max_chunks=args.max_chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from .engines import get_async_engine, get_engine
 
 # Load environment variables
 load_dotenv()
@@ -26,12 +27,31 @@ else:
     # Create database URL with encoded password
     SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# Create engine
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Create engine (shared per process, pool settings from DB_POOL_*; see database/engines.py)
+engine = get_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def to_async_url(url: str) -> str:
+    """The same database through its async driver: asyncpg for PostgreSQL, aiosqlite for SQLite"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    if dialect == "postgresql":
+        return f"postgresql+asyncpg://{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+# Async engine for the endpoints on the request hot path; ASYNC_DATABASE_URL
+# overrides the derived URL (e.g. when DATABASE_URL carries psycopg-only options)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(SQLALCHEMY_DATABASE_URL)
+async_engine = get_async_engine(ASYNC_DATABASE_URL)
+
+# expire_on_commit=False: attributes of committed objects stay readable
+# without the implicit refresh (lazy IO is not allowed on an AsyncSession)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create base class for models
 Base = declarative_base()
 
@@ -41,4 +61,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Async dependency to get database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,8 +1,13 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import DateTime, Select, String, TypeDecorator, and_, func, insert, inspect, literal, or_, select, type_coerce
+from sqlalchemy.orm import Session, aliased
 from . import models, schemas
-from typing import List, Optional
+from .rollups import reading_rollup, rebuild_rollup_day, rollup_query, rollup_series
+from typing import Dict, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
+import numpy as np
+import base64
+import binascii
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -34,6 +39,8 @@ def create_water_quality_measurement(
         total_coliform=total_coliform,
     )
     db.add(db_measurement)
+    db.flush()
+    _add_to_rollups(db, db_measurement, None)
     db.commit()
     db.refresh(db_measurement)
     return db_measurement
@@ -46,6 +53,10 @@ def create_prediction(
     wqi_value: float,
     quality_category: str,
 ) -> models.WaterQualityPrediction:
+    measurement = db.get(models.WaterQualityMeasurement, measurement_id)
+    replaces = measurement is not None and db.scalar(
+        select(models.WaterQualityPrediction.id).where(models.WaterQualityPrediction.measurement_id == measurement_id).limit(1)
+    ) is not None
     db_prediction = models.WaterQualityPrediction(
         measurement_id=measurement_id,
         is_potable=is_potable,
@@ -54,10 +65,24 @@ def create_prediction(
         quality_category=quality_category,
     )
     db.add(db_prediction)
+    if replaces and measurement.timestamp is not None:
+        # The reading was counted with its previous WQI; recount its day
+        db.flush()
+        rebuild_rollup_day(db.connection(), measurement.user_id, measurement.location, measurement.timestamp)
+    elif measurement is not None:
+        _add_to_rollups(db, measurement, wqi_value, parameters=False)
     db.commit()
     db.refresh(db_prediction)
     return db_prediction
 
+def _add_to_rollups(db: Session, measurement: models.WaterQualityMeasurement, wqi_value: Optional[float],
+                    parameters: bool = True):
+    values = {name: getattr(measurement, name) for name in MEASUREMENT_PARAMETERS} if parameters else {}
+    values.update(user_id=measurement.user_id, location=measurement.location)
+    statement = reading_rollup(db.get_bind().dialect.name, values, measurement.timestamp, wqi_value)
+    if statement is not None:
+        db.execute(statement)
+
 def create_recommendation(
     db: Session,
     measurement_id: int,
@@ -82,25 +107,287 @@ def create_recommendation(
     db.refresh(db_recommendation)
     return db_recommendation
 
+def create_measurement_with_prediction(
+    db: Session,
+    measurement: Dict,
+    prediction: Dict,
+    recommendations: Sequence[Dict] = (),
+) -> Dict:
+    """Insert a measurement, its prediction and its recommendations as one unit of work.
+
+    The create_* functions above commit and refresh per row; here the
+    statements share one transaction and one commit, and the IDs come back
+    through INSERT ... RETURNING. Recommendations go in as a single
+    multi-row INSERT, and the reading's rollups as one upsert. Returns
+    measurement_id, prediction_id, recommendation_ids (in input order) and
+    the measurement timestamp.
+    """
+    Measurement, Prediction = models.WaterQualityMeasurement, models.WaterQualityPrediction
+    measurement_id, timestamp = db.execute(
+        insert(Measurement).values(**measurement).returning(Measurement.id, Measurement.timestamp)
+    ).one()
+    prediction_id = db.execute(
+        insert(Prediction).values(measurement_id=measurement_id, **prediction).returning(Prediction.id)
+    ).scalar_one()
+    recommendation_ids = []
+    if recommendations:
+        # sort_by_parameter_order would make SQLite fall back to one INSERT
+        # per row; the ids of one multi-row INSERT ascend in VALUES order
+        recommendation_ids = sorted(db.scalars(
+            insert(models.Recommendation).returning(models.Recommendation.id),
+            [dict(recommendation, measurement_id=measurement_id) for recommendation in recommendations]
+        ))
+    rollup = reading_rollup(db.get_bind().dialect.name, measurement, timestamp, prediction.get("wqi_value"))
+    if rollup is not None:
+        db.execute(rollup)
+    db.commit()
+    return {
+        "measurement_id": measurement_id,
+        "prediction_id": prediction_id,
+        "recommendation_ids": recommendation_ids,
+        "timestamp": timestamp,
+    }
+
 def get_measurement(db: Session, measurement_id: int) -> Optional[models.WaterQualityMeasurement]:
     return db.query(models.WaterQualityMeasurement).filter(models.WaterQualityMeasurement.id == measurement_id).first()
 
 def get_measurements(
     db: Session,
-    user_id: int,
+    user_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
 ) -> List[models.WaterQualityMeasurement]:
-    query = db.query(models.WaterQualityMeasurement).filter(models.WaterQualityMeasurement.user_id == user_id)
-    
+    query = db.query(models.WaterQualityMeasurement).filter(*_measurement_filters(user_id, start_date, end_date))
+    return query.order_by(
+        models.WaterQualityMeasurement.timestamp.desc(), models.WaterQualityMeasurement.id.desc()
+    ).offset(skip).limit(limit).all()
+
+MEASUREMENT_PARAMETERS = models.MEASUREMENT_PARAMETERS
+
+def _measurement_filters(
+    user_id: Optional[int],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    location: Optional[str] = None,
+) -> list:
+    filters = []
+    if user_id is not None:
+        filters.append(models.WaterQualityMeasurement.user_id == user_id)
+    if location is not None:
+        filters.append(models.WaterQualityMeasurement.location == location)
     if start_date:
-        query = query.filter(models.WaterQualityMeasurement.timestamp >= start_date)
+        filters.append(models.WaterQualityMeasurement.timestamp >= start_date)
     if end_date:
-        query = query.filter(models.WaterQualityMeasurement.timestamp <= end_date)
-    
-    return query.order_by(models.WaterQualityMeasurement.timestamp.desc()).offset(skip).limit(limit).all()
+        filters.append(models.WaterQualityMeasurement.timestamp <= end_date)
+    return filters
+
+def _prediction_filters(start_date: Optional[datetime]) -> list:
+    # A prediction is never older than its reading, so readings from start_date on
+    # only have predictions from start_date on; the bound lets PostgreSQL skip
+    # older prediction partitions (database/partitions.py)
+    if start_date:
+        return [models.WaterQualityPrediction.timestamp >= start_date]
+    return []
+
+def _latest_predictions(filters: list, start_date: Optional[datetime] = None):
+    """Predictions of the measurements matching filters, ranked newest first per measurement.
+
+    Returns the aliased prediction entity and the rank column; join on
+    rank == 1 for each measurement's latest prediction.
+    """
+    Measurement, Prediction = models.WaterQualityMeasurement, models.WaterQualityPrediction
+    ranked = (
+        select(
+            Prediction,
+            func.row_number().over(
+                partition_by=Prediction.measurement_id,
+                order_by=(Prediction.timestamp.desc(), Prediction.id.desc()),
+            ).label("rank"),
+        )
+        .join(Measurement, Measurement.id == Prediction.measurement_id)
+        .where(*filters, *_prediction_filters(start_date))
+        .subquery()
+    )
+    return aliased(Prediction, ranked), ranked.c.rank
+
+def get_measurements_with_latest_prediction(
+    db: Session,
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> List[Tuple[models.WaterQualityMeasurement, Optional[models.WaterQualityPrediction]]]:
+    """get_measurements paired with each measurement's latest prediction (or None), in one query"""
+    query = measurements_with_latest_prediction_query(user_id, start_date, end_date, skip, limit)
+    return [tuple(row) for row in db.execute(query)]
+
+def measurements_with_latest_prediction_query(
+    user_id: int,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Select:
+    """SELECT of (measurement, latest prediction) rows, shared with async_crud.
+
+    The predictions of the selected measurements are ranked per measurement
+    with ROW_NUMBER() and the top one is outer-joined back, instead of one
+    query per measurement. Ties on timestamp go to the higher id, in the
+    ranking and in the page order, so pages are stable.
+    """
+    Measurement = models.WaterQualityMeasurement
+    filters = _measurement_filters(user_id, start_date, end_date)
+    latest, rank = _latest_predictions(filters, start_date)
+    return (
+        select(Measurement, latest)
+        .outerjoin(latest, and_(latest.measurement_id == Measurement.id, rank == 1))
+        .where(*filters)
+        .order_by(Measurement.timestamp.desc(), Measurement.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+
+def get_measurement_columns(
+    db: Session,
+    columns: Sequence[str] = MEASUREMENT_PARAMETERS,
+    as_arrays: bool = False,
+    **page,
+) -> Tuple[object, Optional[int]]:
+    """One page of measurements, newest first, as (data, next_cursor).
+
+    Only id, timestamp and the named columns are selected; no ORM objects
+    are built. data is a list of (id, timestamp, *columns) tuples, or with
+    as_arrays a dict of NumPy arrays keyed by column name. next_cursor is
+    the string to pass as cursor for the following page, or None on the
+    last one. page takes the arguments of measurement_columns_query.
+    """
+    query = measurement_columns_query(columns, **page)
+    return measurement_columns_result(db.execute(query).all(), query, page.get("limit", 100), as_arrays)
+
+def measurement_columns_query(
+    columns: Sequence[str] = MEASUREMENT_PARAMETERS,
+    user_id: Optional[int] = None,
+    location: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = 100,
+    prediction_columns: Sequence[str] = (),
+) -> Select:
+    """SELECT id, timestamp and columns ordered by (timestamp, id) descending, shared with async_crud.
+
+    Pages are keyset-based: cursor holds the (timestamp, id) of the last
+    row of the previous page, and the next page starts strictly below it,
+    so there is no OFFSET to walk through and the page stays put when that
+    row has since been deleted. The timestamp is kept as the database
+    stores it (see StoredTimestamp). With a limit, the stored timestamp is
+    selected last for the next cursor; measurement_columns_result drops it.
+    prediction_columns adds columns of each measurement's latest
+    prediction (NULL when it has none).
+    """
+    Measurement, Prediction = models.WaterQualityMeasurement, models.WaterQualityPrediction
+    selected = [Measurement.id, Measurement.timestamp]
+    selected += [_column(Measurement, name) for name in columns]
+    # Latest prediction by one index lookup per row on (measurement_id, timestamp);
+    # joining the ranked subquery instead can leave SQLite scanning it per row
+    selected += [
+        select(_column(Prediction, name))
+        .where(Prediction.measurement_id == Measurement.id, *_prediction_filters(start_date))
+        .order_by(Prediction.timestamp.desc(), Prediction.id.desc())
+        .limit(1)
+        .scalar_subquery()
+        .label(name)
+        for name in prediction_columns
+    ]
+    if limit is not None:
+        selected.append(type_coerce(Measurement.timestamp, StoredTimestamp()).label("cursor_timestamp"))
+    filters = _measurement_filters(user_id, start_date, end_date, location)
+    if cursor is not None:
+        after_id, stored = decode_cursor(cursor)
+        bound = literal(stored, StoredTimestamp())
+        filters += [
+            Measurement.timestamp <= bound,
+            or_(Measurement.timestamp < bound, Measurement.id < after_id),
+        ]
+    return (
+        select(*selected)
+        .where(*filters)
+        .order_by(Measurement.timestamp.desc(), Measurement.id.desc())
+        .limit(limit)
+    )
+
+class StoredTimestamp(TypeDecorator):
+    """A timestamp as the text of a page cursor, compared the way the database stores it.
+
+    SQLite keeps timestamps as text, and one written by the server default
+    ("YYYY-MM-DD HH:MM:SS") does not compare equal to the same instant bound
+    from a datetime ("YYYY-MM-DD HH:MM:SS.000000"), so there the cursor
+    carries the stored text itself. Elsewhere it is an ISO timestamp.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "sqlite":
+            return value
+        return datetime.fromisoformat(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return value.isoformat()
+
+def encode_cursor(measurement_id: int, stored_timestamp: str) -> str:
+    return base64.urlsafe_b64encode(f"{measurement_id}|{stored_timestamp}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """(id, stored timestamp) of a page cursor; ValueError if it is not one"""
+    try:
+        measurement_id, stored_timestamp = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return int(measurement_id), stored_timestamp
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+def measurement_columns_result(rows: list, query: Select, limit: Optional[int], as_arrays: bool) -> Tuple[object, Optional[int]]:
+    names = [column.name for column in query.selected_columns]
+    next_cursor = None
+    if limit is not None:
+        # The stored timestamp selected for the cursor is not part of the data
+        if len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][-1])
+        rows = [tuple(row)[:-1] for row in rows]
+        names = names[:-1]
+    if not as_arrays:
+        return [tuple(row) for row in rows], next_cursor
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    arrays = {"id": np.array(values[0], dtype=np.int64), "timestamp": np.array(values[1], dtype=object)}
+    for name, column in zip(names[2:], values[2:]):
+        # NULL readings become NaN
+        arrays[name] = np.array(column, dtype=float)
+    return arrays, next_cursor
+
+def _column(entity, name: str):
+    if name not in inspect(entity).mapper.column_attrs:
+        raise ValueError(f"Unknown column: {name}")
+    return getattr(entity, name)
+
+def get_rollup_series(
+    db: Session,
+    parameters: Sequence[str],
+    granularity: str = "day",
+    **filters,
+) -> Dict:
+    """{parameter: [(bucket, RollupStats), ...]} from the rollups; filters as rollups.rollup_query"""
+    return rollup_series(db.execute(rollup_query(parameters, granularity, **filters)))
 
 def get_predictions_by_measurement(
     db: Session,
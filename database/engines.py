@@ -0,0 +1,187 @@
+"""One engine per database URL per process, with pool settings and pool metrics.
+
+get_engine / get_async_engine return the same engine for the same URL, so
+everything in a worker shares one pool per driver. Pool settings come from
+the environment:
+
+    DB_POOL_SIZE=5          connections kept open per pool
+    DB_MAX_OVERFLOW=10      extra connections opened under load, closed when returned
+    DB_POOL_TIMEOUT=30      seconds to wait for a connection before TimeoutError
+    DB_POOL_RECYCLE=1800    replace connections older than this (seconds, -1 disables)
+    DB_POOL_PRE_PING=true   test each connection on checkout
+
+The sync and async engines each get a pool, so a worker can hold up to
+2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections; size against the
+server's connection limit divided by the number of workers.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def pool_settings() -> dict:
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+
+
+class PoolMetrics:
+    """Checkout latency, utilisation and overflow for one pool"""
+
+    def __init__(self, window: int = 10000):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.total_checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        self.recent_checkout_seconds = deque(maxlen=window)
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record_checkout(self, seconds: float, pool):
+        with self.lock:
+            self.checkouts += 1
+            self.total_checkout_seconds += seconds
+            self.max_checkout_seconds = max(self.max_checkout_seconds, seconds)
+            self.recent_checkout_seconds.append(seconds)
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def snapshot(self, pool) -> dict:
+        with self.lock:
+            recent = sorted(self.recent_checkout_seconds)
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "utilisation": checked_out / capacity if capacity else 0.0,
+            "peak_checked_out": self.peak_checked_out,
+            "peak_overflow": max(self.peak_overflow, 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "mean_checkout_ms": self.total_checkout_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+            "p50_checkout_ms": percentile(0.50),
+            "p99_checkout_ms": percentile(0.99),
+            "max_checkout_ms": self.max_checkout_seconds * 1000,
+        }
+
+
+class _MeteredPool:
+    """Times Pool.connect(): waiting for a free slot, pre-ping and opening new connections"""
+
+    metrics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            with self.metrics.lock:
+                self.metrics.timeouts += 1
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started, self)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class MeteredQueuePool(_MeteredPool, QueuePool):
+    pass
+
+
+class MeteredAsyncQueuePool(_MeteredPool, AsyncAdaptedQueuePool):
+    pass
+
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def _pool_arguments(url: str, poolclass) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's pool for it
+        return {}
+    return dict(pool_settings(), poolclass=poolclass)
+
+
+def _register(key: tuple, engine, sync_engine):
+    metrics = PoolMetrics()
+    if isinstance(sync_engine.pool, _MeteredPool):
+        sync_engine.pool.metrics = metrics
+
+        @event.listens_for(sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with metrics.lock:
+                metrics.connects += 1
+
+        @event.listens_for(sync_engine, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with metrics.lock:
+                metrics.invalidations += 1
+
+    _engines[key] = engine
+    return engine
+
+
+def get_engine(url: str):
+    """The process-wide Engine for url"""
+    key = ("sync", url)
+    with _lock:
+        if key not in _engines:
+            engine = create_engine(url, **_pool_arguments(url, MeteredQueuePool))
+            _register(key, engine, engine)
+        return _engines[key]
+
+
+def get_async_engine(url: str):
+    """The process-wide AsyncEngine for url"""
+    key = ("async", url)
+    with _lock:
+        if key not in _engines:
+            engine = create_async_engine(url, **_pool_arguments(url, MeteredAsyncQueuePool))
+            _register(key, engine, engine.sync_engine)
+        return _engines[key]
+
+
+def pool_snapshot() -> dict:
+    """Pool metrics of every registered engine, keyed by kind and password-masked URL"""
+    snapshot = {}
+    with _lock:
+        engines = list(_engines.items())
+    for (kind, _), engine in engines:
+        sync_engine = getattr(engine, "sync_engine", engine)
+        pool = sync_engine.pool
+        name = f"{kind}:{sync_engine.url.render_as_string(hide_password=True)}"
+        if isinstance(pool, _MeteredPool):
+            snapshot[name] = pool.metrics.snapshot(pool)
+        else:
+            snapshot[name] = {"pool": type(pool).__name__, "status": pool.status()}
+    return snapshot
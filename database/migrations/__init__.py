@@ -0,0 +1,137 @@
+"""Versioned schema migrations.
+
+Each mNNNN_<name>.py module in this package defines VERSION (NNNN) and
+upgrade(connection). migrate() applies those not yet recorded in the
+schema_migrations table, in version order, each in its own transaction
+together with its schema_migrations row. A module that sets
+TRANSACTIONAL = False (statements such as CREATE INDEX CONCURRENTLY) gets
+an autocommit connection instead and is recorded once upgrade() returns,
+so its upgrade() must be safe to run again after a failure.
+
+init_db.py runs Base.metadata.create_all() for missing tables and then
+migrate() for existing ones, so every migration must be a no-op against a
+schema create_all() built from the current models (check before ALTER,
+CREATE INDEX IF NOT EXISTS). Migrations can rewrite tables under
+exclusive locks, so they only run from that admin step or this module;
+app startup just reports pending_migrations().
+
+Usage:
+    python -m database.migrations [--list] [--target N]
+"""
+import importlib
+import pkgutil
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, inspect, select
+from sqlalchemy.sql import text
+
+SCHEMA_MIGRATIONS = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+# Serialises migrate() across processes on PostgreSQL (pg_advisory_xact_lock)
+_LOCK_KEY = 0x5751_4D49  # "WQMI"
+
+_MODULE_NAME = re.compile(r"^m(\d{4})_(\w+)$")
+
+
+def discover() -> list:
+    """(version, name, module) for every migration in this package, by version"""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        if module.VERSION != int(match.group(1)):
+            raise ValueError(f"{info.name} declares VERSION {module.VERSION}")
+        migrations.append((module.VERSION, match.group(2), module))
+    migrations.sort(key=lambda migration: migration[0])
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise ValueError(f"Duplicate migration versions: {versions}")
+    return migrations
+
+
+def applied_versions(connection) -> set:
+    return set(connection.execute(select(SCHEMA_MIGRATIONS.c.version)).scalars())
+
+
+def pending_migrations(connection) -> list:
+    """(version, name) of the migrations not yet applied, by version"""
+    done = applied_versions(connection) if inspect(connection).has_table(SCHEMA_MIGRATIONS.name) else set()
+    return [(version, name) for version, name, _ in discover() if version not in done]
+
+
+def migrate(engine, target: int = None, progress=print) -> list:
+    """Apply pending migrations up to target (default: all); returns the versions applied"""
+    SCHEMA_MIGRATIONS.create(bind=engine, checkfirst=True)
+    applied = []
+    for version, name, module in discover():
+        if target is not None and version > target:
+            break
+        if not getattr(module, "TRANSACTIONAL", True):
+            if _apply_outside_transaction(engine, version, name, module):
+                applied.append(version)
+                progress(f"Applied migration {version:04d} {name}")
+            continue
+        with engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+            # Re-read under the lock: another process may have got here first
+            if version in applied_versions(connection):
+                continue
+            module.upgrade(connection)
+            connection.execute(insert(SCHEMA_MIGRATIONS).values(
+                version=version, name=name, applied_at=datetime.now(timezone.utc)
+            ))
+        applied.append(version)
+        progress(f"Applied migration {version:04d} {name}")
+    return applied
+
+
+def _apply_outside_transaction(engine, version: int, name: str, module) -> bool:
+    """Run a TRANSACTIONAL = False migration on an autocommit connection; False if already applied"""
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        postgresql = connection.dialect.name == "postgresql"
+        if postgresql:
+            # Session-level: held across the statements, each its own transaction
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _LOCK_KEY})
+        try:
+            if version in applied_versions(connection):
+                return False
+            module.upgrade(connection)
+            connection.execute(insert(SCHEMA_MIGRATIONS).values(
+                version=version, name=name, applied_at=datetime.now(timezone.utc)
+            ))
+        finally:
+            if postgresql:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+    return True
+
+
+def main():
+    import argparse
+    from ..config import engine
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--list", action="store_true", help="Show migrations and whether they are applied")
+    parser.add_argument("--target", type=int, default=None, help="Stop after this version")
+    args = parser.parse_args()
+
+    if args.list:
+        SCHEMA_MIGRATIONS.create(bind=engine, checkfirst=True)
+        with engine.connect() as connection:
+            done = applied_versions(connection)
+        for version, name, module in discover():
+            print(f"{version:04d} {name:<28} {'applied' if version in done else 'pending'}  {module.__doc__}")
+        return
+
+    if not migrate(engine, target=args.target):
+        print("Schema is up to date")
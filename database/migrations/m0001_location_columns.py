@@ -0,0 +1,19 @@
+"""Add latitude and longitude columns to water_quality_measurements"""
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+
+VERSION = 1
+
+
+def upgrade(connection):
+    existing_columns = {c["name"] for c in inspect(connection).get_columns("water_quality_measurements")}
+
+    # Add latitude column if it doesn't exist
+    if "latitude" not in existing_columns:
+        connection.execute(text("ALTER TABLE water_quality_measurements ADD COLUMN latitude FLOAT"))
+        print("Added latitude column")
+
+    # Add longitude column if it doesn't exist
+    if "longitude" not in existing_columns:
+        connection.execute(text("ALTER TABLE water_quality_measurements ADD COLUMN longitude FLOAT"))
+        print("Added longitude column")
@@ -0,0 +1,12 @@
+"""Add the location column that the dashboards and schemas filter on"""
+from sqlalchemy import inspect
+from sqlalchemy.sql import text
+
+VERSION = 2
+
+
+def upgrade(connection):
+    existing_columns = {c["name"] for c in inspect(connection).get_columns("water_quality_measurements")}
+    if "location" not in existing_columns:
+        connection.execute(text("ALTER TABLE water_quality_measurements ADD COLUMN location VARCHAR"))
+        print("Added location column")
@@ -0,0 +1,29 @@
+"""Composite indexes for the hot query shapes (see database/query_plans.py)"""
+from sqlalchemy.sql import text
+
+VERSION = 3
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+TRANSACTIONAL = False
+
+INDEXES = {
+    "ix_measurements_user_id_timestamp": 'ON water_quality_measurements (user_id, "timestamp" DESC)',
+    "ix_measurements_location_timestamp": 'ON water_quality_measurements (location, "timestamp")',
+    "ix_predictions_measurement_id_timestamp": 'ON water_quality_predictions (measurement_id, "timestamp" DESC)',
+}
+
+
+def upgrade(connection):
+    if connection.dialect.name != "postgresql":
+        for name, definition in INDEXES.items():
+            connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} {definition}"))
+        return
+    # Built without blocking writes to the tables; an interrupted build leaves
+    # an invalid index behind, which IF NOT EXISTS would keep, so drop it first
+    for name, definition in INDEXES.items():
+        invalid = connection.scalar(
+            text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+        )
+        if invalid:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+        connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}"))
@@ -0,0 +1,36 @@
+"""Hourly/daily rollup table, filled from the existing readings"""
+from sqlalchemy import (
+    Column, DateTime, Float, Index, Integer, MetaData, String, Table, UniqueConstraint, inspect,
+)
+
+VERSION = 4
+
+# The table as this migration creates it; later changes get their own migration
+MEASUREMENT_ROLLUPS = Table(
+    "measurement_rollups",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("granularity", String, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Column("location", String, nullable=False),
+    Column("parameter", String, nullable=False),
+    Column("bucket", DateTime(timezone=True), nullable=False),
+    Column("count", Integer, nullable=False),
+    Column("total", Float, nullable=False),
+    Column("total_sq", Float, nullable=False),
+    Column("minimum", Float, nullable=False),
+    Column("maximum", Float, nullable=False),
+    Column("last_value", Float, nullable=False),
+    Column("last_timestamp", DateTime(timezone=True), nullable=False),
+    UniqueConstraint("granularity", "user_id", "location", "parameter", "bucket", name="uq_measurement_rollups_key"),
+    Index("ix_measurement_rollups_parameter_bucket", "granularity", "parameter", "bucket"),
+)
+
+
+def upgrade(connection):
+    from database.rollups import rebuild_rollups
+
+    if not inspect(connection).has_table("measurement_rollups"):
+        MEASUREMENT_ROLLUPS.create(connection)
+    # Readings stored before the rollups existed
+    rebuild_rollups(connection)
@@ -0,0 +1,85 @@
+"""Monthly partitions for readings, predictions and recommendations (PostgreSQL only)"""
+from datetime import datetime, timezone
+
+from sqlalchemy.sql import text
+
+from database.partitions import (
+    PARTITIONED_TABLES, add_months, create_partition, is_partitioned, month_start, months_ahead,
+)
+
+VERSION = 5
+
+# Rows need a timestamp to be routed; a child's best stand-in is its reading's
+FILL_TIMESTAMPS = {
+    "water_quality_measurements": 'UPDATE water_quality_measurements SET "timestamp" = now() WHERE "timestamp" IS NULL',
+    "water_quality_predictions": (
+        'UPDATE water_quality_predictions p SET "timestamp" = COALESCE('
+        '(SELECT m."timestamp" FROM water_quality_measurements m WHERE m.id = p.measurement_id), now()) '
+        'WHERE p."timestamp" IS NULL'
+    ),
+    "recommendations": (
+        'UPDATE recommendations r SET "timestamp" = COALESCE('
+        '(SELECT m."timestamp" FROM water_quality_measurements m WHERE m.id = r.measurement_id), now()) '
+        'WHERE r."timestamp" IS NULL'
+    ),
+}
+
+# Keys and indexes of each table as of this migration, built on the partitioned table
+CONSTRAINTS = {
+    "water_quality_measurements": [
+        'ALTER TABLE water_quality_measurements ADD PRIMARY KEY (id, "timestamp")',
+        'ALTER TABLE water_quality_measurements ADD FOREIGN KEY (user_id) REFERENCES users (id)',
+        'CREATE INDEX ix_water_quality_measurements_id ON water_quality_measurements (id)',
+        'CREATE INDEX ix_measurements_user_id_timestamp ON water_quality_measurements (user_id, "timestamp" DESC)',
+        'CREATE INDEX ix_measurements_location_timestamp ON water_quality_measurements (location, "timestamp")',
+    ],
+    "water_quality_predictions": [
+        'ALTER TABLE water_quality_predictions ADD PRIMARY KEY (id, "timestamp")',
+        'CREATE INDEX ix_water_quality_predictions_id ON water_quality_predictions (id)',
+        'CREATE INDEX ix_predictions_measurement_id_timestamp '
+        'ON water_quality_predictions (measurement_id, "timestamp" DESC)',
+    ],
+    "recommendations": [
+        'ALTER TABLE recommendations ADD PRIMARY KEY (id, "timestamp")',
+        'CREATE INDEX ix_recommendations_id ON recommendations (id)',
+    ],
+}
+
+
+def partition(connection, table: str):
+    old = f"{table}_unpartitioned"
+    sequence = connection.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table})
+    connection.execute(text(FILL_TIMESTAMPS[table]))
+    connection.execute(text(f'ALTER TABLE "{table}" RENAME TO "{old}"'))
+    # Keep the id sequence when the old table is dropped
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+
+    connection.execute(text(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'
+    ))
+    connection.execute(text(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT'))
+    current = month_start(datetime.now(timezone.utc))
+    first = connection.scalar(text(f'SELECT min("timestamp") FROM "{old}"'))
+    month = min(month_start(first), current) if first is not None else current
+    while month <= add_months(current, months_ahead()):
+        create_partition(connection, table, month)
+        month = add_months(month, 1)
+
+    connection.execute(text(f'INSERT INTO "{table}" SELECT * FROM "{old}"'))
+    # CASCADE drops the foreign keys of predictions and recommendations to the
+    # readings, which a partitioned table cannot reference without the partition
+    # key; database/partitions.py covers what that leaves unchecked
+    connection.execute(text(f'DROP TABLE "{old}" CASCADE'))
+    for statement in CONSTRAINTS[table]:
+        connection.execute(text(statement))
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+
+
+def upgrade(connection):
+    if connection.dialect.name != "postgresql":
+        return
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            partition(connection, table)
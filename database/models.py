@@ -1,13 +1,24 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.config import Base
 
+# Reading columns, in the order the API and the recommender use them
+MEASUREMENT_PARAMETERS = (
+    "temperature", "dissolved_oxygen", "ph", "conductivity",
+    "bod", "nitrate", "fecal_coliform", "total_coliform",
+)
+
+# On PostgreSQL, migration 5 partitions water_quality_measurements,
+# water_quality_predictions and recommendations by month on timestamp
+# (database/partitions.py): their primary keys there are (id, timestamp) and
+# the measurement_id foreign keys are not enforced by the database.
 class WaterQualityMeasurement(Base):
     __tablename__ = "water_quality_measurements"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
+    location = Column(String, nullable=True)
     latitude = Column(Float)
     longitude = Column(Float)
     temperature = Column(Float)
@@ -20,6 +31,14 @@ class WaterQualityMeasurement(Base):
     total_coliform = Column(Float)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Kept in step with database/migrations/m0003_hot_query_indexes.py
+    __table_args__ = (
+        # crud.get_measurements: one user's readings, newest first
+        Index("ix_measurements_user_id_timestamp", user_id, timestamp.desc()),
+        # utils/dashboard.py and utils/visualization.py: one location over a period
+        Index("ix_measurements_location_timestamp", location, timestamp),
+    )
+
     predictions = relationship("WaterQualityPrediction", back_populates="measurement")
     recommendations = relationship("Recommendation", back_populates="measurement")
     user = relationship("User", back_populates="measurements")
@@ -35,6 +54,11 @@ class WaterQualityPrediction(Base):
     quality_category = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Latest prediction for a measurement
+        Index("ix_predictions_measurement_id_timestamp", measurement_id, timestamp.desc()),
+    )
+
     measurement = relationship("WaterQualityMeasurement", back_populates="predictions")
 
 class Recommendation(Base):
@@ -64,4 +88,47 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
-    measurements = relationship("WaterQualityMeasurement", back_populates="user") 
\ No newline at end of file
+    measurements = relationship("WaterQualityMeasurement", back_populates="user") 
+
+class BackfillCheckpoint(Base):
+    """Progress of a resumable backfill job (see database/backfill.py)"""
+    __tablename__ = "backfill_checkpoints"
+
+    job_name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+class MeasurementRollup(Base):
+    """Hourly/daily aggregates of one reading column (or "wqi") per user and location.
+
+    Maintained by database/rollups.py in the transaction that stores each
+    reading. Readings without a user or location are rolled up under
+    user_id 0 and location "", so every key column is non-null and the
+    unique key can be the upsert target.
+    """
+    __tablename__ = "measurement_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String, nullable=False)  # "hour" or "day"
+    user_id = Column(Integer, nullable=False)
+    location = Column(String, nullable=False)
+    parameter = Column(String, nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # bucket start, UTC
+    count = Column(Integer, nullable=False)
+    total = Column(Float, nullable=False)
+    total_sq = Column(Float, nullable=False)
+    minimum = Column(Float, nullable=False)
+    maximum = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+
+    # Kept in step with database/migrations/m0004_measurement_rollups.py
+    __table_args__ = (
+        # Upsert target; also serves one user's series
+        UniqueConstraint("granularity", "user_id", "location", "parameter", "bucket", name="uq_measurement_rollups_key"),
+        # One parameter across all users
+        Index("ix_measurement_rollups_parameter_bucket", "granularity", "parameter", "bucket"),
+    )
@@ -0,0 +1,338 @@
+"""Monthly partitions of the reading, prediction and recommendation tables, with retention.
+
+On PostgreSQL, migration 5 turns each of PARTITIONED_TABLES into a table
+range-partitioned on "timestamp": one partition per UTC month, named
+<table>_pYYYYMM, plus <table>_default for rows no month partition covers.
+PostgreSQL needs the partition key in every unique constraint, so the
+primary keys become (id, timestamp) and the foreign keys from predictions
+and recommendations to water_quality_measurements are dropped (the ORM
+relationships do not need them). Queries bounded on "timestamp", as the
+dashboard and trend queries are, only read the partitions of their window.
+
+What the database no longer enforces there: id alone is unique only
+because every insert takes it from the table's sequence (rows inserted
+with explicit ids are not checked), and a prediction or recommendation
+can outlive its reading. Retention removes a reading's children with it,
+including those stored in later months (a re-prediction or backfill of an
+old reading), and "python -m database.partitions check" reports
+duplicate ids and orphaned rows.
+
+ensure_partitions() creates the partitions for the current month and the
+next DB_PARTITION_MONTHS_AHEAD (default 3), and for any month whose rows
+landed in a default partition. init_db.py runs it after the migrations;
+on long-running deployments also run "python -m database.partitions ensure"
+monthly from cron. Rows of months without a partition wait in the default
+partition until then.
+
+apply_retention() removes the months before the last DB_RETENTION_MONTHS.
+Each expired partition is detached (a catalog change, no DELETE), exported
+to DB_ARCHIVE_DIR/<table>/<YYYY-MM>.csv.gz when an archive directory is set,
+and dropped, one partition per transaction. Predictions and
+recommendations of an expired month's readings that sit in later months
+are archived to <table>/<YYYY-MM>-late.csv.gz and deleted in the same
+transaction as the readings. The rollups are kept, so the
+dashboards' long-range history outlives the raw readings. SQLite has no
+partitions; there the same months are archived and then deleted by range.
+
+Usage:
+    python -m database.partitions status
+    python -m database.partitions check
+    python -m database.partitions ensure [--months-ahead 3]
+    python -m database.partitions retention [--keep-months 24] [--archive-dir DIR] [--dry-run]
+"""
+import csv
+import gzip
+import os
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import MetaData, Table, column, delete, exists, func, or_, select
+from sqlalchemy.sql import text
+
+from .rollups import as_utc
+
+# Parents before children: migration 5 drops the old measurements table with CASCADE
+PARTITIONED_TABLES = ("water_quality_measurements", "water_quality_predictions", "recommendations")
+
+# Rows that belong to a reading through measurement_id
+CHILD_TABLES = ("water_quality_predictions", "recommendations")
+
+# Serialises partition changes across workers starting at once (pg_advisory_xact_lock)
+_LOCK_KEY = 0x5751_5054  # "WQPT"
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def months_ahead() -> int:
+    return int(os.getenv("DB_PARTITION_MONTHS_AHEAD", "3"))
+
+
+def retention_months() -> Optional[int]:
+    """Months of raw readings to keep, or None (DB_RETENTION_MONTHS unset) to keep everything"""
+    value = os.getenv("DB_RETENTION_MONTHS")
+    return int(value) if value else None
+
+
+def month_start(timestamp: datetime) -> datetime:
+    return as_utc(timestamp).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.scalar(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table},
+    )
+
+
+def partitions(connection, table: str) -> List[Tuple[str, Optional[datetime]]]:
+    """(name, month) of the partitions attached to table, by month; month is None for the default"""
+    names = connection.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:table)"),
+        {"table": table},
+    ).scalars()
+    attached = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        month = None
+        if match and match["table"] == table:
+            month = datetime(int(match["year"]), int(match["month"]), 1, tzinfo=timezone.utc)
+        attached.append((name, month))
+    return sorted(attached, key=lambda partition: (partition[1] is None, partition[1] and partition[1].timestamp()))
+
+
+def create_partition(connection, table: str, month: datetime) -> bool:
+    """Attach the partition for month unless it exists, moving its rows out of the default partition"""
+    name = partition_name(table, month)
+    if connection.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None:
+        return False
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    connection.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS)'))
+    # ATTACH fails while the default partition holds rows of the new range
+    connection.execute(
+        text(f'WITH moved AS (DELETE FROM "{table}_default" '
+             f'WHERE "timestamp" >= :lower AND "timestamp" < :upper RETURNING *) '
+             f'INSERT INTO "{name}" SELECT * FROM moved'),
+        {"lower": lower, "upper": upper},
+    )
+    connection.execute(text(
+        f"""ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM ('{lower}') TO ('{upper}')"""
+    ))
+    return True
+
+
+def ensure_partitions(connection, months: Optional[int] = None, now: Optional[datetime] = None,
+                      progress=print) -> List[str]:
+    """Create missing month partitions (current month, months ahead, months in the defaults); returns their names"""
+    if connection.dialect.name != "postgresql":
+        return []
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+    current = month_start(now or datetime.now(timezone.utc))
+    ahead = months_ahead() if months is None else months
+    upcoming = {add_months(current, offset) for offset in range(ahead + 1)}
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        stray = connection.execute(text(
+            f"""SELECT DISTINCT date_trunc('month', "timestamp", 'UTC') FROM "{table}_default" """
+        )).scalars()
+        for month in sorted(upcoming | {month_start(timestamp) for timestamp in stray}):
+            if create_partition(connection, table, month):
+                created.append(partition_name(table, month))
+    if created:
+        progress(f"Created partitions: {', '.join(created)}")
+    return created
+
+
+def archive_rows(connection, query, path: Path) -> int:
+    """Write the rows of query to a gzipped CSV with a header row; returns the row count"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + ".partial")
+    result = connection.execute(query, execution_options={"yield_per": 10000})
+    rows = 0
+    with gzip.open(partial, "wt", newline="") as stream:
+        writer = csv.writer(stream)
+        writer.writerow(result.keys())
+        for row in result:
+            writer.writerow(row)
+            rows += 1
+    # Only complete exports get the final name
+    os.replace(partial, path)
+    return rows
+
+
+def remove_late_children(connection, readings, month: datetime, archive_dir: Optional[str] = None,
+                         progress=print) -> int:
+    """Delete the predictions and recommendations of readings (a SELECT of ids from month)
+    that are stored after month, archiving them first; returns the rows removed.
+
+    Their own months expire later than the reading's, so they would be left orphaned.
+    """
+    upper = add_months(month, 1)
+    removed = 0
+    for child in CHILD_TABLES:
+        stored = Table(child, MetaData(), autoload_with=connection)
+        late = (stored.c.measurement_id.in_(readings), or_(stored.c.timestamp >= upper, stored.c.timestamp.is_(None)))
+        if not connection.scalar(select(func.count()).select_from(stored).where(*late)):
+            continue
+        if archive_dir:
+            path = Path(archive_dir) / child / f"{month:%Y-%m}-late.csv.gz"
+            archive_rows(connection, select(stored).where(*late), path)
+        rows = connection.execute(delete(stored).where(*late)).rowcount
+        progress(f"Removed {rows} {child} rows of {month:%Y-%m} readings stored in later months")
+        removed += rows
+    return removed
+
+
+def expired_months(engine, keep_months: int, now: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+    """(table, month) for every stored month older than the last keep_months, oldest first"""
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1 (the current month is always kept)")
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -(keep_months - 1))
+    expired = []
+    with engine.begin() as connection:
+        ensure_partitions(connection, now=now, progress=lambda message: None)
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(connection, table):
+                months = [month for _, month in partitions(connection, table) if month is not None]
+            else:
+                stored = Table(table, MetaData(), autoload_with=connection)
+                first = connection.scalar(select(func.min(stored.c.timestamp)))
+                months = []
+                month = month_start(first) if first is not None else cutoff
+                while month < cutoff:
+                    months.append(month)
+                    month = add_months(month, 1)
+            expired += [(table, month) for month in months if month < cutoff]
+    return sorted(expired, key=lambda item: (item[1], PARTITIONED_TABLES.index(item[0])))
+
+
+def apply_retention(engine, keep_months: int, archive_dir: Optional[str] = None,
+                    now: Optional[datetime] = None, dry_run: bool = False, progress=print) -> List[Tuple[str, datetime, Optional[int]]]:
+    """Remove (and optionally archive) months older than the last keep_months.
+
+    Returns (table, month, rows archived or None) per removed month. Each
+    month is its own transaction: a failed export leaves that month in place.
+    """
+    removed = []
+    for table, month in expired_months(engine, keep_months, now):
+        if dry_run:
+            progress(f"Would remove {table} {month:%Y-%m}")
+            removed.append((table, month, None))
+            continue
+        path = Path(archive_dir) / table / f"{month:%Y-%m}.csv.gz" if archive_dir else None
+        rows = None
+        with engine.begin() as connection:
+            if is_partitioned(connection, table):
+                name = partition_name(table, month)
+                connection.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                if path is not None:
+                    rows = archive_rows(connection, text(f'SELECT * FROM "{name}"'), path)
+                if table not in CHILD_TABLES:
+                    remove_late_children(connection, select(column("id")).select_from(text(f'"{name}"')), month,
+                                         archive_dir, progress)
+                connection.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                stored = Table(table, MetaData(), autoload_with=connection)
+                in_month = (stored.c.timestamp >= month, stored.c.timestamp < add_months(month, 1))
+                if path is not None:
+                    rows = archive_rows(connection, select(stored).where(*in_month), path)
+                if table not in CHILD_TABLES:
+                    remove_late_children(connection, select(stored.c.id).where(*in_month), month,
+                                         archive_dir, progress)
+                connection.execute(delete(stored).where(*in_month))
+        progress(f"Removed {table} {month:%Y-%m}" + (f", {rows} rows archived to {path}" if path else ""))
+        removed.append((table, month, rows))
+    return removed
+
+
+def integrity(connection) -> dict:
+    """Counts of what the partitioned tables' keys no longer enforce:
+    {"<table> duplicate ids": n} per table and {"<table> orphans": n} per child table"""
+    tables = {name: Table(name, MetaData(), autoload_with=connection) for name in PARTITIONED_TABLES}
+    problems = {}
+    for name, stored in tables.items():
+        duplicates = select(stored.c.id).group_by(stored.c.id).having(func.count() > 1).subquery()
+        problems[f"{name} duplicate ids"] = connection.scalar(select(func.count()).select_from(duplicates))
+    readings = tables["water_quality_measurements"]
+    for name in CHILD_TABLES:
+        stored = tables[name]
+        problems[f"{name} orphans"] = connection.scalar(
+            select(func.count()).select_from(stored).where(
+                stored.c.measurement_id.is_not(None),
+                ~exists().where(readings.c.id == stored.c.measurement_id),
+            )
+        )
+    return problems
+
+
+def status(connection) -> dict:
+    """{table: [(partition, month, estimated rows)]}, empty lists for unpartitioned tables"""
+    tables = {}
+    for table in PARTITIONED_TABLES:
+        tables[table] = []
+        if not is_partitioned(connection, table):
+            continue
+        for name, month in partitions(connection, table):
+            estimate = connection.scalar(
+                text("SELECT greatest(reltuples, 0)::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+                {"name": name},
+            )
+            tables[table].append((name, month, estimate))
+    return tables
+
+
+def main():
+    import argparse
+    from .config import engine
+
+    parser = argparse.ArgumentParser(description="Manage monthly partitions and retention of the reading tables")
+    parser.add_argument("command", choices=["status", "check", "ensure", "retention"])
+    parser.add_argument("--months-ahead", type=int, default=None, help="Partitions to create past the current month")
+    parser.add_argument("--keep-months", type=int, default=retention_months(),
+                        help="Months to keep, including the current one (default: DB_RETENTION_MONTHS)")
+    parser.add_argument("--archive-dir", default=os.getenv("DB_ARCHIVE_DIR"),
+                        help="Export removed months here first (default: DB_ARCHIVE_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="List the months retention would remove")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        with engine.connect() as connection:
+            for table, attached in status(connection).items():
+                print(f"{table}: {'not partitioned' if not attached else f'{len(attached)} partitions'}")
+                for name, month, estimate in attached:
+                    print(f"  {name:<44} {month:%Y-%m} ~{estimate} rows" if month else f"  {name:<44} default ~{estimate} rows")
+    elif args.command == "check":
+        with engine.connect() as connection:
+            problems = integrity(connection)
+        for problem, count in problems.items():
+            print(f"{problem}: {count}")
+        if any(problems.values()):
+            raise SystemExit(1)
+    elif args.command == "ensure":
+        with engine.begin() as connection:
+            if not ensure_partitions(connection, args.months_ahead):
+                print("Partitions are up to date")
+    else:
+        if args.keep_months is None:
+            parser.error("--keep-months or DB_RETENTION_MONTHS is required for retention")
+        if not apply_retention(engine, args.keep_months, args.archive_dir, dry_run=args.dry_run):
+            print("Nothing to remove")
+
+
+if __name__ == "__main__":
+    main()
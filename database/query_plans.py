@@ -0,0 +1,87 @@
+"""Check that the hot queries are served by their composite indexes.
+
+Runs EXPLAIN on each query shape in HOT_QUERIES and asserts the expected
+index name appears in the plan. On PostgreSQL sequential scans are disabled
+for the check, so a small table still reports whether the index is usable,
+and on partitioned tables (database/partitions.py) the index's copy on each
+partition counts as the index.
+
+Usage:
+    python -m database.query_plans
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.sql import text
+
+_END = datetime.now(timezone.utc)
+_START = _END - timedelta(days=30)
+
+# name -> (expected index, SQL, parameters); the shapes crud and the dashboards issue
+HOT_QUERIES = {
+    "measurements_by_user": (
+        "ix_measurements_user_id_timestamp",
+        'SELECT * FROM water_quality_measurements '
+        'WHERE user_id = :user_id AND "timestamp" >= :start AND "timestamp" <= :end '
+        'ORDER BY "timestamp" DESC LIMIT 100',
+        {"user_id": 1, "start": _START, "end": _END},
+    ),
+    "measurements_by_location": (
+        "ix_measurements_location_timestamp",
+        'SELECT * FROM water_quality_measurements '
+        'WHERE location = :location AND "timestamp" >= :start AND "timestamp" <= :end '
+        'ORDER BY "timestamp"',
+        {"location": "Site A", "start": _START, "end": _END},
+    ),
+    "latest_prediction": (
+        "ix_predictions_measurement_id_timestamp",
+        'SELECT * FROM water_quality_predictions '
+        'WHERE measurement_id = :measurement_id AND "timestamp" >= :start ORDER BY "timestamp" DESC LIMIT 1',
+        {"measurement_id": 1, "start": _START},
+    ),
+}
+
+
+def explain(connection, sql: str, params: dict) -> str:
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = connection.execute(text(f"EXPLAIN {sql}"), params)
+        return "\n".join(row[0] for row in rows)
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)
+        return "\n".join(row[-1] for row in rows)
+    raise ValueError(f"Unsupported dialect: {connection.dialect.name}")
+
+
+def index_names(connection, index: str) -> set:
+    """index and, on PostgreSQL, the per-partition indexes attached to it"""
+    if connection.dialect.name != "postgresql":
+        return {index}
+    return {index} | set(connection.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+             "WHERE i.inhparent = to_regclass(:index)"),
+        {"index": index},
+    ).scalars())
+
+
+def check_query_plans(engine) -> dict:
+    """{name: (ok, plan)} for every hot query"""
+    results = {}
+    for name, (index, sql, params) in HOT_QUERIES.items():
+        with engine.begin() as connection:
+            plan = explain(connection, sql, params)
+            names = index_names(connection, index)
+        results[name] = (any(name in plan for name in names), plan)
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    from .config import engine
+
+    failed = False
+    for name, (ok, plan) in check_query_plans(engine).items():
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {name} (expects {HOT_QUERIES[name][0]})")
+        for line in plan.splitlines():
+            print(f"       {line}")
+    sys.exit(1 if failed else 0)
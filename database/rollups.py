@@ -0,0 +1,289 @@
+"""Hourly and daily rollups of the readings, per user and location.
+
+Each reading adds to one measurement_rollups row per granularity and
+parameter (the eight reading columns plus "wqi" from its prediction):
+count, sum, sum of squares, min, max and the value with the latest
+timestamp. The rows are upserted with one multi-row INSERT ... ON CONFLICT
+DO UPDATE in the transaction that stores the reading, so the rollups never
+disagree with committed readings. Mean and standard deviation over any
+set of buckets follow from the sums, so the dashboards read a few hundred
+rollup rows instead of every raw reading in the window.
+
+A reading's WQI comes from its latest prediction. A second prediction for
+a reading replaces the WQI it was counted with, which an upsert cannot
+subtract (min and max), so crud.create_prediction recomputes that user's
+and location's day with rebuild_rollup_day() instead.
+
+rebuild_rollups() recomputes them from the raw tables: after bulk loads
+that bypass crud (seed_data.py), after the WQI backfill, or to repair
+drift. Buckets before the month of the oldest stored reading are left
+alone, so the history of months removed by retention (database/partitions.py)
+survives a rebuild.
+
+Usage:
+    python -m database.rollups rebuild
+"""
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, case, delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .models import MEASUREMENT_PARAMETERS, MeasurementRollup
+
+GRANULARITIES = ("hour", "day")
+ROLLUP_PARAMETERS = MEASUREMENT_PARAMETERS + ("wqi",)
+
+_KEY = ("granularity", "user_id", "location", "parameter", "bucket")
+_UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    # SQLite hands timestamps back naive; they are stored in UTC
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    timestamp = as_utc(timestamp)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def rollup_rows(user_id: Optional[int], location: Optional[str], timestamp: datetime,
+                values: Dict[str, Optional[float]]) -> List[Dict]:
+    """One rollup increment per granularity and non-null value of a single reading"""
+    timestamp = as_utc(timestamp)
+    return [
+        {
+            "granularity": granularity,
+            "user_id": user_id or 0,
+            "location": location or "",
+            "parameter": parameter,
+            "bucket": bucket_start(timestamp, granularity),
+            "count": 1,
+            "total": value,
+            "total_sq": value * value,
+            "minimum": value,
+            "maximum": value,
+            "last_value": value,
+            "last_timestamp": timestamp,
+        }
+        for granularity in GRANULARITIES
+        for parameter, value in values.items()
+        if value is not None
+    ]
+
+
+def rollup_upsert(dialect_name: str, rows: List[Dict]):
+    """INSERT ... ON CONFLICT DO UPDATE adding rows into their buckets (PostgreSQL and SQLite)"""
+    if dialect_name not in _UPSERTS:
+        raise ValueError(f"Rollups need INSERT ... ON CONFLICT; unsupported dialect: {dialect_name}")
+    statement = _UPSERTS[dialect_name](MeasurementRollup).values(rows)
+    new, table = statement.excluded, MeasurementRollup
+    newer = new.last_timestamp >= table.last_timestamp
+    return statement.on_conflict_do_update(
+        index_elements=list(_KEY),
+        set_={
+            "count": table.count + new.count,
+            "total": table.total + new.total,
+            "total_sq": table.total_sq + new.total_sq,
+            "minimum": case((new.minimum < table.minimum, new.minimum), else_=table.minimum),
+            "maximum": case((new.maximum > table.maximum, new.maximum), else_=table.maximum),
+            "last_value": case((newer, new.last_value), else_=table.last_value),
+            "last_timestamp": case((newer, new.last_timestamp), else_=table.last_timestamp),
+        },
+    )
+
+
+def reading_rollup(dialect_name: str, measurement: Dict, timestamp: datetime, wqi_value: Optional[float]):
+    """The rollup upsert for one stored reading, or None when it has no values"""
+    values = {parameter: measurement.get(parameter) for parameter in MEASUREMENT_PARAMETERS}
+    values["wqi"] = wqi_value
+    rows = rollup_rows(measurement.get("user_id"), measurement.get("location"), timestamp, values)
+    return rollup_upsert(dialect_name, rows) if rows else None
+
+
+class RollupStats:
+    """Aggregates of one parameter over one or more buckets"""
+
+    __slots__ = ("count", "total", "total_sq", "minimum", "maximum", "last_value", "last_timestamp")
+
+    def __init__(self, count=0, total=0.0, total_sq=0.0, minimum=math.inf, maximum=-math.inf,
+                 last_value=None, last_timestamp=None):
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.minimum = minimum
+        self.maximum = maximum
+        self.last_value = last_value
+        self.last_timestamp = last_timestamp
+
+    def add(self, value: float, timestamp: datetime):
+        self.merge(RollupStats(1, value, value * value, value, value, value, timestamp))
+
+    def merge(self, other: "RollupStats"):
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        if self.last_timestamp is None or (other.last_timestamp is not None and other.last_timestamp >= self.last_timestamp):
+            self.last_value, self.last_timestamp = other.last_value, other.last_timestamp
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        """Population standard deviation, as np.std"""
+        if not self.count:
+            return 0.0
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+
+def rollup_query(parameters: Sequence[str], granularity: str, start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None, user_id: Optional[int] = None,
+                 location: Optional[str] = None) -> Select:
+    """Rollup rows for the parameters over [start_date, end_date], whole buckets; user/location None means all"""
+    table = MeasurementRollup
+    query = select(
+        table.parameter, table.bucket, table.count, table.total, table.total_sq,
+        table.minimum, table.maximum, table.last_value, table.last_timestamp,
+    ).where(table.granularity == granularity, table.parameter.in_(list(parameters)))
+    if user_id is not None:
+        query = query.where(table.user_id == user_id)
+    if location is not None:
+        query = query.where(table.location == location)
+    if start_date is not None:
+        query = query.where(table.bucket >= bucket_start(start_date, granularity))
+    if end_date is not None:
+        query = query.where(table.bucket <= bucket_start(end_date, granularity))
+    return query.order_by(table.bucket)
+
+
+def rollup_series(rows: Iterable) -> Dict[str, List[Tuple[datetime, RollupStats]]]:
+    """{parameter: [(bucket, stats), ...] in bucket order}, merging rows of the same bucket"""
+    series = {}
+    for parameter, bucket, *values in rows:
+        values[-1] = as_utc(values[-1])
+        buckets = series.setdefault(parameter, {})
+        bucket = as_utc(bucket)
+        if bucket in buckets:
+            buckets[bucket].merge(RollupStats(*values))
+        else:
+            buckets[bucket] = RollupStats(*values)
+    return {parameter: sorted(buckets.items(), key=lambda item: item[0]) for parameter, buckets in series.items()}
+
+
+def summarise(series: List[Tuple[datetime, RollupStats]]) -> RollupStats:
+    total = RollupStats()
+    for _, stats in series:
+        total.merge(stats)
+    return total
+
+
+def _accumulate(rows: Iterable) -> Tuple[Dict[tuple, RollupStats], int, Optional[datetime]]:
+    """Rollup stats by key from (id, timestamp, user_id, location, *ROLLUP_PARAMETERS) rows;
+    also returns the number of readings and the oldest timestamp"""
+    buckets = {}
+    readings = 0
+    first = None
+    for row in rows:
+        _, timestamp, user_id, location, *values = row
+        if timestamp is None:
+            continue
+        readings += 1
+        timestamp = as_utc(timestamp)
+        first = timestamp if first is None else min(first, timestamp)
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(timestamp, granularity)
+            for parameter, value in zip(ROLLUP_PARAMETERS, values):
+                if value is None:
+                    continue
+                key = (granularity, user_id or 0, location or "", parameter, bucket)
+                buckets.setdefault(key, RollupStats()).add(value, timestamp)
+    return buckets, readings, first
+
+
+def _insert_rollups(connection, buckets: Dict[tuple, RollupStats]) -> int:
+    rows = [
+        dict(zip(_KEY, key), count=stats.count, total=stats.total, total_sq=stats.total_sq,
+             minimum=stats.minimum, maximum=stats.maximum, last_value=stats.last_value,
+             last_timestamp=stats.last_timestamp)
+        for key, stats in buckets.items()
+    ]
+    for start in range(0, len(rows), 10000):
+        connection.execute(insert(MeasurementRollup), rows[start:start + 10000])
+    return len(rows)
+
+
+def _readings_query(**filters) -> Select:
+    from .crud import measurement_columns_query
+
+    return measurement_columns_query(
+        ("user_id", "location") + MEASUREMENT_PARAMETERS, limit=None, prediction_columns=("wqi_value",), **filters
+    )
+
+
+def rebuild_rollups(connection, progress=print) -> int:
+    """Recompute the rollup rows from the raw readings in one transaction; returns rows written.
+
+    Only buckets from the month of the oldest reading on are replaced.
+    """
+    rows = connection.execute(_readings_query(), execution_options={"yield_per": 10000})
+    buckets, readings, first = _accumulate(rows)
+    if first is None:
+        progress("No readings; rollups left as they are")
+        return 0
+    since = first.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    connection.execute(delete(MeasurementRollup).where(MeasurementRollup.bucket >= since))
+    written = _insert_rollups(connection, buckets)
+    progress(f"Rebuilt {written} rollup rows from {readings} readings")
+    return written
+
+
+def rebuild_rollup_day(connection, user_id: Optional[int], location: Optional[str], timestamp: datetime) -> int:
+    """Recompute the hourly and daily rollup rows of one user and location for the UTC day of timestamp.
+
+    For changes an upsert cannot add up, such as a newer prediction
+    replacing the WQI a reading was counted with; returns rows written.
+    """
+    day = bucket_start(timestamp, "day")
+    next_day = day + timedelta(days=1)
+    key = (user_id or 0, location or "")
+    rows = connection.execute(_readings_query(
+        user_id=user_id or None, location=location or None, start_date=day, end_date=next_day
+    ))
+    buckets, _, _ = _accumulate(
+        row for row in rows
+        if (row.user_id or 0, row.location or "") == key and as_utc(row.timestamp) < next_day
+    )
+    connection.execute(delete(MeasurementRollup).where(
+        MeasurementRollup.user_id == key[0], MeasurementRollup.location == key[1],
+        MeasurementRollup.bucket >= day, MeasurementRollup.bucket < next_day,
+    ))
+    return _insert_rollups(connection, buckets)
+
+
+def main():
+    import argparse
+    from .config import engine
+
+    parser = argparse.ArgumentParser(description="Maintain the hourly/daily measurement rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    with engine.begin() as connection:
+        rebuild_rollups(connection)
+
+
+if __name__ == "__main__":
+    main()
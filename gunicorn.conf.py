@@ -0,0 +1,21 @@
+"""Gunicorn configuration for multi-worker deployments.
+
+Start with:
+    gunicorn -c gunicorn.conf.py
+
+The app is built by main.create_app() in the master before forking
+(preload_app), so the model bundle and guidelines are loaded once and shared
+copy-on-write by all workers.
+"""
+import multiprocessing
+import os
+
+wsgi_app = "main:create_app()"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('PORT', os.getenv('API_PORT', '8000'))}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
@@ -1,14 +1,15 @@
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from database.models import Base
-from database.config import SQLALCHEMY_DATABASE_URL
+from database.config import engine
+from database.migrations import migrate
+from database.partitions import ensure_partitions
 
 def init_db():
-    # Create database engine
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    
     # Create all tables
     Base.metadata.create_all(engine)
+    migrate(engine)
+    with engine.begin() as connection:
+        ensure_partitions(connection)
     
     # Create session factory
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
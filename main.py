@@ -1,24 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import time
+
+# Marks the start of app import so startup time can be reported once ready
+PROCESS_STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import Response, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
-from database.config import get_db, SessionLocal
-from database import crud, models
+from database.config import async_engine, get_async_db, get_db, SessionLocal
+from database import async_crud, crud, models
+from database import rollups
+from database.engines import pool_snapshot
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import numpy as np
-import joblib
-import pandas as pd
 from models.predict import WaterQualityPredictor
+from models.batcher import MicroBatcher
+from models.cache import FEATURE_PRECISION, PARAMETER_PRECISION, PredictionCache
+from recommender.loader import GuidelineWatcher
 from recommender.rules import WaterQualityRecommender
 from utils.visualization import WaterQualityVisualizer
+from utils.executor import BoundedExecutor, ExecutorSaturated
+from utils.wqi import calculate_wqi_one, calculate_wqi_with_categories, get_quality_category, parameter_matrix
 from passlib.context import CryptContext
 from jose import JWTError, jwt
+import asyncio
+import gc
 import os
+from collections import Counter
 from dotenv import load_dotenv
-from utils.pdf_generator import generate_water_quality_report
 
 # Load environment variables
 load_dotenv()
@@ -70,7 +84,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -84,18 +98,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = crud.get_user_by_username(db, username=token_data.username)
+    user = await async_crud.get_user_by_username(db, username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
 
-# Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# get_async_db is imported from database.config: with a single dependency
+# FastAPI shares one session (and one pooled connection) between
+# get_current_user and the endpoint, instead of each request holding two.
+# The hot paths (auth, /api/predict, /api/dashboard, /api/trends) are on the
+# async engine; the rest still use get_db and SessionLocal
 
 class WaterQualityData(BaseModel):
     temperature: float
@@ -109,6 +121,9 @@ class WaterQualityData(BaseModel):
     Lat: Optional[float] = None
     Lon: Optional[float] = None
 
+class WaterQualityBatch(BaseModel):
+    readings: List[WaterQualityData]
+
 class WaterQualityPrediction(BaseModel):
     is_potable: bool
     confidence: float
@@ -116,6 +131,13 @@ class WaterQualityPrediction(BaseModel):
     quality_category: str
     parameters: Dict[str, float]
     recommendations: Dict[str, List[Dict]]
+    engine: str = "model"
+    guideline_version: Optional[str] = None
+
+class CompactWaterQualityPrediction(WaterQualityPrediction):
+    # Text referenced by the recommendations' action_id,
+    # health_implications_id and parameter
+    catalogue: Dict[str, Dict]
 
 class DashboardData(BaseModel):
     current_wqi: float
@@ -153,14 +175,145 @@ app.add_middleware(
 predictor = WaterQualityPredictor()
 recommender = WaterQualityRecommender()
 
-# Initialize visualizer with a database session
+# With GUIDELINES_PATH set, guidelines come from that file (see
+# recommender/loader.py) and are reloaded when it changes, checked every
+# GUIDELINES_POLL_SECONDS; otherwise the built-in set is used
+GUIDELINES_PATH = os.getenv("GUIDELINES_PATH")
+guideline_watcher = None
+if GUIDELINES_PATH:
+    guideline_watcher = GuidelineWatcher(
+        recommender, GUIDELINES_PATH, interval=float(os.getenv("GUIDELINES_POLL_SECONDS", "5"))
+    )
+    guideline_watcher.check()
+
+def load_model_artifacts() -> bool:
+    """Load persisted model artifacts. The API never trains; use train_model.py."""
+    started = time.perf_counter()
+    loaded = predictor.load_model()
+    elapsed = time.perf_counter() - started
+    if loaded:
+        print(f"Model loaded from {predictor.model_path} in {elapsed:.2f}s")
+    else:
+        print(f"Warning: Could not load model artifacts from {predictor.model_path}")
+        print("Run `python train_model.py` to train and save the model")
+    return loaded
+
+# Predictions and WQI values are cached on inputs quantised to instrument
+# precision; PREDICTION_CACHE_SIZE=0 disables both caches
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+wqi_cache = None
+if PREDICTION_CACHE_SIZE > 0:
+    predictor.cache = PredictionCache(FEATURE_PRECISION, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS)
+    wqi_cache = PredictionCache(PARAMETER_PRECISION, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS)
+
+# Maximum number of readings accepted by /api/predict/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+
+# CPU-bound work is awaited in bounded pools so it never runs on the event
+# loop: model inference, WQI and recommendations in one, PDF and plot
+# rendering in another so slow reports cannot starve predictions. Each is
+# configured by {NAME}_EXECUTOR (thread|process), {NAME}_WORKERS and
+# {NAME}_MAX_PENDING; a full pool answers 503.
+inference_executor = BoundedExecutor.from_env("inference", max_workers=min(4, os.cpu_count() or 1), max_pending=256)
+render_executor = BoundedExecutor.from_env("render", max_workers=2, max_pending=16)
+
+async def offload(executor: BoundedExecutor, fn, *args):
+    """Await fn(*args) in executor, answering 503 when it is saturated"""
+    try:
+        return await executor.run(fn, *args)
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+# Latency budget for model inference in /api/predict. A request whose model
+# result is not back in time (or that arrives while no model is loaded) is
+# answered by the rule-based WQI heuristic instead
+PREDICT_DEADLINE_MS = float(os.getenv("PREDICT_DEADLINE_MS", "50"))
+
+# How often each path answered /api/predict: "model", or the reason for
+# falling back to the WQI rules
+predict_engine_counts = Counter(dict.fromkeys(
+    ["model", "fallback_deadline_exceeded", "fallback_model_unavailable", "fallback_error"], 0
+))
+
+async def predict_with_deadline(data: WaterQualityData):
+    """Return (is_potable, confidence) from the model, or None to fall back to the WQI rules"""
+    if not batcher.running:
+        predict_engine_counts["fallback_model_unavailable"] += 1
+        return None
+    try:
+        result = await asyncio.wait_for(batcher.predict(to_model_input(data)), PREDICT_DEADLINE_MS / 1000)
+    except asyncio.TimeoutError:
+        predict_engine_counts["fallback_deadline_exceeded"] += 1
+        return None
+    except Exception as e:
+        print(f"Model inference failed, falling back to WQI rules: {e}")
+        predict_engine_counts["fallback_error"] += 1
+        return None
+    predict_engine_counts["model"] += 1
+    return result
+
+def score_rows(rows):
+    """Model inference for the micro-batcher; module-level so process pools can pickle it"""
+    return predictor.predict_batch(rows)
+
+# Concurrent single-row predictions are coalesced into one predict_batch call:
+# a batch is dispatched after PREDICT_BATCH_WINDOW_MS or once
+# PREDICT_MAX_BATCH_SIZE requests are waiting
+batcher = MicroBatcher(
+    score_rows,
+    max_batch_size=int(os.getenv("PREDICT_MAX_BATCH_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PREDICT_BATCH_WINDOW_MS", "2"))
+)
+
+def is_valid_water_quality_data(data: WaterQualityData) -> bool:
+    """Check that every parameter is within its accepted input range"""
+    return all([
+        isinstance(data.temperature, (int, float)) and 0 <= data.temperature <= 40,
+        isinstance(data.dissolved_oxygen, (int, float)) and 0 <= data.dissolved_oxygen <= 14,
+        isinstance(data.ph, (int, float)) and 0 <= data.ph <= 14,
+        isinstance(data.conductivity, (int, float)) and 0 <= data.conductivity <= 2000,
+        isinstance(data.bod, (int, float)) and 0 <= data.bod <= 30,
+        isinstance(data.nitrate, (int, float)) and 0 <= data.nitrate <= 50,
+        isinstance(data.fecal_coliform, (int, float)) and 0 <= data.fecal_coliform <= 500,
+        isinstance(data.total_coliform, (int, float)) and 0 <= data.total_coliform <= 1000,
+    ])
+
+def to_model_input(data: WaterQualityData) -> Dict[str, float]:
+    """Map API field names to the feature names the model was trained on"""
+    return {
+        "Lat": data.Lat if data.Lat is not None else 0,
+        "Lon": data.Lon if data.Lon is not None else 0,
+        "Temperature": data.temperature,
+        "D.O": data.dissolved_oxygen,
+        "pH": data.ph,
+        "Conductivity": data.conductivity,
+        "B.O.D": data.bod,
+        "Nitrate": data.nitrate,
+        "Fecalcaliform": data.fecal_coliform,
+        "Totalcaliform": data.total_coliform
+    }
+
+# Load the model and initialize visualizer with a database session
 @app.on_event("startup")
 async def startup_event():
+    # Already loaded when the app was built by create_app() in a preloading master
+    if not getattr(app.state, "model_loaded", False):
+        app.state.model_loaded = load_model_artifacts()
+
     try:
         # Create database tables if they don't exist
         from database.config import Base, engine
+        from database.migrations import pending_migrations
         Base.metadata.create_all(bind=engine)
         print("Database tables created successfully")
+        # Migrations can rewrite tables under exclusive locks, so workers only
+        # report them; init_db.py or python -m database.migrations applies them
+        with engine.connect() as connection:
+            app.state.pending_migrations = [f"{version:04d}_{name}" for version, name in pending_migrations(connection)]
+        if app.state.pending_migrations:
+            print(f"WARNING: schema migrations pending: {', '.join(app.state.pending_migrations)}; "
+                  f"run python -m database.migrations")
         
         db = SessionLocal()
         try:
@@ -173,23 +326,81 @@ async def startup_event():
         # Don't fail the startup, just log the error
         pass
 
-# Load the trained model
-try:
-    model = joblib.load('models/water_quality_model.joblib')
-    predictor.train("data/aquaattributes.xlsx")
-    print("Model loaded successfully")
-except Exception as e:
-    print(f"Warning: Could not load model: {e}")
-    print("Model will be trained during first request")
+    # Started per worker: the dispatch task belongs to this process's event loop
+    if app.state.model_loaded:
+        batcher.executor = inference_executor
+        batcher.start()
+    # Threads do not survive the fork into gunicorn workers
+    if guideline_watcher is not None:
+        guideline_watcher.start()
+
+    app.state.startup_seconds = time.perf_counter() - PROCESS_STARTED_AT
+    print(f"Startup completed in {app.state.startup_seconds:.2f}s")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batcher.stop()
+    if guideline_watcher is not None:
+        guideline_watcher.stop()
+    inference_executor.shutdown(wait=False)
+    render_executor.shutdown(wait=False)
+    await async_engine.dispose()
+
+def create_app() -> FastAPI:
+    """App factory for multi-worker deployments (see gunicorn.conf.py).
+
+    Loads the model bundle in the calling process. With gunicorn's preload_app
+    this runs once in the master, so forked workers inherit the model and the
+    recommender GUIDELINES instead of each deserialising their own copy.
+    """
+    if not getattr(app.state, "model_loaded", False):
+        app.state.model_loaded = load_model_artifacts()
+    # Move everything allocated so far out of the collector's reach so that
+    # garbage collection in the workers does not write to the shared pages
+    gc.freeze()
+    return app
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "model_loaded": getattr(app.state, "model_loaded", False),
+        "pending_migrations": getattr(app.state, "pending_migrations", None),
+        "startup_seconds": getattr(app.state, "startup_seconds", None)
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Serving metrics for this worker process"""
+    return {
+        "micro_batcher": {
+            "running": batcher.running,
+            "max_batch_size": batcher.max_batch_size,
+            "window_ms": batcher.max_wait * 1000,
+            **batcher.metrics.snapshot()
+        },
+        "predict_engine": {
+            "deadline_ms": PREDICT_DEADLINE_MS,
+            **predict_engine_counts
+        },
+        "prediction_cache": predictor.cache.snapshot() if predictor.cache else None,
+        "wqi_cache": wqi_cache.snapshot() if wqi_cache else None,
+        "executors": {
+            "inference": inference_executor.snapshot(),
+            "render": render_executor.snapshot()
+        },
+        "database_pools": pool_snapshot(),
+        "guidelines": guideline_watcher.snapshot() if guideline_watcher else {
+            "path": None,
+            "label": recommender.knowledge_base.label,
+            "version": recommender.guideline_version
+        }
+    }
 
 @app.post("/register", response_model=User)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if username already exists
-    db_user = crud.get_user_by_username(db, username=user.username)
+    db_user = await async_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -197,7 +408,7 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if email already exists
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await async_crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -205,8 +416,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
-    db_user = crud.create_user(
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
+    db_user = await async_crud.create_user(
         db,
         username=user.username,
         email=user.email,
@@ -215,8 +426,8 @@ async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @app.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await async_crud.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -236,74 +447,78 @@ async def read_users_me(current_user: models.User = Depends(get_current_user)):
 @app.post("/api/predict")
 async def predict_water_quality(
     data: WaterQualityData, 
+    compact: bool = False,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    """Score one reading and store it.
+
+    With ?compact=true each recommendation refers to its action text,
+    description and health implications by ID, and the text is sent once
+    in a "catalogue" section instead of repeated per recommendation.
+    """
     try:
         # Validate input data
-        if not all([
-            isinstance(data.temperature, (int, float)) and 0 <= data.temperature <= 40,
-            isinstance(data.dissolved_oxygen, (int, float)) and 0 <= data.dissolved_oxygen <= 14,
-            isinstance(data.ph, (int, float)) and 0 <= data.ph <= 14,
-            isinstance(data.conductivity, (int, float)) and 0 <= data.conductivity <= 2000,
-            isinstance(data.bod, (int, float)) and 0 <= data.bod <= 30,
-            isinstance(data.nitrate, (int, float)) and 0 <= data.nitrate <= 50,
-            isinstance(data.fecal_coliform, (int, float)) and 0 <= data.fecal_coliform <= 500,
-            isinstance(data.total_coliform, (int, float)) and 0 <= data.total_coliform <= 1000,
-        ]):
+        if not is_valid_water_quality_data(data):
             raise HTTPException(
                 status_code=422,
                 detail="Invalid parameter values. Please check the input ranges."
             )
 
-        # Create measurement record with user_id
-        measurement = crud.create_water_quality_measurement(
-            db,
-            user_id=current_user.id,
-            latitude=data.Lat if data.Lat is not None else 0,
-            longitude=data.Lon if data.Lon is not None else 0,
-            temperature=data.temperature,
-            dissolved_oxygen=data.dissolved_oxygen,
-            ph=data.ph,
-            conductivity=data.conductivity,
-            bod=data.bod,
-            nitrate=data.nitrate,
-            fecal_coliform=data.fecal_coliform,
-            total_coliform=data.total_coliform
-        )
-
-        # Calculate WQI (simplified version)
-        wqi = calculate_wqi(data)
-        quality_category = get_quality_category(wqi)
+        # The model runs under its deadline while WQI and recommendations are
+        # computed in the inference pool; database writes go through the async
+        # engine, so none of it blocks the event loop
+        model_result = asyncio.ensure_future(predict_with_deadline(data))
+        try:
+            wqi, quality_category, recommendations, guideline_version = await offload(
+                inference_executor, score_reading, data, compact
+            )
+        finally:
+            model_prediction = await model_result
 
-        # Create prediction record
-        prediction = crud.create_prediction(
-            db,
-            measurement_id=measurement.id,
-            is_potable=wqi >= 50,
-            confidence=0.95,  # This should come from your ML model
-            wqi_value=wqi,
+        if model_prediction is not None:
+            engine = "model"
+            is_potable, confidence = model_prediction
+        else:
+            # Rule-based fallback; WQI / 100 plays the role of the model's
+            # probability of potability, so is_potable is still confidence >= 0.5
+            engine = "wqi_rules"
+            is_potable, confidence = wqi >= 50, wqi / 100
+
+        extra = {}
+        response_model = WaterQualityPrediction
+        if compact:
+            recommendations, extra["catalogue"] = recommendations
+            response_model = CompactWaterQualityPrediction
+        prediction = dict(
+            is_potable=bool(is_potable),
+            confidence=float(confidence),
+            wqi_value=float(wqi),
             quality_category=quality_category
         )
 
-        # Generate recommendations
-        input_values = {
-            "temperature": data.temperature,
-            "dissolved_oxygen": data.dissolved_oxygen,
-            "ph": data.ph,
-            "conductivity": data.conductivity,
-            "bod": data.bod,
-            "nitrate": data.nitrate,
-            "fecal_coliform": data.fecal_coliform,
-            "total_coliform": data.total_coliform
-        }
-        recommendations = recommender.generate_recommendations(input_values)
+        # Measurement, prediction and recommendations in one transaction
+        await async_crud.create_measurement_with_prediction(
+            db,
+            measurement=dict(
+                user_id=current_user.id,
+                latitude=data.Lat if data.Lat is not None else 0,
+                longitude=data.Lon if data.Lon is not None else 0,
+                temperature=data.temperature,
+                dissolved_oxygen=data.dissolved_oxygen,
+                ph=data.ph,
+                conductivity=data.conductivity,
+                bod=data.bod,
+                nitrate=data.nitrate,
+                fecal_coliform=data.fecal_coliform,
+                total_coliform=data.total_coliform
+            ),
+            prediction=prediction,
+            recommendations=recommendation_records(recommendations, extra.get("catalogue"))
+        )
 
-        return WaterQualityPrediction(
-            is_potable=prediction.is_potable,
-            confidence=prediction.confidence,
-            wqi_value=prediction.wqi_value,
-            quality_category=prediction.quality_category,
+        return response_model(
+            **prediction,
             parameters={
                 "temperature": data.temperature,
                 "dissolved_oxygen": data.dissolved_oxygen,
@@ -314,7 +529,10 @@ async def predict_water_quality(
                 "fecal_coliform": data.fecal_coliform,
                 "total_coliform": data.total_coliform
             },
-            recommendations=recommendations
+            recommendations=recommendations,
+            engine=engine,
+            guideline_version=guideline_version,
+            **extra
         )
     except HTTPException:
         raise
@@ -322,18 +540,54 @@ async def predict_water_quality(
         print(f"Error in prediction: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process prediction: {str(e)}")
 
+@app.post("/api/predict/batch")
+async def predict_water_quality_batch(
+    batch: WaterQualityBatch,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Score many readings with one vectorised model call; results keep input order"""
+    if len(batch.readings) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(batch.readings)} readings (maximum {MAX_BATCH_SIZE})"
+        )
+    invalid_rows = [i for i, data in enumerate(batch.readings) if not is_valid_water_quality_data(data)]
+    if invalid_rows:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid parameter values in rows {invalid_rows}. Please check the input ranges."
+        )
+    if not getattr(app.state, "model_loaded", False):
+        raise HTTPException(status_code=503, detail="Model is not loaded")
+
+    try:
+        results = await offload(inference_executor, score_batch, batch.readings)
+        return {
+            "count": len(results),
+            "model_version": predictor.model_version,
+            "results": results
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to process batch prediction: {str(e)}")
+
 @app.get("/api/dashboard")
 async def get_dashboard_data(
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        # Get recent measurements for current user (last 7 days)
-        recent_measurements = crud.get_measurements(
+        # Get the 5 most recent measurements for current user (last 7 days), each with its latest prediction
+        start_date = datetime.utcnow() - timedelta(days=7)
+        recent = await async_crud.get_measurements_with_latest_prediction(
             db,
             user_id=current_user.id,
-            start_date=datetime.utcnow() - timedelta(days=7)
+            start_date=start_date,
+            limit=5
         )
+        recent_measurements = [measurement for measurement, _ in recent]
 
         # If no measurements exist, return default values
         if not recent_measurements:
@@ -356,16 +610,11 @@ async def get_dashboard_data(
             }
 
         # Get current WQI from the most recent measurement
-        current_measurement = recent_measurements[0]
         current_wqi = 0
         quality_category = "Unknown"
         
-        # Get the most recent prediction
-        latest_prediction = db.query(models.WaterQualityPrediction)\
-            .filter(models.WaterQualityPrediction.measurement_id == current_measurement.id)\
-            .order_by(models.WaterQualityPrediction.timestamp.desc())\
-            .first()
-            
+        # Its most recent prediction
+        latest_prediction = recent[0][1]
         if latest_prediction:
             current_wqi = latest_prediction.wqi_value
             quality_category = latest_prediction.quality_category
@@ -395,18 +644,18 @@ async def get_dashboard_data(
         # Create input values for recommender
         input_values = {}
 
+        # Min/max/avg over every reading in the window, from the hourly rollups
+        rollup_series = await async_crud.get_rollup_series(db, parameters, "hour", user_id=current_user.id, start_date=start_date)
+
         for param in parameters:
-            values = [getattr(m, param) for m in recent_measurements]
-            current_value = values[0]
-            min_value = min(values)
-            max_value = max(values)
-            avg_value = sum(values) / len(values)
+            current_value = getattr(recent_measurements[0], param)
+            stats = rollups.summarise(rollup_series.get(param, []))
 
             parameter_summary[param] = {
                 "current": current_value,
-                "min": min_value,
-                "max": max_value,
-                "avg": avg_value
+                "min": stats.minimum if stats.count else current_value,
+                "max": stats.maximum if stats.count else current_value,
+                "avg": stats.mean if stats.count else current_value
             }
 
             # Add current value to input values for recommender
@@ -428,16 +677,11 @@ async def get_dashboard_data(
                 })
 
         # Generate recommendations
-        recommendations = recommender.generate_recommendations(input_values)
+        recommendations, guideline_version = await offload(inference_executor, recommend, input_values)
 
         # Format recent measurements
         formatted_measurements = []
-        for measurement in recent_measurements[:5]:  # Limit to 5 most recent
-            prediction = db.query(models.WaterQualityPrediction)\
-                .filter(models.WaterQualityPrediction.measurement_id == measurement.id)\
-                .order_by(models.WaterQualityPrediction.timestamp.desc())\
-                .first()
-                
+        for measurement, prediction in recent[:5]:  # Limit to 5 most recent
             formatted_measurements.append({
                 "id": measurement.id,
                 "timestamp": measurement.timestamp.isoformat(),
@@ -461,92 +705,69 @@ async def get_dashboard_data(
             "parameter_summary": parameter_summary,
             "recent_measurements": formatted_measurements,
             "alerts": alerts,
-            "recommendations": recommendations
+            "recommendations": recommendations,
+            "guideline_version": guideline_version
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in dashboard data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard data: {str(e)}")
 
-def calculate_wqi(data: WaterQualityData) -> float:
-    # Define parameter weights based on their importance
-    weights = {
-        "temperature": 0.1,
-        "dissolved_oxygen": 0.2,
-        "ph": 0.15,
-        "conductivity": 0.1,
-        "bod": 0.15,
-        "nitrate": 0.1,
-        "fecal_coliform": 0.1,
-        "total_coliform": 0.1
-    }
-
-    # Define acceptable ranges for each parameter
-    ranges = {
-        "temperature": {"min": 0, "max": 40, "optimal": (20, 30)},
-        "dissolved_oxygen": {"min": 0, "max": 14, "optimal": (6, 8)},
-        "ph": {"min": 0, "max": 14, "optimal": (6.5, 8.5)},
-        "conductivity": {"min": 0, "max": 2000, "optimal": (200, 800)},
-        "bod": {"min": 0, "max": 30, "optimal": (0, 3)},
-        "nitrate": {"min": 0, "max": 50, "optimal": (0, 10)},
-        "fecal_coliform": {"min": 0, "max": 500, "optimal": (0, 200)},
-        "total_coliform": {"min": 0, "max": 1000, "optimal": (0, 500)}
-    }
-
-    def normalize_parameter(value: float, param: str) -> float:
-        """Normalize parameter value to a 0-100 scale based on its optimal range"""
-        range_info = ranges[param]
-        min_val, max_val = range_info["min"], range_info["max"]
-        opt_min, opt_max = range_info["optimal"]
-
-        # For parameters where lower is better (BOD, nitrate, coliforms)
-        if param in ["bod", "nitrate", "fecal_coliform", "total_coliform"]:
-            if value <= opt_min:
-                return 100
-            elif value >= opt_max:
-                return 0
-            else:
-                return 100 * (1 - (value - opt_min) / (opt_max - opt_min))
-        
-        # For parameters where higher is better (DO)
-        elif param == "dissolved_oxygen":
-            if value >= opt_max:
-                return 100
-            elif value <= opt_min:
-                return 0
-            else:
-                return 100 * (value - opt_min) / (opt_max - opt_min)
-        
-        # For parameters with optimal range (temperature, pH, conductivity)
-        else:
-            if opt_min <= value <= opt_max:
-                return 100
-            elif value < opt_min:
-                return 100 * (value - min_val) / (opt_min - min_val)
-            else:
-                return 100 * (1 - (value - opt_max) / (max_val - opt_max))
-
-    # Calculate normalized scores for each parameter
-    scores = {
-        param: normalize_parameter(getattr(data, param), param)
-        for param in weights.keys()
-    }
+def recommend(input_values: Dict[str, float], compact: bool = False) -> tuple:
+    """Recommendations and the version of the guidelines that produced them.
+
+    With compact, the recommendations are the (recommendations, catalogue)
+    pair from generate_compact_recommendations.
+    """
+    if guideline_watcher is not None:
+        # Only checks the file in forked pool processes, which lack the watcher thread
+        guideline_watcher.poll()
+    knowledge_base = recommender.knowledge_base
+    if compact:
+        return recommender.generate_compact_recommendations(input_values, knowledge_base), knowledge_base.version
+    return recommender.generate_recommendations(input_values, knowledge_base), knowledge_base.version
+
+def recommendation_records(recommendations: Dict[str, List[Dict]], catalogue: Optional[Dict] = None) -> List[Dict]:
+    """Rows for the recommendations table; pass the catalogue for compact recommendations"""
+    return [
+        {
+            "parameter": rec["parameter"],
+            "severity": rec["severity"],
+            "priority": rec["priority"],
+            "description": catalogue["actions"][rec["action_id"]] if catalogue else rec["action"]
+        }
+        for recs in recommendations.values()
+        for rec in recs
+    ]
+
+def score_reading(data: WaterQualityData, compact: bool = False) -> tuple:
+    """WQI, quality category, recommendations and guideline version for one reading"""
+    wqi = compute_wqi(data)
+    recommendations, guideline_version = recommend(data.model_dump(exclude={"Lat", "Lon"}), compact)
+    return wqi, get_quality_category(wqi), recommendations, guideline_version
+
+def score_batch(readings: List[WaterQualityData]) -> list:
+    """Model predictions and WQI for /api/predict/batch, in input order"""
+    predictions = predictor.predict_batch([to_model_input(data) for data in readings])
+    wqi_values, categories = calculate_wqi_with_categories(parameter_matrix(readings))
+    return [
+        {
+            "index": i,
+            "is_potable": is_potable,
+            "confidence": confidence,
+            "wqi_value": float(wqi),
+            "quality_category": str(category)
+        }
+        for i, ((is_potable, confidence), wqi, category) in enumerate(zip(predictions, wqi_values, categories))
+    ]
 
-    # Calculate weighted WQI
-    wqi = sum(scores[param] * weight for param, weight in weights.items())
-    return wqi
-
-def get_quality_category(wqi: float) -> str:
-    if wqi >= 90:
-        return "Excellent"
-    elif wqi >= 70:
-        return "Good"
-    elif wqi >= 50:
-        return "Fair"
-    elif wqi >= 25:
-        return "Poor"
-    else:
-        return "Very Poor"
+def compute_wqi(data: WaterQualityData) -> float:
+    """WQI of one reading, through the WQI cache when enabled"""
+    if wqi_cache is None:
+        return calculate_wqi_one(data)
+    return wqi_cache.get_or_compute(data.model_dump(exclude={"Lat", "Lon"}), calculate_wqi_one)
 
 @app.get("/measurements/{measurement_id}")
 async def get_measurement_details(measurement_id: int, db: Session = Depends(get_db)):
@@ -573,44 +794,111 @@ async def get_measurement_details(measurement_id: int, db: Session = Depends(get
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/measurements")
+async def list_measurements(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    parameters: Optional[str] = None,
+    days: Optional[int] = None,
+    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """One page of the current user's measurements, newest first.
+
+    Pass next_cursor back as cursor for the following page; it is null on
+    the last page. parameters is a comma-separated subset of the reading
+    columns to return (default: all of them).
+    """
+    columns = parameters.split(",") if parameters else list(crud.MEASUREMENT_PARAMETERS)
+    unknown = set(columns) - set(crud.MEASUREMENT_PARAMETERS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters: {', '.join(sorted(unknown))}")
+    if cursor is not None:
+        try:
+            crud.decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    rows, next_cursor = await async_crud.get_measurement_columns(
+        db,
+        columns,
+        user_id=current_user.id,
+        start_date=datetime.utcnow() - timedelta(days=days) if days else None,
+        cursor=cursor,
+        limit=limit
+    )
+    return {
+        "measurements": [
+            {"id": row[0], "timestamp": row[1].isoformat(), **dict(zip(columns, row[2:]))}
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
 @app.get("/api/trends")
 async def get_trends(
     days: int = 30,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get trend data with enhanced analysis (no location filter)"""
+    """Get trend data with enhanced analysis (no location filter).
+
+    Series run oldest to newest. Windows longer than a day have one point
+    per day (the daily mean) and their statistics cover every reading in
+    the window, both from the daily rollups; shorter windows use the raw
+    readings.
+    """
+    empty = {
+        "dates": [],
+        "parameters": {},
+        "wqi_values": [],
+        "trend_analysis": {},
+        "recommendations": []
+    }
     try:
-        # Get all measurements for the specified period for current user
-        measurements = crud.get_measurements(
-            db,
-            user_id=current_user.id,
-            start_date=datetime.utcnow() - timedelta(days=days)
-        )
+        start_date = datetime.utcnow() - timedelta(days=days)
+        # Whole-window statistics per parameter, when read from the rollups
+        summaries = {}
 
-        if not measurements:
-            return {
-                "dates": [],
-                "parameters": {},
-                "wqi_values": [],
-                "trend_analysis": {},
-                "recommendations": []
+        if days > 1:
+            series = await async_crud.get_rollup_series(
+                db, rollups.ROLLUP_PARAMETERS, "day", user_id=current_user.id, start_date=start_date
+            )
+            if not series:
+                return empty
+            buckets = sorted({bucket for points in series.values() for bucket, _ in points})
+            means = {param: {bucket: stats.mean for bucket, stats in series.get(param, [])} for param in rollups.ROLLUP_PARAMETERS}
+            summaries = {param: rollups.summarise(points) for param, points in series.items()}
+
+            # Format the data
+            dates = [bucket.strftime('%Y-%m-%d') for bucket in buckets]
+            # 0 for days without a prediction
+            wqi_values = [means["wqi"].get(bucket, 0) for bucket in buckets]
+            # None for days without a reading of the parameter
+            parameters = {param: [means[param].get(bucket) for bucket in buckets] for param in crud.MEASUREMENT_PARAMETERS}
+        else:
+            # Get the readings for the specified period for current user, with each one's latest WQI
+            columns, _ = await async_crud.get_measurement_columns(
+                db,
+                crud.MEASUREMENT_PARAMETERS,
+                user_id=current_user.id,
+                start_date=start_date,
+                limit=None,
+                prediction_columns=("wqi_value",),
+                as_arrays=True
+            )
+            if not len(columns["id"]):
+                return empty
+
+            # Format the data, oldest first
+            dates = [timestamp.strftime('%Y-%m-%d') for timestamp in columns["timestamp"][::-1]]
+            # 0 for readings without a prediction
+            wqi_values = np.nan_to_num(columns["wqi_value"][::-1], nan=0.0).tolist()
+            # None for readings without the parameter (NaN is not valid JSON)
+            parameters = {
+                param: [None if np.isnan(value) else value for value in columns[param][::-1].tolist()]
+                for param in crud.MEASUREMENT_PARAMETERS
             }
-
-        # Format the data
-        dates = [m.timestamp.strftime('%Y-%m-%d') for m in measurements]
-        wqi_values = [m.predictions[0].wqi_value if m.predictions else 0 for m in measurements]
-        
-        parameters = {
-            "temperature": [m.temperature for m in measurements],
-            "dissolved_oxygen": [m.dissolved_oxygen for m in measurements],
-            "ph": [m.ph for m in measurements],
-            "conductivity": [m.conductivity for m in measurements],
-            "bod": [m.bod for m in measurements],
-            "nitrate": [m.nitrate for m in measurements],
-            "fecal_coliform": [m.fecal_coliform for m in measurements],
-            "total_coliform": [m.total_coliform for m in measurements]
-        }
         print("[DEBUG] Trend API parameter values:")
         for param, values in parameters.items():
             print(f"  {param}: {values}")
@@ -620,12 +908,14 @@ async def get_trends(
         recommendations = []
 
         for param, values in parameters.items():
-            if len(values) < 2:
+            # Fit and summarise only the points that have the parameter, at their positions in the series
+            y = np.array([np.nan if value is None else value for value in values], dtype=float)
+            present = ~np.isnan(y)
+            x, y = np.arange(len(values))[present], y[present]
+            if len(y) < 2:
                 continue
 
             # Calculate trend direction and slope
-            x = np.arange(len(values))
-            y = np.array(values)
             slope = float(np.polyfit(x, y, 1)[0])
             trend = "stable"
             if slope > 0.01:
@@ -639,11 +929,16 @@ async def get_trends(
             anomalies = [float(v) for v in y if abs(v - mean) > 2 * std]
 
             # Calculate statistics
-            current_value = float(y[-1])
-            avg_value = float(mean)
-            std_dev = float(std)
-            min_value = float(np.min(y))
-            max_value = float(np.max(y))
+            stats = summaries.get(param)
+            if stats is not None:
+                current_value, avg_value, std_dev = stats.last_value, stats.mean, stats.std
+                min_value, max_value = stats.minimum, stats.maximum
+            else:
+                current_value = float(y[-1])
+                avg_value = float(mean)
+                std_dev = float(std)
+                min_value = float(np.min(y))
+                max_value = float(np.max(y))
 
             # Thresholds for warnings
             thresholds = {
@@ -717,14 +1012,15 @@ async def get_trends(
                 wqi_trend = "improving"
             elif slope < -0.01:
                 wqi_trend = "deteriorating"
+            stats = summaries.get("wqi")
             trend_analysis["wqi"] = {
                 "trend": wqi_trend,
                 "slope": slope,
-                "current_value": float(y[-1]),
-                "average": float(np.mean(y)),
-                "std_dev": float(np.std(y)),
-                "min": float(np.min(y)),
-                "max": float(np.max(y))
+                "current_value": stats.last_value if stats else float(y[-1]),
+                "average": stats.mean if stats else float(np.mean(y)),
+                "std_dev": stats.std if stats else float(np.std(y)),
+                "min": stats.minimum if stats else float(np.min(y)),
+                "max": stats.maximum if stats else float(np.max(y))
             }
             if wqi_trend == "deteriorating":
                 recommendations.append({
@@ -745,7 +1041,7 @@ async def get_trends(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/dashboard/parameter/{parameter}")
-async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db)):
+async def get_parameter_dashboard(parameter: str, db: AsyncSession = Depends(get_async_db)):
     """Get parameter-specific dashboard data"""
     try:
         # Map frontend parameter names to database column names
@@ -776,13 +1072,15 @@ async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db))
         # Get the database column name
         db_column = parameter_map[param_key]
 
-        # Get recent measurements
-        measurements = crud.get_measurements(
+        # Daily rollups of this parameter over the last 30 days, across all users
+        series = (await async_crud.get_rollup_series(
             db,
+            [db_column],
+            "day",
             start_date=datetime.utcnow() - timedelta(days=30)
-        )
+        )).get(db_column, [])
 
-        if not measurements:
+        if not series:
             return {
                 "parameter": parameter,
                 "current_value": 0,
@@ -803,16 +1101,17 @@ async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db))
                 }
             }
 
-        # Get values for the specified parameter
-        values = [getattr(m, db_column) for m in measurements]
-        dates = [m.timestamp.strftime('%Y-%m-%d') for m in measurements]
+        # Daily means of the specified parameter, oldest first
+        values = [stats.mean for _, stats in series]
+        dates = [bucket.strftime('%Y-%m-%d') for bucket, _ in series]
 
-        # Calculate statistics
+        # Calculate statistics over every reading in the window
+        summary = rollups.summarise(series)
         stats = {
-            "min": float(min(values)),
-            "max": float(max(values)),
-            "avg": float(np.mean(values)),
-            "std_dev": float(np.std(values))
+            "min": summary.minimum,
+            "max": summary.maximum,
+            "avg": summary.mean,
+            "std_dev": summary.std
         }
 
         # Define thresholds based on water quality standards
@@ -828,14 +1127,10 @@ async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db))
         }
 
         threshold_info = thresholds.get(db_column, {"min": 0, "max": 0})
-        is_within_range = (
-            threshold_info["min"] <= values[0] <= threshold_info["max"]
-            if values else True
-        )
-
-        # Generate recommendations based on parameter values
+        # Generate recommendations based on the latest reading
         recommendations = []
-        current_value = float(values[0]) if values else 0
+        current_value = summary.last_value
+        is_within_range = threshold_info["min"] <= current_value <= threshold_info["max"]
         
         if current_value < threshold_info["min"]:
             recommendations.append({
@@ -853,7 +1148,7 @@ async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db))
             "current_value": current_value,
             "historical_values": {
                 "dates": dates,
-                "values": [float(v) for v in values]
+                "values": values
             },
             "statistics": stats,
             "threshold_info": {
@@ -870,6 +1165,8 @@ async def get_parameter_dashboard(parameter: str, db: Session = Depends(get_db))
 @app.get("/dashboard/compare")
 async def get_comparison_dashboard(locations: str, days: int = 30, db: Session = Depends(get_db)):
     """Get comparison dashboard data for multiple locations"""
+    import pandas as pd
+
     try:
         location_list = locations.split(",")
         dates = pd.date_range(end=datetime.now(), periods=days).strftime('%Y-%m-%d').tolist()
@@ -915,17 +1212,22 @@ async def export_data(location: str, format: str = "csv", db: Session = Depends(
 async def generate_report(
     data: WaterQualityData,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
+    # reportlab is only needed here, so it is loaded on first use
+    from utils.pdf_generator import generate_water_quality_report
+
     try:
         # Get prediction data
-        prediction = await predict_water_quality(data, current_user, db)
+        prediction = await predict_water_quality(data, current_user=current_user, db=db)
         
         # Generate PDF
-        pdf_buffer = generate_water_quality_report(
-            measurement_data=data.dict(),
-            prediction_data=prediction.dict(),
-            recommendations=prediction.recommendations
+        pdf_buffer = await offload(
+            render_executor,
+            generate_water_quality_report,
+            data.dict(),
+            prediction.dict(),
+            prediction.recommendations
         )
         
         # Return PDF as downloadable file
@@ -936,6 +1238,8 @@ async def generate_report(
                 "Content-Disposition": f"attachment; filename=water_quality_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
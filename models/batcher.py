@@ -0,0 +1,185 @@
+"""Asyncio micro-batcher that coalesces concurrent predictions into one model call"""
+import asyncio
+import time
+from collections import deque
+
+from utils.executor import ExecutorSaturated
+
+
+class BatcherMetrics:
+    """Counters for batch sizes and queueing delay"""
+
+    # Upper bounds of the batch-size histogram buckets
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, window: int = 10000):
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0  # requests answered with an exception
+        self.batch_size_histogram = {bucket: 0 for bucket in self.BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram["inf"] = 0
+        self.largest_batch = 0
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+        self.recent_queue_delays = deque(maxlen=window)
+
+    def record_batch(self, size: int, queue_delays: list):
+        self.batches += 1
+        self.requests += size
+        self.largest_batch = max(self.largest_batch, size)
+        for bucket in self.BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                break
+        else:
+            self.batch_size_histogram["inf"] += 1
+        self.total_queue_delay += sum(queue_delays)
+        self.max_queue_delay = max(self.max_queue_delay, max(queue_delays))
+        self.recent_queue_delays.extend(queue_delays)
+
+    def snapshot(self) -> dict:
+        recent = sorted(self.recent_queue_delays)
+
+        def percentile(q):
+            return recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "batch_size_histogram": {str(k): v for k, v in self.batch_size_histogram.items()},
+            "mean_queue_delay_ms": self.total_queue_delay / self.requests * 1000 if self.requests else 0.0,
+            "p50_queue_delay_ms": percentile(0.50),
+            "p99_queue_delay_ms": percentile(0.99),
+            "max_queue_delay_ms": self.max_queue_delay * 1000,
+        }
+
+
+def predict_rows_separately(predict_batch, rows: list) -> list:
+    """Score rows one at a time, returning each row's result or the exception it raised"""
+    results = []
+    for row in rows:
+        try:
+            results.append(predict_batch([row])[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class MicroBatcher:
+    """Collects single-row requests for a short window and scores them together.
+
+    The first request of a batch opens a window of ``max_wait_ms``; the batch is
+    dispatched when the window closes or ``max_batch_size`` requests are
+    waiting, whichever comes first. ``predict_batch`` runs through ``executor``,
+    a utils.executor.BoundedExecutor whose max_pending bound each batch counts
+    against (the loop's default thread pool if None), so the event loop keeps
+    serving other requests, and each caller gets its own row's result back.
+
+    If a batch raises, its rows are scored again one by one, so a bad row
+    fails only its own caller.
+    """
+
+    def __init__(self, predict_batch, max_batch_size: int = 64, max_wait_ms: float = 2.0, executor=None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.metrics = BatcherMetrics()
+        self._queue = None
+        self._full = None
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the dispatch loop; must be called from the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._dispatch_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Fail anything still queued rather than leaving callers waiting forever
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+
+    async def predict(self, row):
+        """Queue one row and wait for its result"""
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future, time.perf_counter()))
+        if self._queue.qsize() >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    def _drain(self, batch: list):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self, fn, *args):
+        if self.executor is None:
+            return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        return await self.executor.run(fn, *args)
+
+    def _fail(self, future, error: Exception):
+        self.metrics.errors += 1
+        if not future.done():
+            future.set_exception(error)
+
+    async def _dispatch_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+                self._drain(batch)
+
+            # Callers that gave up (e.g. a deadline expired) while queued need no result
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter()
+            rows = [row for row, _, _ in batch]
+            self.metrics.record_batch(len(batch), [dispatched_at - queued_at for _, _, queued_at in batch])
+            try:
+                results = await self._run(self.predict_batch, rows)
+            except Exception as e:
+                if len(batch) == 1 or isinstance(e, ExecutorSaturated):
+                    for _, future, _ in batch:
+                        self._fail(future, e)
+                    continue
+                # Find the row(s) at fault rather than failing the whole batch
+                try:
+                    results = await self._run(predict_rows_separately, self.predict_batch, rows)
+                except Exception as e:
+                    for _, future, _ in batch:
+                        self._fail(future, e)
+                    continue
+
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self._fail(future, result)
+                elif not future.done():
+                    future.set_result(result)
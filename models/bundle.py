@@ -0,0 +1,139 @@
+"""Versioned model bundle holding the estimator, preprocessing and feature metadata.
+
+Layout of a bundle directory::
+
+    manifest.json     format version, model version, feature order and dtypes,
+                      target column, classes, training-data hash and metrics
+    estimator.joblib  fitted estimator, scaler and label encoder
+    forest.joblib     flat tree arrays (see models/forest.py), optionally with
+                      the scaler folded into the split thresholds
+
+Both joblib files are written uncompressed so they can be loaded with
+``mmap_mode``. sklearn copies tree nodes into its own buffers when it unpickles
+an estimator, so the flat arrays in forest.joblib are what several workers on
+one host actually share through the page cache.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from joblib import dump, load
+
+from .forest import flatten_forest, fold_scaler
+
+BUNDLE_FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+ESTIMATOR_FILE = "estimator.joblib"
+FOREST_FILE = "forest.joblib"
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bundle_exists(bundle_dir: str) -> bool:
+    return all(
+        os.path.exists(os.path.join(bundle_dir, name))
+        for name in (MANIFEST_FILE, ESTIMATOR_FILE, FOREST_FILE)
+    )
+
+
+def save_bundle(
+    bundle_dir: str,
+    model,
+    scaler,
+    label_encoder,
+    feature_columns: list,
+    feature_dtypes: dict,
+    target_column: str,
+    metrics: dict = None,
+    training_data_path: str = None,
+    fold_scaler_thresholds: bool = False,
+) -> dict:
+    """Write a bundle directory and return its manifest"""
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    estimator_path = os.path.join(bundle_dir, ESTIMATOR_FILE)
+    dump({"model": model, "scaler": scaler, "label_encoder": label_encoder}, estimator_path)
+    forest = flatten_forest(model)
+    if fold_scaler_thresholds:
+        forest = fold_scaler(forest, scaler)
+    dump(forest, os.path.join(bundle_dir, FOREST_FILE))
+
+    training_data_sha256 = None
+    if training_data_path and os.path.exists(training_data_path):
+        training_data_sha256 = file_sha256(training_data_path)
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_version": file_sha256(estimator_path)[:12],
+        "created_at": datetime.utcnow().isoformat(),
+        "feature_columns": list(feature_columns),
+        "feature_dtypes": {col: str(feature_dtypes[col]) for col in feature_columns},
+        "target_column": target_column,
+        "classes": [str(c) for c in label_encoder.classes_],
+        "scaler_folded": bool(fold_scaler_thresholds),
+        "training_data": training_data_path,
+        "training_data_sha256": training_data_sha256,
+        "metrics": metrics or {},
+    }
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_bundle(bundle_dir: str, mmap_mode: str = "r") -> dict:
+    """Load a bundle directory; arrays are memory-mapped unless mmap_mode is None"""
+    with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported model bundle format {manifest.get('format_version')} "
+            f"(expected {BUNDLE_FORMAT_VERSION})"
+        )
+
+    estimator = load(os.path.join(bundle_dir, ESTIMATOR_FILE), mmap_mode=mmap_mode)
+    forest = load(os.path.join(bundle_dir, FOREST_FILE), mmap_mode=mmap_mode)
+    return {
+        "manifest": manifest,
+        "model": estimator["model"],
+        "scaler": estimator["scaler"],
+        "label_encoder": estimator["label_encoder"],
+        "forest": forest,
+    }
+
+
+def main():
+    """Build a bundle from the legacy model/scaler/encoder joblib files"""
+    import argparse
+    from .predict import WaterQualityPredictor
+
+    parser = argparse.ArgumentParser(description="Export the trained model as a versioned bundle")
+    parser.add_argument("--model-path", default=None, help="Defaults to models/water_quality_model.joblib")
+    parser.add_argument("--training-data", default="data/aquaattributes.xlsx")
+    parser.add_argument(
+        "--fold-scaler",
+        action="store_true",
+        help="Rewrite split thresholds into raw feature units so serving skips the scaler"
+    )
+    args = parser.parse_args()
+
+    predictor = WaterQualityPredictor(args.model_path)
+    if not predictor.load_legacy_artifacts():
+        raise SystemExit(f"Could not load model artifacts from {predictor.model_path}")
+    manifest = predictor.save_bundle(
+        training_data_path=args.training_data,
+        fold_scaler_thresholds=args.fold_scaler
+    )
+    print(f"Model bundle {manifest['model_version']} written to {predictor.bundle_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Bounded LRU/TTL cache for predictions keyed on quantised inputs"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Instrument precision per model feature. Readings that differ by less than
+# this are indistinguishable in the field, so they share a cache entry.
+FEATURE_PRECISION = {
+    "Lat": 0.0001,
+    "Lon": 0.0001,
+    "Temperature": 0.1,
+    "D.O": 0.01,
+    "pH": 0.01,
+    "Conductivity": 1.0,
+    "B.O.D": 0.01,
+    "Nitrate": 0.01,
+    "Fecalcaliform": 1.0,
+    "Totalcaliform": 1.0,
+}
+
+# The same precisions under the API's parameter names
+PARAMETER_PRECISION = {
+    "temperature": 0.1,
+    "dissolved_oxygen": 0.01,
+    "ph": 0.01,
+    "conductivity": 1.0,
+    "bod": 0.01,
+    "nitrate": 0.01,
+    "fecal_coliform": 1.0,
+    "total_coliform": 1.0,
+}
+
+
+class PredictionCache:
+    """LRU cache with a time-to-live, keyed on inputs rounded to a precision.
+
+    Values are computed from the quantised inputs, not the originals, so an
+    entry is the same whichever of its near-identical readings arrived first.
+    Parameters missing from ``precision`` are keyed on their exact value.
+
+    Every lookup carries the version of whatever produced the values (the
+    model version for predictions); when it changes the cache is cleared.
+    Safe to share between threads.
+    """
+
+    def __init__(self, precision: dict, max_entries: int = 10000, ttl_seconds: float = 300.0,
+                 clock=time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.precision = dict(precision)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def quantize(self, values: dict) -> dict:
+        """Round each value to its parameter's precision"""
+        quantized = {}
+        for name, value in values.items():
+            step = self.precision.get(name)
+            if step and value is not None:
+                value = round(value / step) * step
+            quantized[name] = value
+        return quantized
+
+    def quantize_matrix(self, matrix: np.ndarray, columns: list) -> tuple:
+        """Quantise an (N, len(columns)) matrix; returns (keys, quantised matrix)"""
+        steps = np.array([self.precision.get(col) or 0.0 for col in columns])
+        rounded = steps > 0
+        quantized = np.array(matrix, dtype=np.float64)
+        quantized[:, rounded] = np.round(quantized[:, rounded] / steps[rounded]) * steps[rounded]
+        return list(map(tuple, quantized.tolist())), quantized
+
+    @staticmethod
+    def key(quantized: dict) -> tuple:
+        return tuple(sorted(quantized.items()))
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get(self, key, version=None):
+        """Return (found, value) for a key"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (self.clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, values: dict, compute, version=None):
+        """Return the cached value for values, calling compute(quantised values) on a miss"""
+        quantized = self.quantize(values)
+        key = self.key(quantized)
+        found, value = self.get(key, version)
+        if not found:
+            value = compute(quantized)
+            self.put(key, value, version)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
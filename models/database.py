@@ -1,9 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
-import os
-from urllib.parse import quote_plus
 
 Base = declarative_base()
 
@@ -54,14 +52,8 @@ class ModelVersion(Base):
 
 def init_db():
     """Initialize the database connection and create tables"""
-    DB_USER = os.getenv("DB_USER", "postgres")
-    DB_PASSWORD = os.getenv("DB_PASSWORD", "Marsmission@11")
-    DB_HOST = os.getenv("DB_HOST", "localhost")
-    DB_PORT = os.getenv("DB_PORT", "5433")
-    DB_NAME = os.getenv("DB_NAME", "water_quality")
-
-    database_url = f"postgresql://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = create_engine(database_url)
+    # The app's engine: same DATABASE_URL / DB_* settings, and its pool is shared
+    from database.config import engine
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     return Session()
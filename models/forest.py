@@ -0,0 +1,158 @@
+"""Flat, contiguous array representation of a fitted random forest"""
+import numpy as np
+
+TREE_LEAF = -1
+
+
+def flatten_forest(model) -> dict:
+    """Concatenate the nodes of every tree in a fitted forest into flat arrays.
+
+    Child indices are rewritten to absolute positions in the concatenated
+    arrays, leaves point to themselves (with feature 0) so traversal can run
+    a fixed number of steps, and leaf values are normalised to class
+    probabilities. The arrays alone are enough to evaluate the forest. Plain
+    ndarrays are used so the result can be dumped uncompressed and loaded
+    with ``mmap_mode``.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == TREE_LEAF
+        own_index = np.arange(tree.node_count) + offset
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(tree.threshold.astype(np.float64))
+        lefts.append(np.where(is_leaf, own_index, tree.children_left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, own_index, tree.children_right + offset).astype(np.int32))
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0.0] = 1.0
+        values.append(value / totals)
+
+        roots.append(offset)
+        offset += tree.node_count
+
+    return {
+        "feature": np.ascontiguousarray(np.concatenate(features)),
+        "threshold": np.ascontiguousarray(np.concatenate(thresholds)),
+        "children_left": np.ascontiguousarray(np.concatenate(lefts)),
+        "children_right": np.ascontiguousarray(np.concatenate(rights)),
+        "value": np.ascontiguousarray(np.concatenate(values)),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "max_depth": int(max(e.tree_.max_depth for e in model.estimators_)),
+        "classes": np.asarray(model.classes_),
+        "scaler_folded": False,
+    }
+
+
+def fold_scaler(arrays: dict, scaler) -> dict:
+    """Rewrite split thresholds from StandardScaler units into raw feature units.
+
+    Trees only compare a feature against a threshold, so a monotone per-feature
+    transform can be moved into the thresholds. sklearn decides a split as
+    ``float32((x - mean_) / scale_) <= threshold``; for each split this finds,
+    by bisection over float64 values, the largest raw ``x`` for which that
+    holds. Comparing raw inputs against the result gives exactly the same
+    decisions as scaling first, for every input, so serving can skip the
+    scaler entirely.
+    """
+    if arrays.get("scaler_folded"):
+        raise ValueError("Scaler is already folded into these thresholds")
+
+    n_features = len(scaler.scale_) if scaler.with_std else len(scaler.mean_)
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+    feature = arrays["feature"]
+    internal = arrays["children_left"] != np.arange(len(feature))
+    node_mean = mean[feature[internal]]
+    node_scale = scale[feature[internal]]
+    threshold = arrays["threshold"][internal]
+
+    def goes_left(x):
+        return ((x - node_mean) / node_scale).astype(np.float32) <= threshold
+
+    # Bracket the boundary around the algebraic inverse, widening where needed
+    estimate = threshold * node_scale + node_mean
+    width = node_scale * (np.abs(threshold) + 1.0) * 1e-6
+    lo, hi = estimate - width, estimate + width
+    for _ in range(64):
+        bad_lo, bad_hi = ~goes_left(lo), goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width *= 2
+        lo = np.where(bad_lo, estimate - width, lo)
+        hi = np.where(bad_hi, estimate + width, hi)
+    else:
+        raise ValueError("Could not bracket folded thresholds")
+
+    # Bisect until lo and hi are adjacent float64 values
+    while True:
+        unresolved = np.nextafter(lo, np.inf) < hi
+        if not unresolved.any():
+            break
+        mid = lo + (hi - lo) / 2
+        left = goes_left(mid)
+        lo = np.where(unresolved & left, mid, lo)
+        hi = np.where(unresolved & ~left, mid, hi)
+
+    folded = dict(arrays)
+    raw_threshold = np.array(arrays["threshold"], dtype=np.float64)
+    raw_threshold[internal] = lo
+    folded["threshold"] = raw_threshold
+    folded["scaler_folded"] = True
+    return folded
+
+
+class FlatForest:
+    """Pure NumPy evaluator over the arrays produced by flatten_forest.
+
+    All trees are walked together, one level per step, for ``max_depth``
+    steps; leaves loop back on themselves so rows that reach a leaf early
+    simply stay there. Inputs are compared as float32, like sklearn's tree
+    code, so probabilities match RandomForestClassifier.predict_proba.
+
+    If the arrays came from fold_scaler, inputs are raw (unscaled) feature
+    values and are compared as float64 against the folded thresholds.
+    """
+
+    def __init__(self, arrays: dict):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.children_left = arrays["children_left"]
+        self.children_right = arrays["children_right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.max_depth = int(arrays["max_depth"])
+        self.classes_ = arrays["classes"]
+        self.n_estimators = len(self.roots)
+        self.scaler_folded = bool(arrays.get("scaler_folded", False))
+        self.input_dtype = np.float64 if self.scaler_folded else np.float32
+
+    @classmethod
+    def from_model(cls, model) -> "FlatForest":
+        return cls(flatten_forest(model))
+
+    def predict_proba_one(self, x: np.ndarray) -> np.ndarray:
+        """Class probabilities for a single row of n_features values"""
+        x = np.asarray(x, dtype=self.input_dtype).ravel()
+        nodes = self.roots
+        for _ in range(self.max_depth):
+            go_left = x[self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return self.value[nodes].mean(axis=0)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities for an (N, n_features) matrix"""
+        X = np.asarray(X, dtype=self.input_dtype)
+        if X.ndim == 1 or len(X) == 1:
+            return self.predict_proba_one(X).reshape(1, -1)
+
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return self.value[nodes].mean(axis=1)
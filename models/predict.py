@@ -1,13 +1,14 @@
-import pandas as pd
+import hashlib
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
-from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 from joblib import dump, load
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from .bundle import bundle_exists, file_sha256, load_bundle, save_bundle
+from .forest import FlatForest
+
+# Batches up to this size are scored with the NumPy FlatForest evaluator, which
+# avoids sklearn's per-call validation and joblib dispatch; larger batches go
+# through sklearn, whose compiled traversal wins once the overhead is amortised
+COMPILED_FOREST_MAX_ROWS = 512
 
 class WaterQualityPredictor:
     def __init__(self, model_path: str = None):
@@ -17,42 +18,69 @@ class WaterQualityPredictor:
         self.model_path = model_path or "models/water_quality_model.joblib"
         self.scaler_path = model_path.replace('.joblib', '_scaler.joblib') if model_path else "models/water_quality_scaler.joblib"
         self.encoder_path = model_path.replace('.joblib', '_encoder.joblib') if model_path else "models/water_quality_encoder.joblib"
+        self.bundle_dir = model_path.replace('.joblib', '_bundle') if model_path else "models/water_quality_bundle"
         self.feature_columns = None
+        self.feature_dtypes = None
+        self.target_column = None
+        self.manifest = None
+        self.forest = None
+        self.compiled_forest = None
+        self.legacy_version = None
+        # Optional models.cache.PredictionCache consulted by predict_batch
+        self.cache = None
+
+    @property
+    def model_version(self):
+        """Version of the loaded bundle or legacy artifacts, or None if nothing is loaded"""
+        return self.manifest["model_version"] if self.manifest else self.legacy_version
+        
+    def load_training_data(self, data_path: str):
+        """Read the training spreadsheet and return numeric features X and target y"""
+        import pandas as pd
+
+        print(f"Loading data from {data_path}...")
+        df = pd.read_excel(data_path)
+        print(f"Available columns: {df.columns.tolist()}")
+        
+        # Look for potability column with case-insensitive match
         self.target_column = None
+        for col in df.columns:
+            if col.lower() == 'potability':
+                self.target_column = col
+                break
+        
+        if self.target_column is None:
+            raise ValueError("Could not find 'Potability' column in dataset")
+        
+        # Drop non-numeric columns that aren't relevant for prediction
+        columns_to_drop = ['Stationcode', 'Locations', 'Capitalcity', 'State']
+        df = df.drop(columns=[col for col in columns_to_drop if col in df.columns])
+        
+        # Convert remaining columns to numeric, replacing non-numeric values with NaN
+        for col in df.columns:
+            if col != self.target_column:
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+        
+        # Drop rows with NaN values
+        df = df.dropna()
+        
+        # Prepare features and target
+        X = df.drop([self.target_column], axis=1)
+        y = df[self.target_column]
         
+        return X, y
+    
     def train(self, data_path: str):
         """Train the model using the provided dataset"""
+        # Training-only dependencies are imported here so serving workers never load them
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+        from sklearn.metrics import classification_report, roc_auc_score
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+
         try:
             # Load and prepare data
-            print(f"Loading data from {data_path}...")
-            df = pd.read_excel(data_path)
-            print(f"Available columns: {df.columns.tolist()}")
-            
-            # Look for potability column with case-insensitive match
-            self.target_column = None
-            for col in df.columns:
-                if col.lower() == 'potability':
-                    self.target_column = col
-                    break
-            
-            if self.target_column is None:
-                raise ValueError("Could not find 'Potability' column in dataset")
-            
-            # Drop non-numeric columns that aren't relevant for prediction
-            columns_to_drop = ['Stationcode', 'Locations', 'Capitalcity', 'State']
-            df = df.drop(columns=[col for col in columns_to_drop if col in df.columns])
-            
-            # Convert remaining columns to numeric, replacing non-numeric values with NaN
-            for col in df.columns:
-                if col != self.target_column:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Drop rows with NaN values
-            df = df.dropna()
-            
-            # Prepare features and target
-            X = df.drop([self.target_column], axis=1)
-            y = df[self.target_column]
+            X, y = self.load_training_data(data_path)
             
             # Encode target variable
             self.label_encoder = LabelEncoder()
@@ -60,10 +88,11 @@ class WaterQualityPredictor:
             
             # Store feature columns for later use in prediction
             self.feature_columns = X.columns.tolist()
+            self.feature_dtypes = {col: str(dtype) for col, dtype in X.dtypes.items()}
             
             print(f"\nFeatures after preprocessing: {self.feature_columns}")
             print(f"Target column: {self.target_column}")
-            print(f"Number of samples after preprocessing: {len(df)}")
+            print(f"Number of samples after preprocessing: {len(X)}")
             
             # Analyze class distribution
             print("\nClass distribution:")
@@ -112,6 +141,7 @@ class WaterQualityPredictor:
             
             # Get best model
             self.model = grid_search.best_estimator_
+            self.compiled_forest = self._compile_forest()
             print(f"\nBest parameters: {grid_search.best_params_}")
             
             # Perform cross-validation with best model
@@ -126,7 +156,8 @@ class WaterQualityPredictor:
             print("\nClassification Report:")
             print(classification_report(y_test, y_pred, target_names=self.label_encoder.classes_))
             
-            print(f"\nROC-AUC Score: {roc_auc_score(y_test, y_prob):.2%}")
+            test_roc_auc = roc_auc_score(y_test, y_prob)
+            print(f"\nROC-AUC Score: {test_roc_auc:.2%}")
             
             # Plot confusion matrix
             self._plot_confusion_matrix(y_test, y_pred)
@@ -140,6 +171,15 @@ class WaterQualityPredictor:
             dump(self.scaler, self.scaler_path)
             dump(self.label_encoder, self.encoder_path)
             
+            # Save the self-describing bundle used for serving
+            self.save_bundle(data_path, metrics={
+                "cv_roc_auc_mean": float(cv_scores.mean()),
+                "cv_roc_auc_std": float(cv_scores.std()),
+                "test_roc_auc": float(test_roc_auc),
+                "best_params": {k: str(v) for k, v in grid_search.best_params_.items()},
+                "n_samples": int(len(X))
+            })
+            
             return cv_scores.mean()
             
         except Exception as e:
@@ -148,6 +188,8 @@ class WaterQualityPredictor:
     
     def _plot_feature_distributions(self, X, y):
         """Plot distributions of features for each class"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(15, 10))
         for i, feature in enumerate(X.columns):
             plt.subplot(3, 4, i+1)
@@ -159,6 +201,9 @@ class WaterQualityPredictor:
     
     def _plot_confusion_matrix(self, y_true, y_pred):
         """Plot confusion matrix"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        from sklearn.metrics import confusion_matrix
         cm = confusion_matrix(y_true, y_pred)
         plt.figure(figsize=(8, 6))
         sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
@@ -172,6 +217,9 @@ class WaterQualityPredictor:
     
     def _plot_feature_importance(self, X):
         """Plot feature importance"""
+        import pandas as pd
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         importance = pd.Series(self.model.feature_importances_, index=X.columns)
         importance = importance.sort_values(ascending=False)
         plt.figure(figsize=(10, 6))
@@ -181,42 +229,186 @@ class WaterQualityPredictor:
         plt.savefig('feature_importance.png')
         plt.close()
     
-    def load_model(self):
-        """Load the trained model, scaler, and encoder"""
+    def _compile_forest(self):
+        """Build a FlatForest from the fitted model, if it is a tree ensemble"""
+        if hasattr(self.model, "estimators_") and all(hasattr(e, "tree_") for e in self.model.estimators_):
+            return FlatForest.from_model(self.model)
+        return None
+    
+    def save_bundle(self, training_data_path: str = None, metrics: dict = None,
+                    fold_scaler_thresholds: bool = False) -> dict:
+        """Save the fitted model as a versioned bundle in self.bundle_dir.
+        
+        With fold_scaler_thresholds the stored forest compares raw feature values,
+        so serving skips the scaler (see models.forest.fold_scaler).
+        """
+        self.manifest = save_bundle(
+            self.bundle_dir,
+            model=self.model,
+            scaler=self.scaler,
+            label_encoder=self.label_encoder,
+            feature_columns=self.feature_columns,
+            feature_dtypes=self.feature_dtypes,
+            target_column=self.target_column or "Potability",
+            metrics=metrics,
+            training_data_path=training_data_path,
+            fold_scaler_thresholds=fold_scaler_thresholds
+        )
+        return self.manifest
+    
+    def load_model(self, mmap_mode: str = "r"):
+        """Load the model bundle, falling back to the legacy model, scaler, and encoder files"""
+        if bundle_exists(self.bundle_dir):
+            try:
+                bundle = load_bundle(self.bundle_dir, mmap_mode=mmap_mode)
+                self.model = bundle["model"]
+                self.scaler = bundle["scaler"]
+                self.label_encoder = bundle["label_encoder"]
+                self.forest = bundle["forest"]
+                self.compiled_forest = FlatForest(self.forest)
+                self.manifest = bundle["manifest"]
+                self.feature_columns = self.manifest["feature_columns"]
+                self.feature_dtypes = self.manifest["feature_dtypes"]
+                self.target_column = self.manifest["target_column"]
+                self.legacy_version = None
+                return True
+            except Exception as e:
+                print(f"Error loading model bundle: {e}")
+        return self.load_legacy_artifacts()
+    
+    def load_legacy_artifacts(self):
+        """Load the trained model, scaler, and encoder from separate joblib files"""
         if all(os.path.exists(path) for path in [self.model_path, self.scaler_path, self.encoder_path]):
             try:
                 self.model = load(self.model_path)
                 self.scaler = load(self.scaler_path)
                 self.label_encoder = load(self.encoder_path)
+                # The scaler was fitted on a DataFrame, so it remembers the feature order
+                feature_names = getattr(self.scaler, "feature_names_in_", None)
+                if feature_names is not None:
+                    self.feature_columns = [str(name) for name in feature_names]
+                    self.feature_dtypes = {col: "float64" for col in self.feature_columns}
+                self.compiled_forest = self._compile_forest()
+                # Nothing from a previously loaded bundle describes these artifacts
+                self.manifest = None
+                self.forest = None
+                self.legacy_version = self._legacy_artifacts_version()
                 return True
             except Exception as e:
                 print(f"Error loading model: {e}")
                 return False
         return False
     
+    def _legacy_artifacts_version(self) -> str:
+        """Digest of the model, scaler and encoder files, so cached predictions follow retrains"""
+        digest = hashlib.sha256()
+        for path in (self.model_path, self.scaler_path, self.encoder_path):
+            digest.update(file_sha256(path).encode())
+        return "legacy-" + digest.hexdigest()[:12]
+
+    def _ensure_loaded(self):
+        if self.model is None and not self.load_model():
+            raise ValueError("Model not trained or loaded")
+        
+        if self.feature_columns is None:
+            raise ValueError("Model not properly trained - feature columns not available")
+    
+    def _to_matrix(self, input_data) -> np.ndarray:
+        """Build an (N, n_features) float64 matrix in feature order"""
+        if isinstance(input_data, np.ndarray):
+            matrix = np.asarray(input_data, dtype=np.float64)
+            if matrix.ndim == 1:
+                matrix = matrix.reshape(1, -1)
+            if matrix.ndim != 2 or matrix.shape[1] != len(self.feature_columns):
+                raise ValueError(
+                    f"Expected an array of shape (n, {len(self.feature_columns)}), got {input_data.shape}"
+                )
+        else:
+            for i, row in enumerate(input_data):
+                missing = [col for col in self.feature_columns if col not in row]
+                if missing:
+                    raise ValueError(f"Missing input features in row {i}: {missing}")
+            matrix = np.array(
+                [[row[col] for col in self.feature_columns] for row in input_data],
+                dtype=np.float64
+            ).reshape(-1, len(self.feature_columns))
+        
+        if not np.isfinite(matrix).all():
+            bad_rows = np.flatnonzero(~np.isfinite(matrix).all(axis=1)).tolist()
+            raise ValueError(f"Non-finite input values in rows {bad_rows}")
+        return matrix
+    
+    def _scale(self, matrix: np.ndarray) -> np.ndarray:
+        """Apply the fitted StandardScaler without sklearn's per-call validation"""
+        scaled = matrix
+        if self.scaler.with_mean:
+            scaled = scaled - self.scaler.mean_
+        if self.scaler.with_std:
+            scaled = scaled / self.scaler.scale_
+        return scaled
+    
+    def predict_batch(self, input_data) -> list[tuple[bool, float]]:
+        """Make predictions for many rows at once.
+        
+        input_data is an (N, n_features) array in feature_columns order or a list
+        of dicts keyed by feature name. Rows are scaled and scored together with a
+        single predict_proba call; labels are the argmax of the probabilities,
+        which is what RandomForestClassifier.predict does. Returns one
+        (is_potable, probability) tuple per row, in input order.
+        
+        If self.cache is set, rows are quantised to instrument precision first
+        and only rows missing from the cache are scored.
+        """
+        self._ensure_loaded()
+        matrix = self._to_matrix(input_data)
+        if len(matrix) == 0:
+            return []
+        if self.cache is None:
+            return self._predict_matrix(matrix)
+        
+        keys, quantized = self.cache.quantize_matrix(matrix, self.feature_columns)
+        version = self.model_version
+        results = [None] * len(keys)
+        misses = {}
+        for i, key in enumerate(keys):
+            if key in misses:
+                misses[key].append(i)
+                continue
+            found, value = self.cache.get(key, version)
+            if found:
+                results[i] = value
+            else:
+                misses[key] = [i]
+        if misses:
+            # Score each distinct missing key once, even if repeated in the batch
+            first_rows = [rows[0] for rows in misses.values()]
+            for (key, rows), value in zip(misses.items(), self._predict_matrix(quantized[first_rows])):
+                self.cache.put(key, value, version)
+                for i in rows:
+                    results[i] = value
+        return results
+    
+    def _predict_matrix(self, matrix: np.ndarray) -> list[tuple[bool, float]]:
+        if self.compiled_forest is not None and len(matrix) <= COMPILED_FOREST_MAX_ROWS:
+            if self.compiled_forest.scaler_folded:
+                # Thresholds are in raw units, so no scaling is needed
+                probabilities = self.compiled_forest.predict_proba(matrix)
+            else:
+                probabilities = self.compiled_forest.predict_proba(self._scale(matrix))
+        else:
+            probabilities = self.model.predict_proba(self._scale(matrix))
+        encoded = self.model.classes_[np.argmax(probabilities, axis=1)]
+        labels = self.label_encoder.classes_[encoded]
+        positive = probabilities[:, 1]
+        return [
+            (bool(label == 'yes'), float(probability))
+            for label, probability in zip(labels, positive)
+        ]
+    
     def predict(self, input_data: dict) -> tuple[bool, float]:
         """Make prediction for new input data"""
         try:
-            if self.model is None and not self.load_model():
-                raise ValueError("Model not trained or loaded")
-            
-            if self.feature_columns is None:
-                raise ValueError("Model not properly trained - feature columns not available")
-                
-            # Convert input to DataFrame with correct column order
-            input_df = pd.DataFrame([input_data], columns=self.feature_columns)
-            
-            # Scale features
-            input_scaled = self.scaler.transform(input_df)
-            
-            # Make prediction
-            prediction = self.model.predict(input_scaled)[0]
-            probability = self.model.predict_proba(input_scaled)[0][1]
-            
-            # Convert prediction back to original label
-            prediction_label = self.label_encoder.inverse_transform([prediction])[0]
-            
-            return bool(prediction_label == 'yes'), float(probability)
+            return self.predict_batch([input_data])[0]
         except Exception as e:
             print(f"Error during prediction: {e}")
-            raise 
\ No newline at end of file
+            raise 
@@ -287,4 +287,61 @@ GUIDELINES = {
             }
         }
     }
-} 
\ No newline at end of file
+} 
+
+# Shown with every recommendation for the parameter
+PARAMETER_DESCRIPTIONS = {
+    "ph": "pH measures water's acidity or alkalinity. Extreme values can affect water treatment efficiency and pipe corrosion.",
+    "dissolved_oxygen": "Dissolved oxygen is crucial for aquatic life. Low levels can cause fish kills and anaerobic conditions.",
+    "conductivity": "Conductivity indicates water's ability to conduct electricity, reflecting dissolved solids content.",
+    "bod": "Biochemical Oxygen Demand measures organic matter content. High BOD indicates poor water quality.",
+    "nitrate": "Nitrate levels above 10 mg/L can cause methemoglobinemia (blue baby syndrome) in infants.",
+    "fecal_coliform": "Fecal coliform indicates potential presence of disease-causing organisms from human/animal waste.",
+    "total_coliform": "Total coliform indicates overall microbial water quality and potential contamination."
+}
+
+# Health implications per parameter and severity level
+HEALTH_IMPLICATIONS = {
+    "ph": {
+        "mild": ["Slight irritation to eyes and skin", "Reduced effectiveness of disinfection"],
+        "moderate": ["Increased corrosion of pipes", "Reduced effectiveness of water treatment"],
+        "severe": ["Significant corrosion of infrastructure", "Potential health risks from heavy metal leaching"],
+        "critical": ["Immediate health risks", "Severe infrastructure damage"]
+    },
+    "dissolved_oxygen": {
+        "mild": ["Stress on aquatic life", "Reduced water quality"],
+        "moderate": ["Fish kills possible", "Anaerobic conditions developing"],
+        "severe": ["Mass fish kills", "Severe ecosystem damage"],
+        "critical": ["Complete ecosystem collapse", "Production of toxic gases"]
+    },
+    "conductivity": {
+        "mild": ["Slight taste changes", "Minor scaling in pipes"],
+        "moderate": ["Increased scaling", "Reduced effectiveness of treatment"],
+        "severe": ["Severe scaling", "Potential health risks from high mineral content"],
+        "critical": ["Immediate health risks", "Infrastructure damage"]
+    },
+    "bod": {
+        "mild": ["Slight odor issues", "Minor water quality degradation"],
+        "moderate": ["Significant odor problems", "Reduced oxygen levels"],
+        "severe": ["Severe water quality issues", "Potential health risks"],
+        "critical": ["Immediate health risks", "Complete water quality failure"]
+    },
+    "nitrate": {
+        "mild": ["Slight risk to sensitive populations", "Minor water quality issues"],
+        "moderate": ["Risk to infants and pregnant women", "Potential health impacts"],
+        "severe": ["Significant health risks", "Potential for methemoglobinemia"],
+        "critical": ["Immediate health risks", "Life-threatening conditions possible"]
+    },
+    "fecal_coliform": {
+        "mild": ["Low risk of waterborne illness", "Minor contamination"],
+        "moderate": ["Moderate risk of illness", "Significant contamination"],
+        "severe": ["High risk of illness", "Severe contamination"],
+        "critical": ["Immediate health risks", "Outbreak potential"]
+    },
+    "total_coliform": {
+        "mild": ["Low risk of contamination", "Minor water quality issues"],
+        "moderate": ["Moderate risk of contamination", "Significant water quality issues"],
+        "severe": ["High risk of contamination", "Severe water quality issues"],
+        "critical": ["Immediate health risks", "Outbreak potential"]
+    }
+}
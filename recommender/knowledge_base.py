@@ -0,0 +1,226 @@
+"""GUIDELINES compiled once into a read-only, indexed recommendation catalogue.
+
+Compiling once at import replaces the per-call work the recommender used to
+do: severity comes from a bisect over each parameter's sorted thresholds,
+and the recommendation templates for every (parameter, direction, severity)
+are built up front and shared between calls. Only current_value differs
+from one reading to the next.
+
+Each non-empty template list is also a numbered CatalogueEntry, so batch
+classification can return small integer references into the catalogue
+instead of copies of the recommendations. Entries also carry compact
+templates that refer to their text by stable ID ("ph:low:immediate:0" for
+an action, "ph:severe" for health implications) for responses that send
+each string once.
+"""
+import hashlib
+import json
+from bisect import bisect_right
+from types import MappingProxyType
+
+import numpy as np
+
+from .guidelines import GUIDELINES, HEALTH_IMPLICATIONS, PARAMETER_DESCRIPTIONS
+
+PRIORITIES = ("immediate", "short_term", "long_term", "preventive")
+SEVERITY_LEVELS = ("mild", "moderate", "severe", "critical")
+DIRECTIONS = ("low", "high")
+
+
+class CatalogueEntry:
+    """The recommendations for one (parameter, direction, severity)"""
+
+    __slots__ = ("id", "parameter", "direction", "severity", "recommendations", "compact", "texts")
+
+    def __init__(self, id: int, parameter: str, direction: str, severity: str, recommendations: tuple,
+                 compact: tuple, texts: dict):
+        self.id = id
+        self.parameter = parameter
+        self.direction = direction
+        self.severity = severity
+        self.recommendations = recommendations
+        # Templates with the text replaced by IDs, and the text by ID
+        self.compact = compact
+        self.texts = texts
+
+
+class ParameterRule:
+    """Acceptable range, severity thresholds and recommendation templates for one parameter.
+
+    Entries with recommendations are appended to ``catalogue``, which
+    numbers them.
+    """
+
+    __slots__ = ("name", "minimum", "maximum", "acceptable_range", "description", "_implications",
+                 "_thresholds", "_recommendations", "_entries", "_entry_ids")
+
+    def __init__(self, name: str, guideline: dict, catalogue: list,
+                 description: str = None, health_implications: dict = None):
+        self.name = name
+        self.minimum, self.maximum = guideline["range"]
+        self.acceptable_range = (self.minimum, self.maximum)
+        self.description = description or "No description available"
+        self._implications = health_implications or {}
+
+        # severity_levels describe whichever side of the range they lie on.
+        # Thresholds are stored ascending in "distance from the range" so one
+        # bisect finds the most severe level crossed; the low side is negated.
+        levels = sorted(guideline["severity_levels"].items(), key=lambda item: item[1])
+        thresholds = {direction: ((), ()) for direction in DIRECTIONS}
+        if levels and levels[0][1] >= self.maximum:
+            thresholds["high"] = (tuple(t for _, t in levels), tuple(level for level, _ in levels))
+        elif levels and levels[-1][1] <= self.minimum:
+            levels.reverse()
+            thresholds["low"] = (tuple(-t for _, t in levels), tuple(level for level, _ in levels))
+        self._thresholds = MappingProxyType(thresholds)
+
+        recommendations = {}
+        entries = {}
+        for direction, measures in guideline["measures"].items():
+            for severity in SEVERITY_LEVELS:
+                templates = self._build(direction, severity, measures)
+                recommendations[direction, severity] = templates
+                if templates:
+                    entries[direction, severity] = CatalogueEntry(
+                        len(catalogue), name, direction, severity, templates,
+                        *self._build_compact(direction, severity, measures)
+                    )
+                    catalogue.append(entries[direction, severity])
+        self._recommendations = MappingProxyType(recommendations)
+        self._entries = MappingProxyType(entries)
+
+        # Catalogue id per severity index of each direction (-1: nothing to
+        # recommend), aligned with the thresholds for classify_many
+        entry_ids = {}
+        for direction in DIRECTIONS:
+            levels = self._thresholds[direction][1] or SEVERITY_LEVELS[:1]
+            entry_ids[direction] = np.array(
+                [entries[direction, level].id if (direction, level) in entries else -1 for level in levels],
+                dtype=np.int32
+            )
+        self._entry_ids = MappingProxyType(entry_ids)
+
+    def _health_implications(self, severity: str) -> tuple:
+        return tuple(self._implications.get(severity, ["Unknown health implications"]))
+
+    def _build(self, direction: str, severity: str, measures: dict) -> tuple:
+        implications = self._health_implications(severity)
+        templates = []
+        for priority in PRIORITIES:
+            for action in measures.get(priority) or ():
+                templates.append({
+                    "parameter": self.name,
+                    "severity": severity,
+                    "description": self.description,
+                    "health_implications": implications,
+                    "action": action,
+                    "priority": priority,
+                    "current_value": None,
+                    "acceptable_range": self.acceptable_range,
+                })
+        return tuple(templates)
+
+    def _build_compact(self, direction: str, severity: str, measures: dict) -> tuple:
+        implications_id = f"{self.name}:{severity}"
+        texts = {
+            "parameters": {self.name: {"description": self.description, "acceptable_range": self.acceptable_range}},
+            "health_implications": {implications_id: self._health_implications(severity)},
+            "actions": {},
+        }
+        templates = []
+        for priority in PRIORITIES:
+            for i, action in enumerate(measures.get(priority) or ()):
+                action_id = f"{self.name}:{direction}:{priority}:{i}"
+                texts["actions"][action_id] = action
+                templates.append({
+                    "parameter": self.name,
+                    "severity": severity,
+                    "health_implications_id": implications_id,
+                    "action_id": action_id,
+                    "priority": priority,
+                    "current_value": None,
+                })
+        return tuple(templates), texts
+
+    def direction(self, value: float):
+        """"low" or "high" for a value outside the acceptable range, else None"""
+        if value < self.minimum:
+            return "low"
+        if value > self.maximum:
+            return "high"
+        return None
+
+    def severity(self, value: float, direction: str) -> str:
+        """Most severe level whose threshold the value has crossed.
+
+        Values outside the range that have not reached the first threshold,
+        and directions without thresholds, are "mild".
+        """
+        thresholds, levels = self._thresholds[direction]
+        crossed = bisect_right(thresholds, value if direction == "high" else -value)
+        return levels[crossed - 1] if crossed else SEVERITY_LEVELS[0]
+
+    def recommendations(self, direction: str, severity: str) -> tuple:
+        """Shared recommendation templates in priority order; copy before changing one"""
+        return self._recommendations.get((direction, severity), ())
+
+    def entry(self, direction: str, severity: str):
+        """The CatalogueEntry for a direction and severity, or None when there is nothing to recommend"""
+        return self._entries.get((direction, severity))
+
+    def classify_many(self, values: np.ndarray) -> np.ndarray:
+        """Catalogue entry id for each value; -1 inside the range, for NaN or with no measures"""
+        values = np.asarray(values, dtype=np.float64)
+        ids = np.full(values.shape, -1, dtype=np.int32)
+        for direction in DIRECTIONS:
+            outside = values > self.maximum if direction == "high" else values < self.minimum
+            if not outside.any():
+                continue
+            thresholds = self._thresholds[direction][0]
+            selected = values[outside]
+            crossed = np.searchsorted(thresholds, selected if direction == "high" else -selected, side="right")
+            ids[outside] = self._entry_ids[direction][np.maximum(crossed - 1, 0)]
+        return ids
+
+
+class KnowledgeBase:
+    """Read-only index of ParameterRule by parameter name, plus the numbered catalogue.
+
+    ``version`` fingerprints the guidelines, descriptions and health
+    implications it was compiled from; ``label`` is the human-readable
+    version of the guideline set ("builtin" for recommender/guidelines.py).
+    """
+
+    def __init__(self, guidelines: dict, descriptions: dict = None, health_implications: dict = None,
+                 label: str = "builtin"):
+        descriptions = PARAMETER_DESCRIPTIONS if descriptions is None else descriptions
+        health_implications = HEALTH_IMPLICATIONS if health_implications is None else health_implications
+        catalogue = []
+        self.rules = MappingProxyType({
+            name: ParameterRule(name, g, catalogue, descriptions.get(name), health_implications.get(name))
+            for name, g in guidelines.items()
+        })
+        self.catalogue = tuple(catalogue)
+        self.guidelines = guidelines
+        self.label = label
+        self.version = guideline_version(guidelines, descriptions, health_implications)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rules
+
+    def get(self, name: str):
+        return self.rules.get(name)
+
+
+def guideline_version(guidelines: dict, descriptions: dict, health_implications: dict) -> str:
+    """Content fingerprint of a guideline set; equal content gives an equal version"""
+    content = json.dumps([guidelines, descriptions, health_implications], sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:12]
+
+
+def compile_guidelines(guidelines: dict = GUIDELINES, descriptions: dict = None,
+                       health_implications: dict = None, label: str = "builtin") -> KnowledgeBase:
+    return KnowledgeBase(guidelines, descriptions, health_implications, label)
+
+
+KNOWLEDGE_BASE = compile_guidelines()
@@ -0,0 +1,217 @@
+"""Versioned guideline files and a watcher that hot-swaps them in.
+
+A guideline file is JSON:
+
+    {
+      "version": "2026-10-01",          label shown in /metrics
+      "guidelines": {...},              same shape as recommender.guidelines.GUIDELINES
+      "descriptions": {...},            optional, defaults to PARAMETER_DESCRIPTIONS
+      "health_implications": {...}      optional, defaults to HEALTH_IMPLICATIONS
+    }
+
+``python -m recommender.loader export PATH`` writes the built-in set in
+this format to start from; ``check PATH`` validates a file without serving
+it. data/who_guidelines.json (parse_guidelines.py output) is a raw PDF
+extract without priorities or severity levels and does not validate as a
+guideline set.
+
+The watcher polls the file's mtime and size. A changed file is loaded,
+validated and compiled on the watcher thread, then swapped in by replacing
+WaterQualityRecommender.knowledge_base, a single attribute assignment, so
+requests never wait on a lock. A file that fails to load, whatever the
+error, is reported and the current guidelines stay in service.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from .guidelines import GUIDELINES, HEALTH_IMPLICATIONS, PARAMETER_DESCRIPTIONS
+from .knowledge_base import DIRECTIONS, PRIORITIES, SEVERITY_LEVELS, KnowledgeBase, compile_guidelines
+
+
+def validate_guidelines(guidelines: dict):
+    """Raise ValueError describing the first problem in a GUIDELINES-shaped dict"""
+    if not isinstance(guidelines, dict) or not guidelines:
+        raise ValueError("guidelines must be a non-empty object")
+    for name, guideline in guidelines.items():
+        where = f"guidelines.{name}"
+        if not isinstance(guideline, dict):
+            raise ValueError(f"{where} must be an object")
+        bounds = guideline.get("range")
+        if (not isinstance(bounds, list) or len(bounds) != 2
+                or not all(isinstance(b, (int, float)) for b in bounds) or bounds[0] > bounds[1]):
+            raise ValueError(f"{where}.range must be [min, max] with min <= max")
+
+        levels = guideline.get("severity_levels")
+        if not isinstance(levels, dict):
+            raise ValueError(f"{where}.severity_levels must map severity levels to thresholds")
+        for level, threshold in levels.items():
+            if level not in SEVERITY_LEVELS or not isinstance(threshold, (int, float)):
+                raise ValueError(f"{where}.severity_levels.{level} must be one of {SEVERITY_LEVELS} with a number")
+        thresholds = list(levels.values())
+        if thresholds and not (min(thresholds) >= bounds[1] or max(thresholds) <= bounds[0]):
+            raise ValueError(f"{where}.severity_levels must all lie above or all below the range")
+
+        measures = guideline.get("measures")
+        if not isinstance(measures, dict):
+            raise ValueError(f"{where}.measures must map directions to priorities")
+        for direction, by_priority in measures.items():
+            if direction not in DIRECTIONS or not isinstance(by_priority, dict):
+                raise ValueError(f"{where}.measures.{direction} must be one of {DIRECTIONS} mapping priorities to actions")
+            for priority, actions in by_priority.items():
+                if (priority not in PRIORITIES or not isinstance(actions, list)
+                        or not all(isinstance(a, str) for a in actions)):
+                    raise ValueError(f"{where}.measures.{direction}.{priority} must be one of {PRIORITIES} "
+                                     f"with a list of actions")
+
+
+def load_knowledge_base(path: str) -> KnowledgeBase:
+    """Load, validate and compile a guideline file"""
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or "guidelines" not in data:
+        raise ValueError(f"{path} is not a guideline set: no top-level \"guidelines\"")
+    validate_guidelines(data["guidelines"])
+    return compile_guidelines(
+        data["guidelines"],
+        data.get("descriptions", PARAMETER_DESCRIPTIONS),
+        data.get("health_implications", HEALTH_IMPLICATIONS),
+        label=str(data.get("version", "unversioned")),
+    )
+
+
+def export_guidelines(path: str, version: str = "builtin"):
+    """Write the built-in guidelines as a guideline file"""
+    with open(path, "w") as f:
+        json.dump({
+            "version": version,
+            "guidelines": GUIDELINES,
+            "descriptions": PARAMETER_DESCRIPTIONS,
+            "health_implications": HEALTH_IMPLICATIONS,
+        }, f, indent=2)
+        f.write("\n")
+
+
+class GuidelineWatcher:
+    """Reload a guideline file into a WaterQualityRecommender when it changes.
+
+    ``start`` runs ``check`` every ``interval`` seconds on a daemon thread.
+    Threads do not survive fork, so processes forked after ``start`` (such
+    as process-pool workers) call ``poll`` instead, which checks inline at
+    most once per interval.
+    """
+
+    def __init__(self, recommender, path: str, interval: float = 5.0):
+        self.recommender = recommender
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.loaded_at = None
+        self._signature = None
+        self._last_poll = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> bool:
+        """Load the file if it changed since the last check; True if new guidelines were swapped in"""
+        signature = None
+        try:
+            signature = self._stat()
+            if signature == self._signature:
+                return False
+            knowledge_base = load_knowledge_base(self.path)
+        except Exception as e:
+            # Validation does not cover every field compile_guidelines reads, so
+            # anything it raises counts as an invalid file; that is not retried
+            # until it changes again, and the watcher thread keeps running
+            self._signature = signature
+            self.failures += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Failed to load guidelines from {self.path}: {self.last_error}")
+            return False
+
+        self._signature = signature
+        current = self.recommender.knowledge_base
+        if (knowledge_base.version, knowledge_base.label) == (current.version, current.label):
+            return False
+        previous = self.recommender.knowledge_base
+        self.recommender.knowledge_base = knowledge_base
+        self.reloads += 1
+        self.last_error = None
+        self.loaded_at = datetime.now(timezone.utc).isoformat()
+        print(f"Guidelines {previous.label} ({previous.version}) -> "
+              f"{knowledge_base.label} ({knowledge_base.version}) from {self.path}")
+        return True
+
+    def poll(self) -> bool:
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        now = time.monotonic()
+        if now - self._last_poll < self.interval:
+            return False
+        self._last_poll = now
+        return self.check()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Guideline watcher check failed, will retry: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="guideline-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def snapshot(self) -> dict:
+        knowledge_base = self.recommender.knowledge_base
+        return {
+            "path": self.path,
+            "label": knowledge_base.label,
+            "version": knowledge_base.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or validate guideline files")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Write the built-in guidelines to a file")
+    export.add_argument("path")
+    export.add_argument("--version", default="builtin", help="Label stored in the file")
+    check = subparsers.add_parser("check", help="Validate a file and print its version")
+    check.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_guidelines(args.path, args.version)
+        print(f"Wrote built-in guidelines to {args.path}")
+    else:
+        knowledge_base = load_knowledge_base(args.path)
+        print(f"{args.path}: {knowledge_base.label} ({knowledge_base.version}), "
+              f"{len(knowledge_base.rules)} parameters, {len(knowledge_base.catalogue)} catalogue entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,155 +1,163 @@
-from typing import Dict, List
-from .guidelines import GUIDELINES
+from typing import Dict, List, Mapping, Sequence
+
+import numpy as np
+
+from .knowledge_base import KNOWLEDGE_BASE, PRIORITIES
+
+# Numeric stand-ins for qualitative readings
+VALUE_MAPPING = {
+    "low": 0.0,
+    "high": 1000.0,  # Use appropriate high value based on parameter
+    "normal": 50.0   # Use appropriate normal value based on parameter
+}
+
+
+class RecommendationBatch:
+    """Recommendations for many readings as references into the shared catalogue.
+
+    ``entry_ids[i, j]`` is the catalogue id of the recommendations for row
+    i's value of ``parameters[j]``, or -1 when there are none. ``expand(i)``
+    rebuilds exactly what generate_recommendations returns for that row.
+    """
+
+    def __init__(self, parameters: tuple, values: np.ndarray, entry_ids: np.ndarray, catalogue: tuple,
+                 guideline_version: str = None):
+        self.parameters = parameters
+        self.values = values
+        self.entry_ids = entry_ids
+        self.catalogue = catalogue
+        self.guideline_version = guideline_version
+
+    def __len__(self):
+        return len(self.entry_ids)
+
+    def row(self, i: int) -> List[int]:
+        """Catalogue ids for row i, in parameter order"""
+        return [entry_id for entry_id in self.entry_ids[i].tolist() if entry_id >= 0]
+
+    def rows(self) -> List[List[int]]:
+        return [[entry_id for entry_id in ids if entry_id >= 0] for ids in self.entry_ids.tolist()]
+
+    def expand(self, i: int) -> Dict[str, List[Dict]]:
+        recommendations = {priority: [] for priority in PRIORITIES}
+        values = self.values[i].tolist()
+        for j, entry_id in enumerate(self.entry_ids[i].tolist()):
+            if entry_id < 0:
+                continue
+            for template in self.catalogue[entry_id].recommendations:
+                recommendation = template.copy()
+                recommendation["current_value"] = values[j]
+                recommendations[recommendation["priority"]].append(recommendation)
+        return recommendations
+
 
 class WaterQualityRecommender:
-    def __init__(self):
-        self.guidelines = GUIDELINES
-    
+    def __init__(self, knowledge_base=KNOWLEDGE_BASE):
+        # Replaced wholesale when new guidelines are loaded (see
+        # recommender/loader.py); each call reads it once, so a call never
+        # mixes two versions
+        self.knowledge_base = knowledge_base
+
+    @property
+    def guidelines(self) -> dict:
+        return self.knowledge_base.guidelines
+
+    @property
+    def guideline_version(self) -> str:
+        return self.knowledge_base.version
+
     def _get_severity_level(self, value: float, param: str, direction: str) -> str:
         """Determine severity level based on value and parameter"""
-        if param not in self.guidelines:
+        rule = self.knowledge_base.get(param)
+        if rule is None:
             return "unknown"
-            
-        param_guidelines = self.guidelines[param]
-        severity_levels = param_guidelines["severity_levels"]
-        
-        if direction == "low":
-            for level, threshold in severity_levels.items():
-                if value <= threshold:
-                    return level
-        else:  # high
-            for level, threshold in severity_levels.items():
-                if value >= threshold:
-                    return level
-                    
-        return "normal"
-    
-    def _get_parameter_description(self, param: str) -> str:
-        """Get parameter description and health implications"""
-        descriptions = {
-            "ph": "pH measures water's acidity or alkalinity. Extreme values can affect water treatment efficiency and pipe corrosion.",
-            "dissolved_oxygen": "Dissolved oxygen is crucial for aquatic life. Low levels can cause fish kills and anaerobic conditions.",
-            "conductivity": "Conductivity indicates water's ability to conduct electricity, reflecting dissolved solids content.",
-            "bod": "Biochemical Oxygen Demand measures organic matter content. High BOD indicates poor water quality.",
-            "nitrate": "Nitrate levels above 10 mg/L can cause methemoglobinemia (blue baby syndrome) in infants.",
-            "fecal_coliform": "Fecal coliform indicates potential presence of disease-causing organisms from human/animal waste.",
-            "total_coliform": "Total coliform indicates overall microbial water quality and potential contamination."
-        }
-        return descriptions.get(param, "No description available")
-    
-    def _get_health_implications(self, param: str, severity: str) -> List[str]:
-        """Get health implications based on parameter and severity"""
-        implications = {
-            "ph": {
-                "mild": ["Slight irritation to eyes and skin", "Reduced effectiveness of disinfection"],
-                "moderate": ["Increased corrosion of pipes", "Reduced effectiveness of water treatment"],
-                "severe": ["Significant corrosion of infrastructure", "Potential health risks from heavy metal leaching"],
-                "critical": ["Immediate health risks", "Severe infrastructure damage"]
-            },
-            "dissolved_oxygen": {
-                "mild": ["Stress on aquatic life", "Reduced water quality"],
-                "moderate": ["Fish kills possible", "Anaerobic conditions developing"],
-                "severe": ["Mass fish kills", "Severe ecosystem damage"],
-                "critical": ["Complete ecosystem collapse", "Production of toxic gases"]
-            },
-            "conductivity": {
-                "mild": ["Slight taste changes", "Minor scaling in pipes"],
-                "moderate": ["Increased scaling", "Reduced effectiveness of treatment"],
-                "severe": ["Severe scaling", "Potential health risks from high mineral content"],
-                "critical": ["Immediate health risks", "Infrastructure damage"]
-            },
-            "bod": {
-                "mild": ["Slight odor issues", "Minor water quality degradation"],
-                "moderate": ["Significant odor problems", "Reduced oxygen levels"],
-                "severe": ["Severe water quality issues", "Potential health risks"],
-                "critical": ["Immediate health risks", "Complete water quality failure"]
-            },
-            "nitrate": {
-                "mild": ["Slight risk to sensitive populations", "Minor water quality issues"],
-                "moderate": ["Risk to infants and pregnant women", "Potential health impacts"],
-                "severe": ["Significant health risks", "Potential for methemoglobinemia"],
-                "critical": ["Immediate health risks", "Life-threatening conditions possible"]
-            },
-            "fecal_coliform": {
-                "mild": ["Low risk of waterborne illness", "Minor contamination"],
-                "moderate": ["Moderate risk of illness", "Significant contamination"],
-                "severe": ["High risk of illness", "Severe contamination"],
-                "critical": ["Immediate health risks", "Outbreak potential"]
-            },
-            "total_coliform": {
-                "mild": ["Low risk of contamination", "Minor water quality issues"],
-                "moderate": ["Moderate risk of contamination", "Significant water quality issues"],
-                "severe": ["High risk of contamination", "Severe water quality issues"],
-                "critical": ["Immediate health risks", "Outbreak potential"]
-            }
-        }
-        return implications.get(param, {}).get(severity, ["Unknown health implications"])
-    
-    def generate_recommendations(self, input_values: Dict[str, float]) -> Dict[str, List[Dict]]:
-        """Generate comprehensive recommendations based on input values and WHO guidelines"""
-        recommendations = {
-            "immediate": [],
-            "short_term": [],
-            "long_term": [],
-            "preventive": []
-        }
-        
-        # Convert string values to numeric values
-        value_mapping = {
-            "low": 0.0,
-            "high": 1000.0,  # Use appropriate high value based on parameter
-            "normal": 50.0   # Use appropriate normal value based on parameter
-        }
-        
+        return rule.severity(value, direction)
+
+    @staticmethod
+    def _out_of_range(knowledge_base, input_values: Dict[str, float]):
+        """Yield (rule, direction, severity, value) for each out-of-range value"""
         for param, value in input_values.items():
+            # Convert string values to numeric
+            if isinstance(value, str):
+                value = VALUE_MAPPING.get(value.lower(), 0.0)
+
+            rule = knowledge_base.get(param)
+            if rule is None:
+                print(f"Warning: No guidelines found for parameter {param}")
+                continue
+
             try:
-                # Convert string values to numeric
-                if isinstance(value, str):
-                    value = value_mapping.get(value.lower(), 0.0)
-                
-                # Check if parameter exists in guidelines
-                if param not in self.guidelines:
-                    print(f"Warning: No guidelines found for parameter {param}")
-                    continue
-                    
-                param_guidelines = self.guidelines[param]
-                min_val, max_val = param_guidelines["range"]
-                
-                # Determine if value is low or high
-                if value < min_val:
-                    direction = "low"
-                    severity = self._get_severity_level(value, param, direction)
-                elif value > max_val:
-                    direction = "high"
-                    severity = self._get_severity_level(value, param, direction)
-                else:
-                    continue  # Value is within acceptable range
-                
-                # Get measures for the current direction and severity
-                measures = param_guidelines["measures"][direction]
-                
-                # Get parameter description and health implications
-                description = self._get_parameter_description(param)
-                health_implications = self._get_health_implications(param, severity)
-                
-                # Add recommendations only for priority levels that have specific measures
-                for priority in ["immediate", "short_term", "long_term", "preventive"]:
-                    if priority in measures and measures[priority] and len(measures[priority]) > 0:
-                        for action in measures[priority]:
-                            recommendation = {
-                                "parameter": param,
-                                "severity": severity,
-                                "description": description,
-                                "health_implications": health_implications,
-                                "action": action,
-                                "priority": priority,
-                                "current_value": value,
-                                "acceptable_range": [min_val, max_val]
-                            }
-                            recommendations[priority].append(recommendation)
-                        
-            except Exception as e:
+                direction = rule.direction(value)
+            except TypeError as e:
                 print(f"Error processing {param}: {str(e)}")
                 continue
-        
-        return recommendations 
\ No newline at end of file
+            if direction is not None:
+                yield rule, direction, rule.severity(value, direction), value
+
+    def generate_recommendations(self, input_values: Dict[str, float], knowledge_base=None) -> Dict[str, List[Dict]]:
+        """Generate comprehensive recommendations based on input values and WHO guidelines.
+
+        Pass knowledge_base to pin the guideline version, e.g. to tag the
+        result with knowledge_base.version.
+        """
+        recommendations = {priority: [] for priority in PRIORITIES}
+
+        for rule, direction, severity, value in self._out_of_range(knowledge_base or self.knowledge_base,
+                                                                   input_values):
+            # Templates are shared between calls; each reading gets copies
+            # carrying its own value
+            for template in rule.recommendations(direction, severity):
+                recommendation = template.copy()
+                recommendation["current_value"] = value
+                recommendations[recommendation["priority"]].append(recommendation)
+
+        return recommendations
+
+    def generate_compact_recommendations(self, input_values: Dict[str, float], knowledge_base=None) -> tuple:
+        """Like generate_recommendations, but with each string sent once.
+
+        Returns (recommendations, catalogue). Recommendations carry
+        action_id and health_implications_id instead of text; the catalogue
+        maps those IDs, and each parameter name, to the text they stand for.
+        """
+        recommendations = {priority: [] for priority in PRIORITIES}
+        catalogue = {"parameters": {}, "health_implications": {}, "actions": {}}
+
+        for rule, direction, severity, value in self._out_of_range(knowledge_base or self.knowledge_base,
+                                                                   input_values):
+            entry = rule.entry(direction, severity)
+            if entry is None:
+                continue
+            for section, texts in entry.texts.items():
+                catalogue[section].update(texts)
+            for template in entry.compact:
+                recommendation = template.copy()
+                recommendation["current_value"] = value
+                recommendations[recommendation["priority"]].append(recommendation)
+
+        return recommendations, catalogue
+
+    def generate_recommendations_batch(self, columns: Mapping[str, Sequence[float]]) -> RecommendationBatch:
+        """Classify many readings at once.
+
+        ``columns`` maps parameter names to equal-length numeric columns
+        (a dict of arrays or lists, or a DataFrame). Every parameter is
+        classified with array comparisons against its range and thresholds;
+        missing values (NaN) get no recommendations.
+        """
+        knowledge_base = self.knowledge_base
+        parameters, values = [], []
+        for param in columns:
+            if param not in knowledge_base:
+                print(f"Warning: No guidelines found for parameter {param}")
+                continue
+            parameters.append(param)
+            values.append(np.asarray(columns[param], dtype=np.float64))
+
+        n = len(values[0]) if values else 0
+        values = np.column_stack(values) if values else np.empty((0, 0))
+        entry_ids = np.empty((n, len(parameters)), dtype=np.int32)
+        for j, param in enumerate(parameters):
+            entry_ids[:, j] = knowledge_base.get(param).classify_many(values[:, j])
+        return RecommendationBatch(tuple(parameters), values, entry_ids, knowledge_base.catalogue,
+                                   knowledge_base.version)
@@ -3,6 +3,8 @@ import random
 from sqlalchemy.orm import Session
 from database.models import WaterQualityMeasurement, WaterQualityPrediction, Recommendation
 from database.config import SessionLocal
+from database.rollups import rebuild_rollups
+from utils.wqi import calculate_wqi_with_categories, parameter_matrix
 
 def seed_database():
     db = SessionLocal()
@@ -33,11 +35,11 @@ def seed_database():
             db.add(measurement)
         db.commit()
 
+        # Score every measurement in one vectorised pass
+        wqi_values, categories = calculate_wqi_with_categories(parameter_matrix(measurements))
+
         # Generate predictions and recommendations
-        for measurement in measurements:
-            # Calculate WQI (simplified)
-            wqi = calculate_wqi(measurement)
-            quality_category = get_quality_category(wqi)
+        for measurement, wqi, quality_category in zip(measurements, wqi_values.tolist(), categories.tolist()):
             is_potable = wqi >= 50
 
             # Create prediction
@@ -62,6 +64,9 @@ def seed_database():
                 )
                 db.add(recommendation)
 
+        # The rows above bypass crud, so compute their rollups in the same transaction
+        db.flush()
+        rebuild_rollups(db.connection())
         db.commit()
         print("Database seeded successfully!")
 
@@ -71,123 +76,6 @@ def seed_database():
     finally:
         db.close()
 
-def calculate_wqi(measurement):
-    # Simplified WQI calculation
-    weights = {
-        "temperature": 0.1,
-        "dissolved_oxygen": 0.2,
-        "ph": 0.2,
-        "conductivity": 0.1,
-        "bod": 0.15,
-        "nitrate": 0.1,
-        "fecal_coliform": 0.1,
-        "total_coliform": 0.05
-    }
-
-    scores = {
-        "temperature": score_temperature(measurement.temperature),
-        "dissolved_oxygen": score_dissolved_oxygen(measurement.dissolved_oxygen),
-        "ph": score_ph(measurement.ph),
-        "conductivity": score_conductivity(measurement.conductivity),
-        "bod": score_bod(measurement.bod),
-        "nitrate": score_nitrate(measurement.nitrate),
-        "fecal_coliform": score_fecal_coliform(measurement.fecal_coliform),
-        "total_coliform": score_total_coliform(measurement.total_coliform)
-    }
-
-    wqi = sum(score * weights[param] for param, score in scores.items())
-    return wqi
-
-def get_quality_category(wqi):
-    if wqi >= 90:
-        return "Excellent"
-    elif wqi >= 70:
-        return "Good"
-    elif wqi >= 50:
-        return "Fair"
-    else:
-        return "Poor"
-
-def score_temperature(value):
-    if 20 <= value <= 30:
-        return 100
-    elif 15 <= value < 20 or 30 < value <= 35:
-        return 80
-    elif 10 <= value < 15 or 35 < value <= 40:
-        return 60
-    else:
-        return 40
-
-def score_dissolved_oxygen(value):
-    if value >= 6:
-        return 100
-    elif 4 <= value < 6:
-        return 80
-    elif 2 <= value < 4:
-        return 60
-    else:
-        return 40
-
-def score_ph(value):
-    if 6.5 <= value <= 8.5:
-        return 100
-    elif 6 <= value < 6.5 or 8.5 < value <= 9:
-        return 80
-    elif 5.5 <= value < 6 or 9 < value <= 9.5:
-        return 60
-    else:
-        return 40
-
-def score_conductivity(value):
-    if 200 <= value <= 800:
-        return 100
-    elif 100 <= value < 200 or 800 < value <= 1000:
-        return 80
-    elif 50 <= value < 100 or 1000 < value <= 1500:
-        return 60
-    else:
-        return 40
-
-def score_bod(value):
-    if value <= 3:
-        return 100
-    elif 3 < value <= 5:
-        return 80
-    elif 5 < value <= 10:
-        return 60
-    else:
-        return 40
-
-def score_nitrate(value):
-    if value <= 10:
-        return 100
-    elif 10 < value <= 20:
-        return 80
-    elif 20 < value <= 30:
-        return 60
-    else:
-        return 40
-
-def score_fecal_coliform(value):
-    if value <= 500:
-        return 100
-    elif 500 < value <= 1000:
-        return 80
-    elif 1000 < value <= 2000:
-        return 60
-    else:
-        return 40
-
-def score_total_coliform(value):
-    if value <= 1000:
-        return 100
-    elif 1000 < value <= 2000:
-        return 80
-    elif 2000 < value <= 5000:
-        return 60
-    else:
-        return 40
-
 def generate_recommendations(measurement):
     recommendations = []
 
@@ -0,0 +1,58 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import models
+from database.config import Base, get_async_db, to_async_url
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    """A scratch SQLite database with the app's tables"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def api_url(tmp_path):
+    """A scratch SQLite database with the app's tables, for the endpoint tests"""
+    url = f"sqlite:///{tmp_path / 'api.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    return url
+
+
+@pytest.fixture
+def api_engine(api_url):
+    return create_async_engine(to_async_url(api_url))
+
+
+@pytest.fixture
+def statements(api_engine):
+    """SQL statements the endpoints run, in order"""
+    recorded = []
+    event.listen(api_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: recorded.append(statement))
+    return recorded
+
+
+@pytest.fixture
+def client(api_engine):
+    """TestClient for main.app on api_url, signed in as user 1"""
+    import main
+
+    sessions = async_sessionmaker(api_engine, expire_on_commit=False)
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    main.app.dependency_overrides[get_async_db] = get_test_db
+    main.app.dependency_overrides[main.get_current_user] = lambda: models.User(id=1, username="ana")
+    try:
+        # Without the context manager startup does not run, so the app's own batcher never starts
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
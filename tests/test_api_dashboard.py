@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.models import WaterQualityPrediction
+
+READING = {"temperature": 25.0, "dissolved_oxygen": 6.5, "ph": 7.2, "conductivity": 450.0,
+           "bod": 2.0, "nitrate": 4.0, "fecal_coliform": 50.0, "total_coliform": 120.0}
+PREDICTION = {"is_potable": True, "confidence": 0.9, "quality_category": "Good"}
+
+
+def store_same_time_readings(api_url, count=7):
+    """count readings of user 1 sharing one timestamp; the last one has a second, tied prediction"""
+    timestamp = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=1)
+    with sessionmaker(bind=create_engine(api_url))() as db:
+        ids = [
+            crud.create_measurement_with_prediction(
+                db, dict(READING, user_id=1, timestamp=timestamp, ph=7.0 + i / 10),
+                dict(PREDICTION, wqi_value=50.0 + i, timestamp=timestamp),
+            )["measurement_id"]
+            for i in range(count)
+        ]
+        db.execute(insert(WaterQualityPrediction).values(
+            measurement_id=ids[-1], wqi_value=99.0, timestamp=timestamp, **PREDICTION
+        ))
+        db.commit()
+    return ids
+
+
+def test_dashboard_breaks_timestamp_ties_by_id(client, api_url, statements):
+    ids = store_same_time_readings(api_url)
+
+    statements.clear()
+    first = client.get("/api/dashboard").json()
+    # The page of readings with their latest predictions, then the hourly rollups
+    assert len(statements) == 2
+
+    assert [m["id"] for m in first["recent_measurements"]] == ids[::-1][:5]
+    assert first["current_wqi"] == 99.0
+    assert first["parameter_summary"]["ph"]["current"] == 7.6
+    assert client.get("/api/dashboard").json() == first
+
+
+def store_daily_readings(api_url, days=3, per_day=4, without_nitrate=()):
+    """per_day readings of user 1 on each of the last days, ph rising by 0.1; returns their ph values, oldest first.
+
+    The readings at the positions in without_nitrate (oldest first) have no nitrate.
+    """
+    today = datetime.now(timezone.utc).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    ph = []
+    with sessionmaker(bind=create_engine(api_url))() as db:
+        for day in range(days):
+            for i in range(per_day):
+                timestamp = today - timedelta(days=days - 1 - day) + timedelta(minutes=10 * i)
+                nitrate = None if len(ph) in without_nitrate else READING["nitrate"]
+                ph.append(round(6.0 + 0.1 * len(ph), 1))
+                crud.create_measurement_with_prediction(
+                    db, dict(READING, user_id=1, timestamp=timestamp, ph=ph[-1], nitrate=nitrate),
+                    dict(PREDICTION, wqi_value=60.0, timestamp=timestamp),
+                )
+    return ph
+
+
+def test_trends_come_from_the_daily_rollups(client, api_url):
+    ph = store_daily_readings(api_url)
+
+    trends = client.get("/api/trends", params={"days": 7}).json()
+    assert len(trends["dates"]) == 3
+    assert trends["parameters"]["ph"] == pytest.approx([np.mean(ph[i:i + 4]) for i in (0, 4, 8)])
+    assert trends["wqi_values"] == [60.0, 60.0, 60.0]
+    analysis = trends["trend_analysis"]["ph"]
+    assert analysis["trend"] == "increasing"
+    assert analysis["current_value"] == ph[-1]
+    assert (analysis["min"], analysis["max"]) == (ph[0], ph[-1])
+    assert analysis["average"] == pytest.approx(np.mean(ph))
+    assert analysis["std_dev"] == pytest.approx(np.std(ph))
+
+
+def test_trends_skip_days_without_a_parameter(client, api_url):
+    ph = store_daily_readings(api_url, without_nitrate=range(4, 8))
+
+    trends = client.get("/api/trends", params={"days": 7}).json()
+    assert trends["parameters"]["nitrate"] == [READING["nitrate"], None, READING["nitrate"]]
+    assert trends["trend_analysis"]["nitrate"]["trend"] == "stable"
+    assert trends["trend_analysis"]["nitrate"]["current_value"] == READING["nitrate"]
+    assert trends["trend_analysis"]["ph"]["current_value"] == ph[-1]
+
+
+def test_trends_skip_readings_without_a_parameter(client, api_url):
+    ph = store_daily_readings(api_url, without_nitrate=(9, 11))
+
+    trends = client.get("/api/trends", params={"days": 1}).json()
+    assert trends["parameters"]["nitrate"] == [READING["nitrate"], None, READING["nitrate"], None]
+    analysis = trends["trend_analysis"]["nitrate"]
+    assert analysis["trend"] == "stable" and analysis["slope"] == pytest.approx(0.0)
+    assert analysis["current_value"] == analysis["average"] == READING["nitrate"]
+    assert trends["parameters"]["ph"] == ph[-4:]
+
+
+def test_parameter_dashboard_comes_from_the_daily_rollups(client, api_url):
+    ph = store_daily_readings(api_url)
+
+    dashboard = client.get("/api/dashboard/parameter/pH").json()
+    assert dashboard["current_value"] == ph[-1]
+    assert dashboard["historical_values"]["values"] == pytest.approx([np.mean(ph[i:i + 4]) for i in (0, 4, 8)])
+    assert dashboard["statistics"]["min"] == ph[0] and dashboard["statistics"]["max"] == ph[-1]
+    assert dashboard["statistics"]["avg"] == pytest.approx(np.mean(ph))
+    assert dashboard["threshold_info"]["is_within_range"] is True
+    assert client.get("/api/dashboard/parameter/nitrate").json()["current_value"] == READING["nitrate"]
@@ -0,0 +1,27 @@
+from sqlalchemy import create_engine, delete, insert
+
+from database.models import WaterQualityMeasurement
+
+
+def test_pages_continue_past_a_deleted_anchor(client, api_url):
+    engine = create_engine(api_url)
+    with engine.begin() as connection:
+        for i in range(10):
+            connection.execute(insert(WaterQualityMeasurement).values(user_id=1, ph=float(i)))
+
+    first = client.get("/api/measurements", params={"limit": 3, "parameters": "ph"}).json()
+    assert [m["id"] for m in first["measurements"]] == [10, 9, 8]
+    with engine.begin() as connection:
+        connection.execute(delete(WaterQualityMeasurement).where(WaterQualityMeasurement.id == 8))
+
+    ids, cursor = [], first["next_cursor"]
+    while cursor is not None:
+        page = client.get("/api/measurements", params={"limit": 3, "parameters": "ph", "cursor": cursor}).json()
+        ids += [m["id"] for m in page["measurements"]]
+        cursor = page["next_cursor"]
+    assert ids == [7, 6, 5, 4, 3, 2, 1]
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/measurements", params={"cursor": "8"})
+    assert response.status_code == 400
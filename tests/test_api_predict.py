@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import main
+from models.batcher import MicroBatcher
+
+READING = {"temperature": 25, "dissolved_oxygen": 6.5, "ph": 7.2, "conductivity": 450,
+           "bod": 2, "nitrate": 4, "fecal_coliform": 50, "total_coliform": 120}
+
+
+class StubBatcher(MicroBatcher):
+    """A started batcher whose predict sleeps for delay seconds, then returns result or raises it"""
+
+    def __init__(self, delay=0.0, result=(True, 0.99)):
+        super().__init__(lambda rows: rows)
+        self.delay = delay
+        self.result = result
+
+    @property
+    def running(self) -> bool:
+        return True
+
+    async def predict(self, row):
+        await asyncio.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def predict_and_count(client, reason):
+    before = client.get("/metrics").json()["predict_engine"][reason]
+    response = client.post("/api/predict", json=READING)
+    assert response.status_code == 200
+    return response.json(), client.get("/metrics").json()["predict_engine"][reason] - before
+
+
+def assert_wqi_rules(body):
+    assert body["engine"] == "wqi_rules"
+    assert body["confidence"] == pytest.approx(body["wqi_value"] / 100)
+    assert body["is_potable"] == (body["wqi_value"] >= 50)
+
+
+def test_predict_falls_back_when_model_is_unavailable(client):
+    assert not main.batcher.running
+    body, counted = predict_and_count(client, "fallback_model_unavailable")
+    assert_wqi_rules(body)
+    assert counted == 1
+
+
+def test_predict_falls_back_past_the_deadline(client, monkeypatch):
+    monkeypatch.setattr(main, "PREDICT_DEADLINE_MS", 20)
+    monkeypatch.setattr(main, "batcher", StubBatcher(delay=1.0))
+    body, counted = predict_and_count(client, "fallback_deadline_exceeded")
+    assert_wqi_rules(body)
+    assert counted == 1
+
+
+def test_predict_falls_back_when_the_model_fails(client, monkeypatch):
+    monkeypatch.setattr(main, "batcher", StubBatcher(result=RuntimeError("model crashed")))
+    body, counted = predict_and_count(client, "fallback_error")
+    assert_wqi_rules(body)
+    assert counted == 1
+
+
+def test_predict_uses_the_model_within_the_deadline(client, monkeypatch):
+    monkeypatch.setattr(main, "PREDICT_DEADLINE_MS", 1000)
+    monkeypatch.setattr(main, "batcher", StubBatcher(result=(True, 0.99)))
+    body, counted = predict_and_count(client, "model")
+    assert body["engine"] == "model"
+    assert (body["is_potable"], body["confidence"]) == (True, 0.99)
+    assert counted == 1
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import async_crud, crud
+from database.config import Base, to_async_url
+from database.models import WaterQualityMeasurement, WaterQualityPrediction
+
+MEASUREMENT = {"user_id": 1, "ph": 4.0, "temperature": 25.0}
+PREDICTION = {"is_potable": False, "confidence": 0.3, "wqi_value": 41.5, "quality_category": "Poor"}
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    return url
+
+
+def run(url, work):
+    async def main():
+        engine = create_async_engine(to_async_url(url))
+        statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+                return await work(db), statements
+        finally:
+            await engine.dispose()
+    return asyncio.run(main())
+
+
+def test_to_async_url():
+    assert to_async_url("postgresql://u:p@db:5432/wq") == "postgresql+asyncpg://u:p@db:5432/wq"
+    assert to_async_url("postgresql+psycopg2://u:p@db/wq") == "postgresql+asyncpg://u:p@db/wq"
+    assert to_async_url("sqlite:////tmp/wq.db") == "sqlite+aiosqlite:////tmp/wq.db"
+
+
+def test_users(url):
+    hashed = crud.pwd_context.hash("secret")
+
+    async def work(db):
+        created = await async_crud.create_user(db, "ana", "ana@example.com", hashed)
+        return (
+            created.id,
+            (await async_crud.get_user_by_email(db, "ana@example.com")).username,
+            await async_crud.get_user_by_username(db, "nobody"),
+            await async_crud.authenticate_user(db, "ana", "wrong"),
+            (await async_crud.authenticate_user(db, "ana", "secret")).id,
+        )
+
+    (user_id, username, missing, rejected, authenticated), _ = run(url, work)
+    assert username == "ana" and missing is None and rejected is False and authenticated == user_id
+
+
+def test_unit_of_work_matches_sync(url):
+    recommendations = [{"parameter": "ph", "severity": "critical", "priority": "immediate", "description": "a"}] * 3
+
+    async def work(db):
+        return await async_crud.create_measurement_with_prediction(db, MEASUREMENT, PREDICTION, recommendations)
+
+    result, statements = run(url, work)
+    assert len(statements) == 4
+    assert len(result["recommendation_ids"]) == 3
+    with sessionmaker(bind=create_engine(url))() as db:
+        assert db.get(WaterQualityPrediction, result["prediction_id"]).measurement_id == result["measurement_id"]
+
+
+def test_latest_prediction_in_one_query(url):
+    now = datetime.now(timezone.utc)
+    with sessionmaker(bind=create_engine(url))() as db:
+        for i in range(20):
+            measurement = WaterQualityMeasurement(**MEASUREMENT, timestamp=now - timedelta(minutes=i))
+            db.add(measurement)
+            db.flush()
+            db.add_all([
+                WaterQualityPrediction(measurement_id=measurement.id, wqi_value=i, timestamp=now),
+                WaterQualityPrediction(measurement_id=measurement.id, wqi_value=100 + i, timestamp=now + timedelta(seconds=1)),
+            ])
+        db.commit()
+
+    async def work(db):
+        rows = await async_crud.get_measurements_with_latest_prediction(db, user_id=1)
+        return [(measurement.ph, prediction.wqi_value) for measurement, prediction in rows]
+
+    rows, statements = run(url, work)
+    assert rows == [(4.0, 100.0 + i) for i in range(20)]
+    assert len(statements) == 1
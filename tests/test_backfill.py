@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import select
+from database.backfill import backfill_wqi
+from database.models import BackfillCheckpoint, WaterQualityMeasurement, WaterQualityPrediction
+from utils.wqi import PARAMETERS, calculate_wqi_one, get_quality_category
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    """sqlite_engine with 24 readings whose predictions carry stale WQI values"""
+    readings = [
+        {"temperature": 15 + i % 20, "dissolved_oxygen": 4 + (i % 5), "ph": 6 + (i % 30) / 10,
+         "conductivity": 100 + 10 * i, "bod": i % 6, "nitrate": i % 15,
+         "fecal_coliform": 7 * i, "total_coliform": 13 * i}
+        for i in range(23)
+    ]
+    with sqlite_engine.begin() as connection:
+        for i, reading in enumerate(readings, start=1):
+            connection.execute(WaterQualityMeasurement.__table__.insert().values(id=i, **reading))
+            connection.execute(WaterQualityPrediction.__table__.insert().values(
+                measurement_id=i, is_potable=True, confidence=0.9, wqi_value=-1.0, quality_category="stale"
+            ))
+        # A measurement with a missing parameter keeps its stored values
+        connection.execute(WaterQualityMeasurement.__table__.insert().values(id=24, **dict(readings[0], ph=None)))
+        connection.execute(WaterQualityPrediction.__table__.insert().values(
+            measurement_id=24, wqi_value=-1.0, quality_category="stale"
+        ))
+    return sqlite_engine
+
+
+def stored(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(
+            select(
+                *[getattr(WaterQualityMeasurement, name) for name in PARAMETERS],
+                WaterQualityPrediction.wqi_value,
+                WaterQualityPrediction.quality_category
+            )
+            .join(WaterQualityPrediction, WaterQualityPrediction.measurement_id == WaterQualityMeasurement.id)
+            .order_by(WaterQualityMeasurement.id)
+        ).all()
+    return rows
+
+
+def test_backfill_recomputes_stored_wqi(engine):
+    summary = backfill_wqi(engine, chunk_size=5, progress=lambda message: None)
+    assert summary["completed"]
+    assert summary["rows_processed"] == 24
+    assert summary["skipped"] == 1
+
+    rows = stored(engine)
+    for row in rows[:-1]:
+        expected = calculate_wqi_one(dict(row._mapping))
+        assert row.wqi_value == pytest.approx(expected, abs=1e-9)
+        assert row.quality_category == get_quality_category(expected)
+    assert (rows[-1].wqi_value, rows[-1].quality_category) == (-1.0, "stale")
+
+
+def test_backfill_resumes_from_checkpoint(engine):
+    first = backfill_wqi(engine, chunk_size=5, max_chunks=2, progress=lambda message: None)
+    assert not first["completed"]
+    assert first["rows_processed"] == 10
+    with engine.connect() as connection:
+        checkpoint = connection.execute(select(BackfillCheckpoint)).one()
+    assert checkpoint.last_id == 10
+    assert checkpoint.completed_at is None
+    assert [row.quality_category == "stale" for row in stored(engine)].count(True) == 14
+
+    second = backfill_wqi(engine, chunk_size=5, progress=lambda message: None)
+    assert second["completed"]
+    assert second["chunks"] == 3
+    assert second["rows_processed"] == 24
+
+    again = backfill_wqi(engine, chunk_size=5, progress=lambda message: None)
+    assert again["completed"] and again["chunks"] == 0
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import pytest
+from models.batcher import MicroBatcher
+from utils.executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    calls = []
+
+    def predict_batch(rows):
+        calls.append(len(rows))
+        return [row * 2 for row in rows]
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, max_batch_size=8, max_wait_ms=5)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.predict(i) for i in range(20))), batcher.metrics.snapshot()
+        finally:
+            await batcher.stop()
+
+    results, metrics = asyncio.run(run())
+    assert results == [i * 2 for i in range(20)]
+    assert sum(calls) == 20
+    assert max(calls) <= 8
+    assert len(calls) < 20
+    assert metrics["requests"] == 20
+    assert metrics["batches"] == len(calls)
+
+
+def test_micro_batcher_propagates_errors():
+    def predict_batch(rows):
+        raise ValueError("bad input")
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, max_wait_ms=1)
+        batcher.start()
+        try:
+            with pytest.raises(ValueError):
+                await batcher.predict(1)
+            return batcher.metrics.snapshot()
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run())["errors"] == 1
+
+
+def test_micro_batcher_skips_cancelled_requests():
+    calls = []
+
+    def predict_batch(rows):
+        calls.append(list(rows))
+        return rows
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, max_wait_ms=20)
+        batcher.start()
+        try:
+            abandoned = asyncio.ensure_future(batcher.predict("late"))
+            kept = asyncio.ensure_future(batcher.predict("kept"))
+            await asyncio.sleep(0)
+            abandoned.cancel()
+            return await kept
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == "kept"
+    assert calls == [["kept"]]
+
+
+def test_micro_batcher_fails_only_the_bad_row():
+    def predict_batch(rows):
+        if "bad" in rows:
+            raise ValueError("bad input")
+        return [row.upper() for row in rows]
+
+    async def run():
+        batcher = MicroBatcher(predict_batch, max_wait_ms=20)
+        batcher.start()
+        try:
+            results = await asyncio.gather(*(batcher.predict(row) for row in ["a", "bad", "c"]), return_exceptions=True)
+            return results, batcher.metrics.snapshot()
+        finally:
+            await batcher.stop()
+
+    results, metrics = asyncio.run(run())
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+    assert metrics["errors"] == 1 and metrics["batches"] == 1
+
+
+def test_micro_batcher_counts_against_executor_bound():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run():
+        batcher = MicroBatcher(lambda rows: rows, max_wait_ms=1, executor=executor)
+        batcher.start()
+        blocked = asyncio.ensure_future(executor.run(release.wait))
+        try:
+            await asyncio.sleep(0)
+            with pytest.raises(ExecutorSaturated):
+                await batcher.predict(1)
+            release.set()
+            await blocked
+            return await batcher.predict(2)
+        finally:
+            await batcher.stop()
+
+    try:
+        assert asyncio.run(run()) == 2
+    finally:
+        executor.shutdown()
+    assert executor.rejected == 1
@@ -0,0 +1,69 @@
+import numpy as np
+from models.cache import FEATURE_PRECISION, PredictionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_shares_entries_between_near_identical_inputs():
+    cache = PredictionCache({"ph": 0.01, "conductivity": 1.0})
+    calls = []
+
+    def compute(values):
+        calls.append(values)
+        return values["ph"] * 2
+
+    first = cache.get_or_compute({"ph": 7.1201, "conductivity": 450.2}, compute)
+    second = cache.get_or_compute({"ph": 7.1199, "conductivity": 449.8}, compute)
+    assert first == second
+    assert len(calls) == 1
+    assert abs(calls[0]["ph"] - 7.12) < 1e-9
+    assert calls[0]["conductivity"] == 450.0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PredictionCache({}, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.evictions == 1
+
+
+def test_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache({}, ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == (True, 1)
+    clock.now = 10.0
+    assert cache.get("a") == (False, None)
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_cache_is_invalidated_when_version_changes():
+    cache = PredictionCache({})
+    cache.put("a", 1, version="v1")
+    assert cache.get("a", version="v1") == (True, 1)
+    assert cache.get("a", version="v2") == (False, None)
+    assert cache.invalidations == 1
+    assert cache.version == "v2"
+
+
+def test_quantize_matrix_matches_quantize():
+    cache = PredictionCache(FEATURE_PRECISION)
+    columns = list(FEATURE_PRECISION)
+    row = {col: 12.345678 for col in columns}
+    keys, quantized = cache.quantize_matrix(np.array([[row[col] for col in columns]]), columns)
+    expected = cache.quantize(row)
+    assert keys[0] == tuple(expected[col] for col in columns)
+    assert quantized[0].tolist() == list(keys[0])
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.models import Recommendation, WaterQualityMeasurement, WaterQualityPrediction
+
+MEASUREMENT = {
+    "user_id": 1, "latitude": 20.5, "longitude": 78.9, "temperature": 25.0, "dissolved_oxygen": 6.5,
+    "ph": 4.0, "conductivity": 450.0, "bod": 2.0, "nitrate": 4.0, "fecal_coliform": 50.0, "total_coliform": 120.0,
+}
+PREDICTION = {"is_potable": False, "confidence": 0.3, "wqi_value": 41.5, "quality_category": "Poor"}
+
+
+def test_unit_of_work_writes_everything_in_one_transaction(sqlite_engine):
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    commits = []
+    event.listen(sqlite_engine, "commit", lambda conn: commits.append(conn))
+    recommendations = [
+        {"parameter": "ph", "severity": "critical", "priority": priority, "description": f"action {i}"}
+        for i, priority in enumerate(["immediate", "immediate", "short_term"])
+    ]
+
+    with sessionmaker(bind=sqlite_engine)() as db:
+        result = crud.create_measurement_with_prediction(db, MEASUREMENT, PREDICTION, recommendations)
+
+    # measurement, prediction, recommendations, rollup upsert
+    assert len(statements) == 4
+    assert all(statement.startswith("INSERT") and "RETURNING" in statement for statement in statements[:3])
+    assert "ON CONFLICT" in statements[3]
+    assert len(commits) == 1
+    assert result["timestamp"] is not None
+
+    with sessionmaker(bind=sqlite_engine)() as db:
+        prediction = db.get(WaterQualityPrediction, result["prediction_id"])
+        assert prediction.measurement_id == result["measurement_id"]
+        assert prediction.wqi_value == 41.5
+        assert db.get(WaterQualityMeasurement, result["measurement_id"]).ph == 4.0
+        stored = db.scalars(
+            select(Recommendation.description).where(Recommendation.id.in_(result["recommendation_ids"]))
+            .order_by(Recommendation.id)
+        ).all()
+        assert stored == ["action 0", "action 1", "action 2"]
+
+
+def test_unit_of_work_without_recommendations(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        first = crud.create_measurement_with_prediction(db, MEASUREMENT, PREDICTION)
+        second = crud.create_measurement_with_prediction(db, MEASUREMENT, PREDICTION)
+    assert first["recommendation_ids"] == []
+    assert second["measurement_id"] == first["measurement_id"] + 1
+
+
+def add_reading(db, minutes_ago, predictions=()):
+    timestamp = datetime.now(timezone.utc) - timedelta(minutes=minutes_ago)
+    measurement = WaterQualityMeasurement(**MEASUREMENT, timestamp=timestamp)
+    db.add(measurement)
+    db.flush()
+    for offset, wqi in predictions:
+        db.add(WaterQualityPrediction(measurement_id=measurement.id, wqi_value=wqi, timestamp=timestamp + timedelta(seconds=offset)))
+    return measurement
+
+
+def test_latest_prediction_per_measurement(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        older = add_reading(db, 10, [(1, 50.0), (5, 60.0), (3, 55.0)])
+        newer = add_reading(db, 1, [(1, 80.0)])
+        unscored = add_reading(db, 5)
+        add_reading(db, 60 * 24 * 30, [(1, 10.0)])
+        db.commit()
+
+        rows = crud.get_measurements_with_latest_prediction(
+            db, user_id=1, start_date=datetime.now(timezone.utc) - timedelta(days=1)
+        )
+        assert [(m.id, p.wqi_value if p else None) for m, p in rows] == [
+            (newer.id, 80.0), (unscored.id, None), (older.id, 60.0)
+        ]
+
+
+@pytest.mark.parametrize("readings", [2, 40])
+def test_latest_prediction_query_count_is_constant(sqlite_engine, readings):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        for i in range(readings):
+            add_reading(db, i, [(1, 50.0), (2, 70.0)])
+        db.commit()
+
+        statements = []
+        event.listen(sqlite_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+        rows = crud.get_measurements_with_latest_prediction(db, user_id=1)
+        wqi_values = [prediction.wqi_value for _, prediction in rows]
+        parameters = [measurement.ph for measurement, _ in rows]
+
+    assert len(rows) == readings
+    assert wqi_values == [70.0] * readings and parameters == [4.0] * readings
+    assert len(statements) == 1
+
+
+def test_keyset_pages_cover_every_row_once(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        # Server-default timestamps: many rows share the same second
+        for i in range(23):
+            db.execute(insert(WaterQualityMeasurement).values(user_id=1, ph=float(i)))
+        add_reading(db, 60)
+        db.commit()
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = crud.get_measurement_columns(db, ["ph"], user_id=1, cursor=cursor, limit=5)
+            seen += [row[0] for row in rows]
+            pages += 1
+            if cursor is None:
+                break
+        expected = [row[0] for row in crud.get_measurement_columns(db, ["ph"], user_id=1, limit=None)[0]]
+
+    assert pages == 5
+    assert seen == expected and len(set(seen)) == 24
+
+
+def test_keyset_page_survives_deleting_its_anchor(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        # Two stored timestamp formats: server default and bound datetimes
+        for i in range(5):
+            db.execute(insert(WaterQualityMeasurement).values(user_id=1, ph=float(i)))
+        for i in range(5):
+            add_reading(db, 60 + i)
+        db.commit()
+        expected = [row[0] for row in crud.get_measurement_columns(db, ["ph"], user_id=1, limit=None)[0]]
+
+        first, cursor = crud.get_measurement_columns(db, ["ph"], user_id=1, limit=3)
+        anchor = first[-1][0]
+        db.query(WaterQualityMeasurement).filter(WaterQualityMeasurement.id == anchor).delete()
+        db.commit()
+        seen = [row[0] for row in first]
+        while cursor is not None:
+            rows, cursor = crud.get_measurement_columns(db, ["ph"], user_id=1, cursor=cursor, limit=3)
+            seen += [row[0] for row in rows]
+
+    assert seen == expected
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        crud.decode_cursor("not a cursor")
+    assert crud.decode_cursor(crud.encode_cursor(8, "2026-10-17 09:30:00")) == (8, "2026-10-17 09:30:00")
+
+
+def test_measurement_columns_projection(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        older = add_reading(db, 10, [(1, 50.0), (2, 60.0)])
+        newer = add_reading(db, 1)
+        db.commit()
+
+        rows, cursor = crud.get_measurement_columns(db, ["ph", "nitrate"], user_id=1, prediction_columns=["wqi_value"])
+        assert cursor is None
+        assert [row[:1] + row[2:] for row in rows] == [(newer.id, 4.0, 4.0, None), (older.id, 4.0, 4.0, 60.0)]
+
+        arrays, _ = crud.get_measurement_columns(db, ["ph"], user_id=1, prediction_columns=["wqi_value"], as_arrays=True)
+        assert list(arrays) == ["id", "timestamp", "ph", "wqi_value"]
+        assert arrays["ph"].dtype == float and arrays["id"].tolist() == [newer.id, older.id]
+        assert np.isnan(arrays["wqi_value"][0]) and arrays["wqi_value"][1] == 60.0
+
+        empty, _ = crud.get_measurement_columns(db, ["ph"], user_id=2, as_arrays=True)
+        assert len(empty["id"]) == 0 and len(empty["ph"]) == 0
+
+        with pytest.raises(ValueError):
+            crud.get_measurement_columns(db, ["predictions"], user_id=1)
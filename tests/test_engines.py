@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.sql import text
+
+from database.config import to_async_url
+from database.engines import get_async_engine, get_engine, pool_snapshot
+
+
+@pytest.fixture
+def url(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "1")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "0.05")
+    return f"sqlite:///{tmp_path / 'pool.db'}"
+
+
+def test_one_engine_per_url(url, tmp_path):
+    assert get_engine(url) is get_engine(url)
+    assert get_engine(url) is not get_engine(f"sqlite:///{tmp_path / 'other.db'}")
+    assert get_async_engine(to_async_url(url)) is get_async_engine(to_async_url(url))
+
+
+def test_pool_settings_and_metrics(url):
+    engine = get_engine(url)
+    assert engine.pool.size() == 2
+
+    connections = [engine.connect() for _ in range(3)]
+    with pytest.raises(PoolTimeout):
+        engine.connect()
+    stats = pool_snapshot()[f"sync:{url}"]
+    assert stats["checked_out"] == 3 and stats["overflow"] == 1
+    assert stats["utilisation"] == 1.0
+    assert stats["timeouts"] == 1 and stats["checkouts"] == 3 and stats["connects"] == 3
+    assert stats["max_checkout_ms"] >= stats["p50_checkout_ms"] > 0
+
+    for connection in connections:
+        connection.close()
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    stats = pool_snapshot()[f"sync:{url}"]
+    assert stats["checkouts"] == 4 and stats["peak_checked_out"] == 3 and stats["peak_overflow"] == 1
+
+
+def test_async_engine_metrics(url):
+    async_url = to_async_url(url)
+
+    async def work():
+        async with get_async_engine(async_url).connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    asyncio.run(work())
+    stats = pool_snapshot()[f"async:{async_url}"]
+    assert stats["checkouts"] == 1 and stats["pool_size"] == 2
+
+
+def test_in_memory_sqlite_keeps_default_pool():
+    engine = get_engine("sqlite://")
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert pool_snapshot()["sync:sqlite://"]["pool"] == "SingletonThreadPool"
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import pytest
+from utils.executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_bounded_executor_runs_calls_off_the_event_loop():
+    executor = BoundedExecutor("test", max_workers=2, max_pending=4)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        thread = await executor.run(threading.get_ident)
+        total = await executor.run(sum, [1, 2, 3])
+        return loop_thread, thread, total
+
+    try:
+        loop_thread, thread, total = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert thread != loop_thread
+    assert total == 6
+    assert executor.snapshot()["completed"] == 2
+
+
+def test_bounded_executor_rejects_work_beyond_max_pending():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(sum, [1])
+        release.set()
+        await asyncio.gather(*blocked)
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert executor.rejected == 1
+    assert executor.pending == 0
+
+
+def test_bounded_executor_holds_the_slot_of_a_cancelled_call():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait()
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(executor.run(work), 0.05)
+        # The call is still running in the pool, so it still holds the only slot
+        assert started.is_set() and executor.pending == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(sum, [1])
+        release.set()
+        while executor.pending:
+            await asyncio.sleep(0.01)
+        return await executor.run(sum, [1, 2])
+
+    try:
+        assert asyncio.run(run()) == 3
+    finally:
+        executor.shutdown()
+    assert executor.rejected == 1 and executor.pending == 0
+
+
+def test_bounded_executor_from_env(monkeypatch):
+    monkeypatch.setenv("REPORTS_EXECUTOR", "process")
+    monkeypatch.setenv("REPORTS_WORKERS", "3")
+    monkeypatch.setenv("REPORTS_MAX_PENDING", "7")
+    executor = BoundedExecutor.from_env("reports")
+    assert (executor.kind, executor.max_workers, executor.max_pending) == ("process", 3, 7)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from models.forest import FlatForest, flatten_forest
+from models.predict import WaterQualityPredictor
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    predictor = WaterQualityPredictor()
+    assert predictor.load_legacy_artifacts()
+    return predictor
+
+
+def test_flatten_forest_layout(predictor):
+    arrays = flatten_forest(predictor.model)
+    n_nodes = sum(e.tree_.node_count for e in predictor.model.estimators_)
+    assert arrays["feature"].shape == (n_nodes,)
+    assert arrays["value"].shape == (n_nodes, 2)
+    assert np.allclose(arrays["value"].sum(axis=1), 1.0)
+    leaves = arrays["children_left"] == np.arange(n_nodes)
+    assert (arrays["children_right"][leaves] == np.arange(n_nodes)[leaves]).all()
+
+
+def test_flat_forest_matches_sklearn(predictor):
+    forest = FlatForest.from_model(predictor.model)
+    rng = np.random.default_rng(42)
+    X = rng.normal(scale=2.0, size=(2000, len(predictor.feature_columns)))
+
+    assert np.abs(forest.predict_proba(X) - predictor.model.predict_proba(X)).max() <= 1e-9
+    for row in X[:20]:
+        expected = predictor.model.predict_proba(row.reshape(1, -1))[0]
+        assert np.abs(forest.predict_proba_one(row) - expected).max() <= 1e-9
+
+
+def test_folded_scaler_matches_scaled_path_on_training_set(predictor):
+    pytest.importorskip("openpyxl")
+    import pandas as pd
+    from models.forest import fold_scaler
+
+    X, _ = predictor.load_training_data("data/aquaattributes.xlsx")
+    X = X[predictor.feature_columns]
+    expected = predictor.model.predict_proba(predictor.scaler.transform(X))
+
+    folded = FlatForest(fold_scaler(flatten_forest(predictor.model), predictor.scaler))
+    assert folded.scaler_folded
+    assert np.abs(folded.predict_proba(X.to_numpy(dtype=np.float64)) - expected).max() <= 1e-9
+
+
+def test_predictor_serves_folded_bundle(predictor, tmp_path):
+    predictor.bundle_dir = str(tmp_path / "bundle")
+    predictor.save_bundle(fold_scaler_thresholds=True)
+
+    folded = WaterQualityPredictor()
+    folded.bundle_dir = predictor.bundle_dir
+    assert folded.load_model()
+    assert folded.manifest["scaler_folded"]
+    assert folded.compiled_forest.scaler_folded
+
+    rng = np.random.default_rng(7)
+    X = rng.uniform(0, 100, size=(64, len(folded.feature_columns)))
+    assert folded.predict_batch(X) == predictor.predict_batch(X)
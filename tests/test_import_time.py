@@ -0,0 +1,12 @@
+from benchmarks.import_report import collect_import_times, loaded_heavy_modules
+
+
+def test_api_import_does_not_load_heavy_dependencies():
+    times = collect_import_times("main")
+    assert loaded_heavy_modules(times) == []
+
+
+def test_predictor_import_does_not_load_training_dependencies():
+    times = collect_import_times("models.predict")
+    assert loaded_heavy_modules(times) == []
+    assert "sklearn" not in times
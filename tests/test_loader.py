@@ -0,0 +1,110 @@
+import json
+import os
+import time
+
+import pytest
+
+from recommender.knowledge_base import KNOWLEDGE_BASE
+from recommender.loader import GuidelineWatcher, export_guidelines, load_knowledge_base
+from recommender.rules import WaterQualityRecommender
+
+
+def write_guidelines(path, version, nitrate_max):
+    with open(path) as f:
+        data = json.load(f)
+    data["version"] = version
+    data["guidelines"]["nitrate"]["range"] = [0, nitrate_max]
+    with open(path, "w") as f:
+        json.dump(data, f)
+    # Make the change visible even within the filesystem's mtime resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def guideline_file(tmp_path):
+    path = str(tmp_path / "guidelines.json")
+    export_guidelines(path)
+    return path
+
+
+def test_exported_builtin_guidelines_have_the_builtin_version(guideline_file):
+    knowledge_base = load_knowledge_base(guideline_file)
+    assert knowledge_base.label == "builtin"
+    assert knowledge_base.version == KNOWLEDGE_BASE.version
+    assert len(knowledge_base.catalogue) == len(KNOWLEDGE_BASE.catalogue)
+
+
+def test_parser_output_is_not_a_guideline_set():
+    with pytest.raises(ValueError):
+        load_knowledge_base("data/who_guidelines.json")
+
+
+def test_watcher_swaps_in_changed_guidelines(guideline_file):
+    recommender = WaterQualityRecommender()
+    watcher = GuidelineWatcher(recommender, guideline_file, interval=60)
+    assert watcher.check() is False  # same content as the built-in set
+    assert recommender.knowledge_base is KNOWLEDGE_BASE
+    assert recommender.generate_recommendations({"nitrate": 15.0})["immediate"]
+
+    write_guidelines(guideline_file, "2026-10-17", nitrate_max=20)
+    pinned = recommender.knowledge_base
+    assert watcher.check() is True
+    assert recommender.knowledge_base.label == "2026-10-17"
+    assert recommender.guideline_version != KNOWLEDGE_BASE.version
+    assert not recommender.generate_recommendations({"nitrate": 15.0})["immediate"]
+    # A caller holding the previous version keeps getting consistent results
+    assert recommender.generate_recommendations({"nitrate": 15.0}, pinned)["immediate"]
+    assert watcher.snapshot()["reloads"] == 1
+
+
+def test_watcher_keeps_serving_when_the_file_is_invalid(guideline_file):
+    recommender = WaterQualityRecommender()
+    watcher = GuidelineWatcher(recommender, guideline_file, interval=60)
+    write_guidelines(guideline_file, "bad", nitrate_max=-1)
+    assert watcher.check() is False
+    assert recommender.knowledge_base is KNOWLEDGE_BASE
+    assert watcher.snapshot()["failures"] == 1
+    assert "nitrate.range" in watcher.snapshot()["last_error"]
+
+    write_guidelines(guideline_file, "fixed", nitrate_max=20)
+    assert watcher.check() is True
+    assert watcher.snapshot()["last_error"] is None
+
+
+def test_poll_checks_at_most_once_per_interval(guideline_file):
+    recommender = WaterQualityRecommender()
+    watcher = GuidelineWatcher(recommender, guideline_file, interval=60)
+    watcher.poll()
+    write_guidelines(guideline_file, "2026-10-17", nitrate_max=20)
+    assert watcher.poll() is False
+    watcher._last_poll -= 60
+    assert watcher.poll() is True
+
+
+def test_watcher_thread_survives_a_structurally_bad_file(guideline_file):
+    recommender = WaterQualityRecommender()
+    watcher = GuidelineWatcher(recommender, guideline_file, interval=0.01)
+    watcher.check()
+    watcher.start()
+    try:
+        # Passes validation, then fails compiling with AttributeError
+        with open(guideline_file) as f:
+            data = json.load(f)
+        data["descriptions"] = ["not", "an", "object"]
+        with open(guideline_file, "w") as f:
+            json.dump(data, f)
+        deadline = time.monotonic() + 5
+        while watcher.failures == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "AttributeError" in watcher.snapshot()["last_error"]
+        assert recommender.knowledge_base is KNOWLEDGE_BASE
+
+        export_guidelines(guideline_file)
+        write_guidelines(guideline_file, "fixed", nitrate_max=20)
+        while watcher.reloads == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher._thread.is_alive()
+        assert recommender.knowledge_base.label == "fixed"
+    finally:
+        watcher.stop()
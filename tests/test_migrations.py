@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.sql import text
+
+from database.config import Base
+from database.migrations import SCHEMA_MIGRATIONS, discover, migrate, pending_migrations
+from database.query_plans import check_query_plans
+
+# water_quality_measurements before latitude/longitude/location were added
+OLD_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR, email VARCHAR, hashed_password VARCHAR, "
+    "is_active BOOLEAN, created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE water_quality_measurements (id INTEGER PRIMARY KEY, user_id INTEGER, temperature FLOAT, "
+    "dissolved_oxygen FLOAT, ph FLOAT, conductivity FLOAT, bod FLOAT, nitrate FLOAT, fecal_coliform FLOAT, "
+    "total_coliform FLOAT, timestamp DATETIME)",
+    "CREATE TABLE water_quality_predictions (id INTEGER PRIMARY KEY, measurement_id INTEGER, is_potable BOOLEAN, "
+    "confidence FLOAT, wqi_value FLOAT, quality_category VARCHAR, timestamp DATETIME)",
+]
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+
+
+def test_migrations_are_numbered_in_order():
+    versions = [version for version, _, _ in discover()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_migrate_fresh_schema_is_idempotent(engine):
+    Base.metadata.create_all(bind=engine)
+    applied = migrate(engine, progress=lambda message: None)
+    assert applied == [version for version, _, _ in discover()]
+    assert migrate(engine, progress=lambda message: None) == []
+
+    with engine.connect() as connection:
+        rows = connection.execute(select(SCHEMA_MIGRATIONS.c.version, SCHEMA_MIGRATIONS.c.name)).all()
+    assert rows[0] == (1, "location_columns")
+    assert len(rows) == len(applied)
+
+
+def test_migrate_old_schema(engine):
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+
+    migrate(engine, progress=lambda message: None)
+
+    inspector = inspect(engine)
+    columns = {c["name"] for c in inspector.get_columns("water_quality_measurements")}
+    assert {"latitude", "longitude", "location"} <= columns
+    indexes = {i["name"] for i in inspector.get_indexes("water_quality_measurements")}
+    assert {"ix_measurements_user_id_timestamp", "ix_measurements_location_timestamp"} <= indexes
+    assert all(ok for ok, _ in check_query_plans(engine).values())
+
+
+def test_pending_migrations(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        assert pending_migrations(connection) == [(version, name) for version, name, _ in discover()]
+    migrate(engine, target=2, progress=lambda message: None)
+    with engine.connect() as connection:
+        assert [version for version, _ in pending_migrations(connection)] == [v for v, _, _ in discover() if v > 2]
+    migrate(engine, progress=lambda message: None)
+    with engine.connect() as connection:
+        assert pending_migrations(connection) == []
+
+
+def test_migrate_stops_at_target(engine):
+    Base.metadata.create_all(bind=engine)
+    assert migrate(engine, target=1, progress=lambda message: None) == [1]
+    assert 1 not in migrate(engine, progress=lambda message: None)
+
+
+def test_hot_queries_use_model_indexes(engine):
+    Base.metadata.create_all(bind=engine)
+    results = check_query_plans(engine)
+    assert results and all(ok for ok, _ in results.values()), results
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL (a scratch database) not set")
+def test_postgresql_index_migration_replaces_an_invalid_index():
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    Base.metadata.drop_all(bind=engine)
+    SCHEMA_MIGRATIONS.drop(bind=engine, checkfirst=True)
+    Base.metadata.create_all(bind=engine)
+    migrate(engine, target=2, progress=lambda message: None)
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        connection.execute(text("DROP INDEX ix_measurements_location_timestamp"))
+        connection.execute(text("INSERT INTO water_quality_measurements (location, \"timestamp\") "
+                                "VALUES ('river', '2026-01-01'), ('river', '2026-01-01')"))
+        # A failed concurrent build leaves the index behind, marked invalid
+        with pytest.raises(Exception):
+            connection.execute(text("CREATE UNIQUE INDEX CONCURRENTLY ix_measurements_location_timestamp "
+                                    "ON water_quality_measurements (location, \"timestamp\")"))
+
+    assert migrate(engine, target=3, progress=lambda message: None) == [3]
+    with engine.connect() as connection:
+        valid = connection.execute(text(
+            "SELECT c.relname, i.indisvalid, i.indisunique FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = 'ix_measurements_location_timestamp'"
+        )).all()
+    assert valid == [("ix_measurements_location_timestamp", True, False)]
+    Base.metadata.drop_all(bind=engine)
+    SCHEMA_MIGRATIONS.drop(bind=engine, checkfirst=True)
@@ -0,0 +1,163 @@
+import csv
+import gzip
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import text
+
+from database import crud
+from database.config import Base
+from database.migrations import SCHEMA_MIGRATIONS, migrate
+from database.models import MeasurementRollup, Recommendation, User, WaterQualityMeasurement, WaterQualityPrediction
+from database.partitions import add_months, apply_retention, integrity, is_partitioned, month_start, partitions
+from database.rollups import rebuild_rollups
+
+NOW = datetime(2026, 5, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def store_months(engine, months=5):
+    """One reading, prediction and recommendation on the 15th of each of the last months"""
+    with engine.begin() as connection:
+        for offset in range(months):
+            timestamp = add_months(month_start(NOW), -offset).replace(day=15)
+            measurement_id = connection.execute(
+                insert(WaterQualityMeasurement).values(user_id=1, ph=7.0 + offset, timestamp=timestamp)
+                .returning(WaterQualityMeasurement.id)
+            ).scalar_one()
+            connection.execute(insert(WaterQualityPrediction).values(
+                measurement_id=measurement_id, wqi_value=50.0 + offset, timestamp=timestamp
+            ))
+            connection.execute(insert(Recommendation).values(
+                measurement_id=measurement_id, parameter="ph", description="check", timestamp=timestamp
+            ))
+
+
+def test_months():
+    assert month_start(datetime(2026, 1, 31, 23, 59)) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert add_months(datetime(2026, 1, 1, tzinfo=timezone.utc), -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert add_months(datetime(2025, 11, 1, tzinfo=timezone.utc), 14) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+
+def test_retention_archives_and_removes_old_months(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    store_months(engine)
+    with engine.begin() as connection:
+        rebuild_rollups(connection, progress=lambda message: None)
+        rollups_before = connection.scalar(select(func.count()).select_from(MeasurementRollup))
+
+    assert apply_retention(engine, 3, now=NOW, dry_run=True, progress=lambda message: None)
+    removed = apply_retention(engine, 3, str(tmp_path / "archive"), now=NOW, progress=lambda message: None)
+
+    # The current month and the two before it stay
+    assert [(table, f"{month:%Y-%m}", rows) for table, month, rows in removed] == [
+        (table, month, 1)
+        for month in ("2026-01", "2026-02")
+        for table in ("water_quality_measurements", "water_quality_predictions", "recommendations")
+    ]
+    with sessionmaker(bind=engine)() as db:
+        assert db.scalars(select(WaterQualityMeasurement.ph).order_by(WaterQualityMeasurement.ph)).all() == [7.0, 8.0, 9.0]
+        assert db.scalar(select(func.count()).select_from(WaterQualityPrediction)) == 3
+    with gzip.open(tmp_path / "archive" / "water_quality_measurements" / "2026-01.csv.gz", "rt") as stream:
+        archived = list(csv.DictReader(stream))
+    assert [row["ph"] for row in archived] == ["11.0"]
+    assert apply_retention(engine, 3, now=NOW, progress=lambda message: None) == []
+
+    # A rebuild keeps the rollups of the removed months
+    with engine.begin() as connection:
+        rebuild_rollups(connection, progress=lambda message: None)
+    with sessionmaker(bind=engine)() as db:
+        assert db.scalar(select(func.count()).select_from(MeasurementRollup)) == rollups_before
+        series = crud.get_rollup_series(db, ["ph"], "day")
+    assert [stats.last_value for _, stats in series["ph"]] == [11.0, 10.0, 9.0, 8.0, 7.0]
+
+    with pytest.raises(ValueError):
+        apply_retention(engine, 0)
+
+
+def store_late_children(engine):
+    """A re-prediction and a recommendation stored now for the oldest reading; returns its id"""
+    with engine.begin() as connection:
+        measurement_id = connection.scalar(
+            select(WaterQualityMeasurement.id).order_by(WaterQualityMeasurement.timestamp).limit(1)
+        )
+        connection.execute(insert(WaterQualityPrediction).values(measurement_id=measurement_id, wqi_value=99.0, timestamp=NOW))
+        connection.execute(insert(Recommendation).values(
+            measurement_id=measurement_id, parameter="ph", description="late", timestamp=NOW
+        ))
+    return measurement_id
+
+
+def test_retention_removes_children_stored_in_later_months(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    Base.metadata.create_all(bind=engine)
+    store_months(engine)
+    measurement_id = store_late_children(engine)
+
+    apply_retention(engine, 3, str(tmp_path / "archive"), now=NOW, progress=lambda message: None)
+    with sessionmaker(bind=engine)() as db:
+        assert db.scalar(select(func.count()).select_from(WaterQualityPrediction).where(
+            WaterQualityPrediction.measurement_id == measurement_id)) == 0
+        assert db.scalar(select(func.count()).select_from(Recommendation)) == 3
+    with engine.connect() as connection:
+        assert not any(integrity(connection).values())
+    with gzip.open(tmp_path / "archive" / "water_quality_predictions" / "2026-01-late.csv.gz", "rt") as stream:
+        assert [row["wqi_value"] for row in csv.DictReader(stream)] == ["99.0"]
+
+
+def test_integrity_reports_orphans_and_duplicate_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'integrity.db'}")
+    Base.metadata.create_all(bind=engine)
+    store_months(engine, months=2)
+    with engine.connect() as connection:
+        assert not any(integrity(connection).values())
+    with engine.begin() as connection:
+        connection.execute(insert(WaterQualityPrediction).values(measurement_id=999, wqi_value=1.0, timestamp=NOW))
+    with engine.connect() as connection:
+        problems = integrity(connection)
+    assert problems["water_quality_predictions orphans"] == 1
+    assert sum(problems.values()) == 1
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL (a scratch database) not set")
+def test_postgresql_partitions_and_retention(tmp_path):
+    engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+    Base.metadata.drop_all(bind=engine)
+    SCHEMA_MIGRATIONS.drop(bind=engine, checkfirst=True)
+    Base.metadata.create_all(bind=engine)
+    migrate(engine, target=4, progress=lambda message: None)
+    with engine.begin() as connection:
+        connection.execute(insert(User).values(id=1, username="ana", email="ana@example.com", hashed_password="x"))
+    store_months(engine)
+
+    # Existing rows move into month partitions, ids keep counting
+    migrate(engine, progress=lambda message: None)
+    with engine.begin() as connection:
+        assert is_partitioned(connection, "water_quality_predictions")
+        months = {f"{month:%Y-%m}" for _, month in partitions(connection, "water_quality_measurements") if month}
+        assert {"2026-01", "2026-05"} <= months
+        assert connection.scalar(text("SELECT count(*) FROM water_quality_measurements_default")) == 0
+    with sessionmaker(bind=engine)() as db:
+        created = crud.create_measurement_with_prediction(db, {"user_id": None, "ph": 7.0}, {"wqi_value": 60.0})
+        assert created["measurement_id"] == 6
+
+    late_id = store_late_children(engine)
+    removed = apply_retention(engine, 3, str(tmp_path), now=NOW, progress=lambda message: None)
+    assert len(removed) == 6 and all(rows == 1 for _, _, rows in removed)
+    with engine.begin() as connection:
+        names = [name for name, _ in partitions(connection, "recommendations")]
+        assert "recommendations_p202602" not in names and "recommendations_p202603" in names
+        assert connection.scalar(text("SELECT count(*) FROM water_quality_measurements")) == 4
+        assert connection.scalar(text("SELECT count(*) FROM water_quality_predictions WHERE measurement_id = :id"),
+                                 {"id": late_id}) == 0
+        assert not any(integrity(connection).values())
+
+        # Only the sequence keeps ids unique across partitions
+        connection.execute(text("INSERT INTO water_quality_measurements (id, \"timestamp\") "
+                                "SELECT id, \"timestamp\" + interval '1 month' FROM water_quality_measurements "
+                                "ORDER BY id LIMIT 1"))
+        assert integrity(connection)["water_quality_measurements duplicate ids"] == 1
+    Base.metadata.drop_all(bind=engine)
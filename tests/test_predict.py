@@ -23,4 +23,127 @@ def test_predictor_predict_without_model():
             "organic_carbon": 1.0,
             "trihalomethanes": 0.05,
             "turbidity": 2.0
-        }) 
\ No newline at end of file
+        }) 
+
+def test_predictor_load_model_from_artifacts():
+    predictor = WaterQualityPredictor()
+    assert predictor.load_model()
+    assert predictor.model is not None
+    assert predictor.scaler is not None
+    assert predictor.label_encoder is not None
+
+
+SAMPLE_INPUT = {
+    "Lat": 20.5,
+    "Lon": 78.9,
+    "Temperature": 25.0,
+    "D.O": 6.5,
+    "pH": 7.2,
+    "Conductivity": 450.0,
+    "B.O.D": 2.0,
+    "Nitrate": 4.0,
+    "Fecalcaliform": 50.0,
+    "Totalcaliform": 120.0
+}
+
+
+def test_predictor_bundle_roundtrip(tmp_path):
+    legacy = WaterQualityPredictor()
+    assert legacy.load_legacy_artifacts()
+    assert legacy.feature_columns == list(SAMPLE_INPUT)
+    legacy.bundle_dir = str(tmp_path / "bundle")
+    manifest = legacy.save_bundle()
+    assert manifest["feature_columns"] == list(SAMPLE_INPUT)
+    assert manifest["classes"] == ["no", "yes"]
+
+    predictor = WaterQualityPredictor()
+    predictor.bundle_dir = legacy.bundle_dir
+    assert predictor.load_model()
+    assert predictor.model_version == manifest["model_version"]
+    assert predictor.forest["roots"].shape == (len(predictor.model.estimators_),)
+    assert predictor.predict(SAMPLE_INPUT) == legacy.predict(SAMPLE_INPUT)
+
+
+def test_predict_batch_matches_sklearn_pipeline():
+    import numpy as np
+    import pandas as pd
+
+    predictor = WaterQualityPredictor()
+    assert predictor.load_model()
+    rng = np.random.default_rng(0)
+    matrix = np.column_stack([
+        rng.uniform(8, 34, 50), rng.uniform(70, 95, 50), rng.uniform(10, 35, 50),
+        rng.uniform(0, 12, 50), rng.uniform(5, 9.5, 50), rng.uniform(50, 2000, 50),
+        rng.uniform(0, 30, 50), rng.uniform(0, 50, 50), rng.uniform(0, 5000, 50),
+        rng.uniform(0, 10000, 50)
+    ])
+    expected = predictor.model.predict_proba(
+        predictor.scaler.transform(pd.DataFrame(matrix, columns=predictor.feature_columns))
+    )[:, 1]
+
+    results = predictor.predict_batch(matrix)
+    assert len(results) == 50
+    assert np.allclose([probability for _, probability in results], expected, rtol=0, atol=1e-12)
+
+    rows = [dict(zip(predictor.feature_columns, row)) for row in matrix]
+    assert predictor.predict_batch(rows) == results
+    assert predictor.predict(rows[3]) == results[3]
+
+
+def test_predict_batch_rejects_missing_features():
+    predictor = WaterQualityPredictor()
+    assert predictor.load_model()
+    row = dict(SAMPLE_INPUT)
+    del row["pH"]
+    with pytest.raises(ValueError):
+        predictor.predict_batch([SAMPLE_INPUT, row])
+
+
+def test_predict_batch_with_cache_scores_quantised_inputs():
+    from models.cache import FEATURE_PRECISION, PredictionCache
+
+    predictor = WaterQualityPredictor()
+    assert predictor.load_model()
+    reference = predictor.predict_batch([SAMPLE_INPUT])
+
+    predictor.cache = PredictionCache(FEATURE_PRECISION)
+    noisy = dict(SAMPLE_INPUT, pH=SAMPLE_INPUT["pH"] + 0.001)
+    assert predictor.predict_batch([SAMPLE_INPUT, noisy]) == reference * 2
+    assert (predictor.cache.hits, predictor.cache.misses) == (0, 1)
+    assert predictor.predict(noisy) == reference[0]
+    assert (predictor.cache.hits, predictor.cache.misses) == (1, 1)
+
+    predictor.manifest = dict(predictor.manifest or {}, model_version="retrained")
+    assert predictor.predict(SAMPLE_INPUT) == reference[0]
+    assert predictor.cache.misses == 2
+
+
+def test_reloading_other_legacy_artifacts_invalidates_the_cache(tmp_path):
+    import shutil
+    from joblib import dump
+    from models.cache import FEATURE_PRECISION, PredictionCache
+
+    model_path = str(tmp_path / "model.joblib")
+    predictor = WaterQualityPredictor(model_path)
+    for source, target in [("models/water_quality_model.joblib", predictor.model_path),
+                           ("models/water_quality_scaler.joblib", predictor.scaler_path),
+                           ("models/water_quality_encoder.joblib", predictor.encoder_path)]:
+        shutil.copy(source, target)
+    assert predictor.load_model()
+    first_version = predictor.model_version
+    assert first_version is not None
+    predictor.cache = PredictionCache(FEATURE_PRECISION)
+    before = predictor.predict(SAMPLE_INPUT)
+
+    # A "retrain" that shifts the scaler's pH mean changes every score
+    predictor.scaler.mean_ = predictor.scaler.mean_.copy()
+    predictor.scaler.mean_[predictor.feature_columns.index("pH")] += 5.0
+    dump(predictor.scaler, predictor.scaler_path)
+    assert predictor.load_model()
+    assert predictor.model_version not in (None, first_version)
+
+    after = predictor.predict(SAMPLE_INPUT)
+    assert predictor.cache.invalidations == 1
+    assert (predictor.cache.hits, predictor.cache.misses) == (0, 2)
+    assert after == WaterQualityPredictor(model_path).predict(SAMPLE_INPUT)
+    assert after != before
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from recommender.rules import WaterQualityRecommender
 
 def test_recommender_initialization():
@@ -34,4 +35,88 @@ def test_generate_recommendations_with_valid_values():
         "hardness": 100,
         "conductivity": 400
     })
-    assert len(recommendations) == 0  # No recommendations for values within range 
\ No newline at end of file
+    assert len(recommendations) == 0  # No recommendations for values within range 
+
+
+def test_severity_uses_the_most_severe_threshold_crossed():
+    recommender = WaterQualityRecommender()
+    assert recommender._get_severity_level(6.2, "ph", "low") == "mild"
+    assert recommender._get_severity_level(5.5, "ph", "low") == "moderate"
+    assert recommender._get_severity_level(4.0, "ph", "low") == "critical"
+    assert recommender._get_severity_level(850, "conductivity", "high") == "mild"
+    assert recommender._get_severity_level(1500, "conductivity", "high") == "severe"
+    assert recommender._get_severity_level(0.5, "dissolved_oxygen", "low") == "critical"
+    assert recommender._get_severity_level(1.0, "hardness", "high") == "unknown"
+
+
+def test_recommendations_are_copies_of_shared_templates():
+    recommender = WaterQualityRecommender()
+    first = recommender.generate_recommendations({"nitrate": 45.0, "hardness": 150})
+    immediate = first["immediate"]
+    assert len(immediate) == 3
+    assert all(rec["severity"] == "severe" and rec["current_value"] == 45.0 for rec in immediate)
+    assert immediate[0]["health_implications"] == ("Significant health risks", "Potential for methemoglobinemia")
+
+    immediate[0]["current_value"] = -1
+    second = recommender.generate_recommendations({"nitrate": 12.0})
+    assert second["immediate"][0]["current_value"] == 12.0
+    assert second["immediate"][0]["severity"] == "mild"
+    assert second["immediate"][0]["description"] is immediate[0]["description"]
+
+
+def test_direction_without_measures_yields_nothing():
+    recommender = WaterQualityRecommender()
+    recommendations = recommender.generate_recommendations({"temperature": 10.0, "dissolved_oxygen": 12.0})
+    assert all(recs == [] for recs in recommendations.values())
+
+
+def test_batch_matches_scalar_recommendations():
+    from wqi_reference import random_parameters
+    from utils.wqi import PARAMETERS
+
+    recommender = WaterQualityRecommender()
+    # Scaled past the API ranges so every severity level is reached
+    values = random_parameters(500, seed=11) * 1.5
+    values[3, 2] = np.nan
+    columns = {name: values[:, j] for j, name in enumerate(PARAMETERS)}
+    columns["hardness"] = np.full(len(values), 150.0)
+
+    batch = recommender.generate_recommendations_batch(columns)
+    assert len(batch) == 500
+    assert batch.parameters == PARAMETERS
+    assert {entry.severity for entry in batch.catalogue} == {"mild", "moderate", "severe", "critical"}
+    for i, row in enumerate(values.tolist()):
+        expected = recommender.generate_recommendations(dict(zip(PARAMETERS, row)))
+        assert batch.expand(i) == expected
+        referenced = {batch.catalogue[entry_id].parameter for entry_id in batch.row(i)}
+        assert referenced == {rec["parameter"] for recs in expected.values() for rec in recs}
+    assert batch.rows()[0] == batch.row(0)
+
+
+def test_batch_of_in_range_readings_references_nothing():
+    recommender = WaterQualityRecommender()
+    batch = recommender.generate_recommendations_batch({"ph": [7.0, 7.5], "conductivity": [400, 500]})
+    assert batch.rows() == [[], []]
+
+
+def test_compact_recommendations_resolve_to_the_full_ones():
+    recommender = WaterQualityRecommender()
+    values = {"dissolved_oxygen": 0.5, "ph": 4.0, "conductivity": 2000.0, "nitrate": 12.0, "temperature": 10.0}
+    full = recommender.generate_recommendations(values)
+    compact, catalogue = recommender.generate_compact_recommendations(values)
+
+    assert set(catalogue["parameters"]) == {"dissolved_oxygen", "ph", "conductivity", "nitrate"}
+    for priority, recommendations in full.items():
+        assert len(compact[priority]) == len(recommendations)
+        for rec, ref in zip(recommendations, compact[priority]):
+            parameter = catalogue["parameters"][ref["parameter"]]
+            assert rec == {
+                "parameter": ref["parameter"],
+                "severity": ref["severity"],
+                "description": parameter["description"],
+                "health_implications": catalogue["health_implications"][ref["health_implications_id"]],
+                "action": catalogue["actions"][ref["action_id"]],
+                "priority": ref["priority"],
+                "current_value": ref["current_value"],
+                "acceptable_range": parameter["acceptable_range"],
+            }
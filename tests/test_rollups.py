@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from database import crud
+from database.models import MeasurementRollup
+from database.rollups import RollupStats, bucket_start, rebuild_rollups, summarise
+
+PREDICTION = {"is_potable": True, "confidence": 0.9, "quality_category": "Good"}
+START = datetime(2024, 3, 1, 22, 0, tzinfo=timezone.utc)
+
+
+def store_readings(engine, count=60):
+    """Readings every 5 minutes across midnight for two users and locations; returns them"""
+    rng = np.random.default_rng(1)
+    readings = []
+    with sessionmaker(bind=engine)() as db:
+        for i in range(count):
+            measurement = {
+                "user_id": 1 + i % 2,
+                "location": "river" if i % 3 else None,
+                "timestamp": START + timedelta(minutes=5 * i),
+                "ph": float(rng.uniform(5, 9)),
+                "temperature": float(rng.uniform(10, 30)),
+            }
+            wqi = float(rng.uniform(20, 90))
+            crud.create_measurement_with_prediction(db, measurement, dict(PREDICTION, wqi_value=wqi))
+            readings.append(dict(measurement, wqi=wqi))
+    return readings
+
+
+def rollup_table(engine):
+    with sessionmaker(bind=engine)() as db:
+        rows = db.scalars(select(MeasurementRollup).order_by(
+            MeasurementRollup.granularity, MeasurementRollup.user_id, MeasurementRollup.location,
+            MeasurementRollup.parameter, MeasurementRollup.bucket,
+        )).all()
+    return [
+        (row.granularity, row.user_id, row.location, row.parameter, row.bucket, row.count,
+         round(row.total, 9), round(row.total_sq, 9), row.minimum, row.maximum, row.last_value)
+        for row in rows
+    ]
+
+
+def test_bucket_start():
+    timestamp = datetime(2024, 3, 1, 22, 47, 13, 5)
+    assert bucket_start(timestamp, "hour") == datetime(2024, 3, 1, 22, tzinfo=timezone.utc)
+    assert bucket_start(timestamp, "day") == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        bucket_start(timestamp, "week")
+
+
+def test_upserts_match_rebuild(sqlite_engine):
+    store_readings(sqlite_engine)
+    incremental = rollup_table(sqlite_engine)
+    assert incremental
+
+    with sqlite_engine.begin() as connection:
+        written = rebuild_rollups(connection, progress=lambda message: None)
+    assert written == len(incremental)
+    assert rollup_table(sqlite_engine) == incremental
+
+
+def test_series_statistics_match_raw_readings(sqlite_engine):
+    readings = store_readings(sqlite_engine)
+
+    with sessionmaker(bind=sqlite_engine)() as db:
+        series = crud.get_rollup_series(db, ["ph", "wqi"], "hour", user_id=1, start_date=START)
+        days = crud.get_rollup_series(db, ["ph"], "day")
+
+    ph = [reading["ph"] for reading in readings if reading["user_id"] == 1]
+    stats = summarise(series["ph"])
+    assert stats.count == len(ph)
+    assert stats.minimum == min(ph) and stats.maximum == max(ph)
+    assert stats.mean == pytest.approx(np.mean(ph))
+    assert stats.std == pytest.approx(np.std(ph))
+    assert stats.last_value == ph[-1]
+    assert summarise(series["wqi"]).count == len(ph)
+
+    # The readings span two days; locations of a user merge into one point per bucket
+    assert [bucket.date().isoformat() for bucket, _ in days["ph"]] == ["2024-03-01", "2024-03-02"]
+    assert summarise(days["ph"]).count == len(readings)
+    assert len(series["ph"]) == len({bucket_start(r["timestamp"], "hour") for r in readings if r["user_id"] == 1})
+
+
+def test_step_by_step_crud_adds_prediction_wqi(sqlite_engine):
+    with sessionmaker(bind=sqlite_engine)() as db:
+        measurement = crud.create_water_quality_measurement(db, 1, 0.0, 0.0, 20.0, 6.0, 7.0, 400.0, 2.0, 3.0, 10.0, 20.0)
+        crud.create_prediction(db, measurement.id, True, 0.9, 70.0, "Good")
+        series = crud.get_rollup_series(db, ["ph", "wqi"], "day", user_id=1)
+    assert summarise(series["ph"]).last_value == 7.0
+    assert summarise(series["wqi"]).count == 1 and summarise(series["wqi"]).mean == 70.0
+
+
+def test_rollup_stats_merge():
+    first, second = RollupStats(), RollupStats()
+    for value, minutes in [(3.0, 0), (5.0, 10)]:
+        first.add(value, START + timedelta(minutes=minutes))
+    second.add(1.0, START + timedelta(minutes=5))
+    first.merge(second)
+    assert (first.count, first.minimum, first.maximum, first.last_value) == (3, 1.0, 5.0, 5.0)
+    assert first.std == pytest.approx(np.std([3.0, 5.0, 1.0]))
+    assert RollupStats().mean == 0.0 and RollupStats().std == 0.0
+
+
+def test_second_prediction_replaces_the_wqi_in_the_rollups(sqlite_engine):
+    readings = store_readings(sqlite_engine, count=30)
+    with sessionmaker(bind=sqlite_engine)() as db:
+        measurements = crud.get_measurements(db, user_id=1, limit=None)
+        # The lowest and then the highest WQI of a bucket replaced, so min and max must move
+        crud.create_prediction(db, measurements[0].id, False, 0.1, 1.0, "Very Poor")
+        crud.create_prediction(db, measurements[0].id, True, 0.9, 95.0, "Excellent")
+        crud.create_prediction(db, measurements[-1].id, False, 0.2, 5.0, "Very Poor")
+    incremental = rollup_table(sqlite_engine)
+
+    with sqlite_engine.begin() as connection:
+        rebuild_rollups(connection, progress=lambda message: None)
+    assert rollup_table(sqlite_engine) == incremental
+    with sessionmaker(bind=sqlite_engine)() as db:
+        wqi = summarise(crud.get_rollup_series(db, ["wqi"], "day", user_id=1)["wqi"])
+    assert wqi.count == len([reading for reading in readings if reading["user_id"] == 1])
+    assert (wqi.minimum, wqi.maximum) == (5.0, 95.0)
@@ -0,0 +1,46 @@
+import numpy as np
+from wqi_reference import legacy_calculate_wqi, legacy_quality_category, random_parameters
+from utils.wqi import (
+    PARAMETERS, calculate_wqi, calculate_wqi_one, calculate_wqi_with_categories,
+    get_quality_category, parameter_matrix
+)
+
+
+def test_vectorised_wqi_matches_scalar_formula():
+    values = random_parameters(5000)
+    wqi, categories = calculate_wqi_with_categories(values)
+    records = [dict(zip(PARAMETERS, row)) for row in values.tolist()]
+    expected = np.array([legacy_calculate_wqi(r) for r in records])
+    assert np.allclose(wqi, expected, rtol=0, atol=1e-9)
+    assert categories.tolist() == [legacy_quality_category(w) for w in expected]
+    assert np.allclose([calculate_wqi_one(r) for r in records], expected, rtol=0, atol=1e-9)
+
+
+def test_wqi_at_breakpoints():
+    ideal = {"temperature": 25, "dissolved_oxygen": 8, "ph": 7, "conductivity": 500,
+             "bod": 0, "nitrate": 0, "fecal_coliform": 0, "total_coliform": 0}
+    assert calculate_wqi_one(ideal) == 100
+    worst = {"temperature": 40, "dissolved_oxygen": 6, "ph": 14, "conductivity": 2000,
+             "bod": 3, "nitrate": 10, "fecal_coliform": 200, "total_coliform": 500}
+    assert calculate_wqi_one(worst) == 0
+
+
+def test_wqi_is_clamped_outside_accepted_ranges():
+    values = np.array([[60, 20, -1, 5000, 100, 100, 10000, 10000]], dtype=float)
+    assert calculate_wqi(values)[0] == 0.2 * 100
+
+
+def test_quality_category_thresholds():
+    assert [get_quality_category(w) for w in (0, 24.9, 25, 49.9, 50, 69.9, 70, 89.9, 90, 100)] == [
+        "Very Poor", "Very Poor", "Poor", "Poor", "Fair", "Fair", "Good", "Good", "Excellent", "Excellent"
+    ]
+
+
+def test_parameter_matrix_accepts_objects():
+    class Reading:
+        pass
+
+    reading = Reading()
+    for i, name in enumerate(PARAMETERS):
+        setattr(reading, name, float(i))
+    assert parameter_matrix([reading]).tolist() == [[float(i) for i in range(len(PARAMETERS))]]
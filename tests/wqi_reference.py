@@ -0,0 +1,88 @@
+"""Reference WQI for the tests: the scalar formula main.py used before utils.wqi"""
+import numpy as np
+
+from utils.wqi import PARAMETERS
+
+# Sampling ranges per parameter, matching the API's accepted input ranges
+PARAMETER_RANGES = {
+    "temperature": (0, 40),
+    "dissolved_oxygen": (0, 14),
+    "ph": (0, 14),
+    "conductivity": (0, 2000),
+    "bod": (0, 30),
+    "nitrate": (0, 50),
+    "fecal_coliform": (0, 500),
+    "total_coliform": (0, 1000),
+}
+
+LEGACY_WEIGHTS = {
+    "temperature": 0.1,
+    "dissolved_oxygen": 0.2,
+    "ph": 0.15,
+    "conductivity": 0.1,
+    "bod": 0.15,
+    "nitrate": 0.1,
+    "fecal_coliform": 0.1,
+    "total_coliform": 0.1
+}
+
+LEGACY_RANGES = {
+    "temperature": {"min": 0, "max": 40, "optimal": (20, 30)},
+    "dissolved_oxygen": {"min": 0, "max": 14, "optimal": (6, 8)},
+    "ph": {"min": 0, "max": 14, "optimal": (6.5, 8.5)},
+    "conductivity": {"min": 0, "max": 2000, "optimal": (200, 800)},
+    "bod": {"min": 0, "max": 30, "optimal": (0, 3)},
+    "nitrate": {"min": 0, "max": 50, "optimal": (0, 10)},
+    "fecal_coliform": {"min": 0, "max": 500, "optimal": (0, 200)},
+    "total_coliform": {"min": 0, "max": 1000, "optimal": (0, 500)}
+}
+
+
+def legacy_calculate_wqi(data: dict) -> float:
+    """The scalar WQI that main.py computed per reading"""
+    def normalize_parameter(value: float, param: str) -> float:
+        range_info = LEGACY_RANGES[param]
+        min_val, max_val = range_info["min"], range_info["max"]
+        opt_min, opt_max = range_info["optimal"]
+        if param in ["bod", "nitrate", "fecal_coliform", "total_coliform"]:
+            if value <= opt_min:
+                return 100
+            elif value >= opt_max:
+                return 0
+            else:
+                return 100 * (1 - (value - opt_min) / (opt_max - opt_min))
+        elif param == "dissolved_oxygen":
+            if value >= opt_max:
+                return 100
+            elif value <= opt_min:
+                return 0
+            else:
+                return 100 * (value - opt_min) / (opt_max - opt_min)
+        else:
+            if opt_min <= value <= opt_max:
+                return 100
+            elif value < opt_min:
+                return 100 * (value - min_val) / (opt_min - min_val)
+            else:
+                return 100 * (1 - (value - opt_max) / (max_val - opt_max))
+
+    scores = {param: normalize_parameter(data[param], param) for param in LEGACY_WEIGHTS}
+    return sum(scores[param] * weight for param, weight in LEGACY_WEIGHTS.items())
+
+
+def legacy_quality_category(wqi: float) -> str:
+    if wqi >= 90:
+        return "Excellent"
+    elif wqi >= 70:
+        return "Good"
+    elif wqi >= 50:
+        return "Fair"
+    elif wqi >= 25:
+        return "Poor"
+    else:
+        return "Very Poor"
+
+
+def random_parameters(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(*PARAMETER_RANGES[p], n) for p in PARAMETERS])
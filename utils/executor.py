@@ -0,0 +1,111 @@
+"""Bounded thread/process pools for CPU-bound work awaited from async endpoints"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when an executor already has max_pending tasks in flight"""
+
+
+class BoundedExecutor:
+    """A thread or process pool with a cap on queued plus running tasks.
+
+    ``run`` awaits a call in the pool so the event loop keeps serving other
+    connections. When ``max_pending`` calls are already in flight it raises
+    ExecutorSaturated immediately instead of queueing without bound; the API
+    turns that into a 503. A call holds its slot until the pool has finished
+    it, even if the awaiting coroutine is cancelled first (e.g. by a deadline).
+
+    The pool is created on first use, so an executor built in a preloading
+    gunicorn master gets its own pool in each worker. Process pools pickle
+    the callable, so pass module-level functions; on Linux they fork, so
+    children inherit objects such as the loaded model.
+    """
+
+    def __init__(self, name: str, max_workers: int = 4, max_pending: int = 64, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self._pool = None
+        # Slots are released from pool threads, when the call finishes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str, max_workers: int = 4, max_pending: int = 64, kind: str = "thread"):
+        """Build an executor configured by {NAME}_EXECUTOR, {NAME}_WORKERS and {NAME}_MAX_PENDING"""
+        prefix = name.upper()
+        return cls(
+            name,
+            max_workers=int(os.getenv(f"{prefix}_WORKERS", str(max_workers))),
+            max_pending=int(os.getenv(f"{prefix}_MAX_PENDING", str(max_pending))),
+            kind=os.getenv(f"{prefix}_EXECUTOR", kind).lower()
+        )
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                context = None
+                if "fork" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("fork")
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and return its result"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor is saturated ({self.pending} tasks pending)")
+            self.pending += 1
+
+        started = time.perf_counter()
+        call = functools.partial(fn, *args, **kwargs) if kwargs else functools.partial(fn, *args)
+        try:
+            future = self.pool.submit(call)
+        except Exception:
+            self._release(started, failed=True)
+            raise
+        future.add_done_callback(
+            lambda done: self._release(started, failed=not done.cancelled() and done.exception() is not None)
+        )
+        return await asyncio.wrap_future(future)
+
+    def _release(self, started: float, failed: bool):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.failed += failed
+            self.total_seconds += time.perf_counter() - started
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def snapshot(self) -> dict:
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "mean_seconds": self.total_seconds / self.completed if self.completed else 0.0,
+        }
@@ -4,8 +4,6 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from database.models import WaterQualityMeasurement
 from typing import List, Dict, Optional
-import matplotlib.pyplot as plt
-import seaborn as sns
 from io import BytesIO
 import base64
 
@@ -76,6 +74,9 @@ class WaterQualityTrendAnalyzer:
 
     def generate_trend_plot(self, df: pd.DataFrame, parameter: str) -> str:
         """Generate a trend plot for a specific parameter"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         plt.figure(figsize=(10, 6))
         sns.lineplot(data=df, x='timestamp', y=parameter)
         plt.title(f'{parameter} Trend Over Time')
@@ -1,8 +1,7 @@
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import pandas as pd
+
+# plotly and pandas are imported inside the plotting methods so that creating
+# a visualizer (done at API startup) does not load them
 
 class WaterQualityVisualizer:
     def __init__(self, session):
@@ -10,6 +9,8 @@ class WaterQualityVisualizer:
     
     def create_trend_plot(self, location, parameter, days=30):
         """Create a trend plot for a specific parameter over time"""
+        import plotly.graph_objects as go
+
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
@@ -56,6 +57,9 @@ class WaterQualityVisualizer:
     
     def create_parameter_correlation_plot(self, location):
         """Create a correlation matrix for water quality parameters"""
+        import pandas as pd
+        import plotly.graph_objects as go
+
         data = self.session.query(
             WaterQualityMeasurement.ph,
             WaterQualityMeasurement.dissolved_oxygen,
@@ -91,6 +95,8 @@ class WaterQualityVisualizer:
     
     def create_recommendation_status_pie(self, location):
         """Create a pie chart showing recommendation status distribution"""
+        import plotly.graph_objects as go
+
         data = self.session.query(
             Recommendation.status,
             func.count(Recommendation.id)
@@ -119,6 +125,8 @@ class WaterQualityVisualizer:
     
     def create_parameter_distribution_plot(self, location, parameter):
         """Create a distribution plot for a specific parameter"""
+        import plotly.graph_objects as go
+
         data = self.session.query(
             getattr(WaterQualityMeasurement, parameter)
         ).filter(
@@ -147,6 +155,8 @@ class WaterQualityVisualizer:
     
     def create_dashboard(self, location):
         """Create a comprehensive dashboard for a location"""
+        from plotly.subplots import make_subplots
+
         fig = make_subplots(
             rows=2, cols=2,
             subplot_titles=(
@@ -0,0 +1,130 @@
+"""Table-driven, vectorised Water Quality Index.
+
+Each parameter's 0-100 sub-index is a piecewise-linear function given by
+breakpoints, flat beyond the first and last one. The WQI is the weighted sum
+of the sub-indices. Scoring an (N, 8) array takes one np.searchsorted per
+parameter, so the API, seeding and backfills share one implementation and
+bulk recomputation never loops over rows in Python.
+"""
+import hashlib
+from bisect import bisect_right
+
+import numpy as np
+
+# Column order of the (N, 8) arrays accepted by calculate_wqi
+PARAMETERS = (
+    "temperature",
+    "dissolved_oxygen",
+    "ph",
+    "conductivity",
+    "bod",
+    "nitrate",
+    "fecal_coliform",
+    "total_coliform",
+)
+
+WEIGHTS = np.array([0.1, 0.2, 0.15, 0.1, 0.15, 0.1, 0.1, 0.1])
+
+# (values, sub-index) breakpoints per parameter:
+# - optimal range with a falling edge on either side (temperature, pH,
+#   conductivity): 0 at the acceptable min/max, 100 inside the optimal range
+# - higher is better (dissolved oxygen): 0 up to 6 mg/L, 100 from 8 mg/L
+# - lower is better (BOD, nitrate, coliforms): 100 up to the optimal limit
+#   at 0, falling to 0 at the upper optimal limit
+BREAKPOINTS = {
+    "temperature": ((0, 20, 30, 40), (0, 100, 100, 0)),
+    "dissolved_oxygen": ((6, 8), (0, 100)),
+    "ph": ((0, 6.5, 8.5, 14), (0, 100, 100, 0)),
+    "conductivity": ((0, 200, 800, 2000), (0, 100, 100, 0)),
+    "bod": ((0, 3), (100, 0)),
+    "nitrate": ((0, 10), (100, 0)),
+    "fecal_coliform": ((0, 200), (100, 0)),
+    "total_coliform": ((0, 500), (100, 0)),
+}
+
+
+def _segment_table(xs, ys) -> tuple:
+    """Breakpoints plus the start value and slope of the segment ending at each one"""
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    slopes = np.concatenate([[0.0], np.diff(ys) / np.diff(xs)])
+    starts = np.concatenate([[ys[0]], ys[:-1]])
+    origins = np.concatenate([[xs[0]], xs[:-1]])
+    return xs, origins, starts, slopes
+
+
+_TABLES = [_segment_table(*BREAKPOINTS[p]) for p in PARAMETERS]
+# The same tables as plain lists for scoring one reading without NumPy overhead
+_SCALAR_TABLES = [
+    (name, weight, *(array.tolist() for array in table))
+    for name, weight, table in zip(PARAMETERS, WEIGHTS.tolist(), _TABLES)
+]
+
+# A WQI at or above each threshold falls in the next category
+CATEGORY_THRESHOLDS = np.array([25, 50, 70, 90])
+CATEGORIES = np.array(["Very Poor", "Poor", "Fair", "Good", "Excellent"], dtype=object)
+
+# Fingerprint of the formula; stored WQI values computed under another
+# version are stale (see database/backfill.py)
+WQI_VERSION = hashlib.sha256(
+    repr((PARAMETERS, WEIGHTS.tolist(), BREAKPOINTS, CATEGORY_THRESHOLDS.tolist(), CATEGORIES.tolist())).encode()
+).hexdigest()[:12]
+
+
+def parameter_matrix(records) -> np.ndarray:
+    """Build an (N, 8) float64 array from dicts or objects with the parameter names"""
+    rows = []
+    for record in records:
+        if isinstance(record, dict):
+            rows.append([record[p] for p in PARAMETERS])
+        else:
+            rows.append([getattr(record, p) for p in PARAMETERS])
+    return np.array(rows, dtype=np.float64).reshape(-1, len(PARAMETERS))
+
+
+def sub_indices(values: np.ndarray) -> np.ndarray:
+    """Score every parameter of an (N, 8) array on the 0-100 scale"""
+    values = np.asarray(values, dtype=np.float64)
+    scores = np.empty_like(values)
+    for j, (xs, origins, starts, slopes) in enumerate(_TABLES):
+        # Segment i spans breakpoints i-1..i; values outside the table are
+        # clipped onto the first or last breakpoint, where the score is flat
+        clipped = np.clip(values[:, j], xs[0], xs[-1])
+        i = np.searchsorted(xs[:-1], clipped, side="right")
+        scores[:, j] = starts[i] + (clipped - origins[i]) * slopes[i]
+    # Rounding can leave a value a hair outside 0-100 at the far end of a segment
+    return np.clip(scores, 0.0, 100.0, out=scores)
+
+
+def calculate_wqi(values: np.ndarray) -> np.ndarray:
+    """WQI (0-100) for each row of an (N, 8) array in PARAMETERS order"""
+    return sub_indices(values) @ WEIGHTS
+
+
+def quality_categories(wqi: np.ndarray) -> np.ndarray:
+    """Quality category for each WQI value"""
+    return CATEGORIES[np.searchsorted(CATEGORY_THRESHOLDS, wqi, side="right")]
+
+
+def calculate_wqi_with_categories(values: np.ndarray) -> tuple:
+    """Return (wqi, categories) arrays for an (N, 8) array"""
+    wqi = calculate_wqi(values)
+    return wqi, quality_categories(wqi)
+
+
+def calculate_wqi_one(record) -> float:
+    """WQI for a single reading given as a dict or object.
+
+    Walks the same breakpoint tables with bisect; for one row this is much
+    cheaper than building an array.
+    """
+    get = record.__getitem__ if isinstance(record, dict) else record.__getattribute__
+    wqi = 0.0
+    for name, weight, xs, origins, starts, slopes in _SCALAR_TABLES:
+        clipped = min(max(float(get(name)), xs[0]), xs[-1])
+        i = bisect_right(xs, clipped, 0, len(xs) - 1)
+        wqi += min(max(starts[i] + (clipped - origins[i]) * slopes[i], 0.0), 100.0) * weight
+    return wqi
+
+
+def get_quality_category(wqi: float) -> str:
+    return str(CATEGORIES[np.searchsorted(CATEGORY_THRESHOLDS, wqi, side="right")])